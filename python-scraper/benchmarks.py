@@ -0,0 +1,229 @@
+"""
+性能基准
+对比热点函数的旧实现和新实现, 不需要数据库或网络
+
+用法:
+    python benchmarks.py                # 运行全部基准
+    python benchmarks.py matcher        # 只运行指定基准
+"""
+import sys
+import time
+import random
+from typing import Callable, Dict, List
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import name_normalizer
+from price_analyzer import ContractorMatcher, PriceCalculator
+
+# 模拟许可证描述的词汇
+DESCRIPTION_WORDS = [
+    'install', 'replace', 'new', 'existing', 'residential', 'commercial', 'repair',
+    'roof', 'shingle', 'tear off', 'reroof', 'hvac', 'furnace', 'heat pump',
+    'water heater', 'bathroom', 'kitchen', 'remodel', 'electrical', 'panel',
+    'sewer', 'garage', 'deck', 'fence', 'patio', 'window', 'siding', 'per plans',
+    'sq ft', 'unit', 'floor', 'interior', 'alteration', 'demo', 'only',
+]
+
+
+def make_descriptions(count: int, seed: int = 42) -> List[str]:
+    """生成随机许可证描述"""
+    rng = random.Random(seed)
+    return [
+        ' '.join(rng.choice(DESCRIPTION_WORDS) for _ in range(rng.randint(2, 12))).upper()
+        for _ in range(count)
+    ]
+
+
+def timeit(func: Callable[[], object], repeat: int = 3) -> float:
+    """多次运行取最快一次 (秒)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def legacy_detect_service_type(description: str) -> str:
+    """旧实现: 按字典顺序逐个关键词做子串查找, 第一个命中的类型胜出"""
+    if not description:
+        return 'general'
+    description_lower = description.lower()
+    for service_type, keywords in PriceCalculator.SERVICE_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword in description_lower:
+                return service_type
+    return 'general'
+
+
+def legacy_scan(description: str) -> List[tuple]:
+    """旧思路下取得全部命中及位置: 每个关键词各做一遍子串查找"""
+    description_lower = description.lower()
+    hits = []
+    for service_type, keywords in PriceCalculator.SERVICE_KEYWORDS.items():
+        for keyword in keywords:
+            start = description_lower.find(keyword)
+            while start != -1:
+                hits.append((service_type, keyword, start))
+                start = description_lower.find(keyword, start + 1)
+    return hits
+
+
+def bench_matcher(count: int = 200_000):
+    """服务类型检测: 逐关键词循环 vs 编译后的单遍匹配器"""
+    descriptions = make_descriptions(count)
+    matcher = PriceCalculator.service_matcher()
+
+    loop_time = timeit(lambda: [legacy_detect_service_type(d) for d in descriptions])
+    matcher_time = timeit(lambda: [matcher.best(d) for d in descriptions])
+    legacy_scan_time = timeit(lambda: [legacy_scan(d) for d in descriptions])
+    scan_time = timeit(lambda: [matcher.scan(d) for d in descriptions])
+    lowered = pc.utf8_lower(pa.array(descriptions))
+    batch_time = timeit(lambda: matcher.best_batch(lowered))
+
+    assert list(matcher.best_batch(lowered)) == [matcher.best(d) for d in descriptions]
+    changed = sum(
+        legacy_detect_service_type(d) != matcher.best(d) for d in descriptions
+    )
+
+    print(f"服务类型检测 ({count:,} 条描述)")
+    print(f"  旧循环 (首个命中):   {loop_time:.3f}s  {count / loop_time:,.0f} 条/秒")
+    print(f"  匹配器 (得分胜出):   {matcher_time:.3f}s  {count / matcher_time:,.0f} 条/秒")
+    print(f"  匹配器 (批量向量化): {batch_time:.3f}s  {count / batch_time:,.0f} 条/秒")
+    print(f"  旧循环 (全部命中):   {legacy_scan_time:.3f}s  {count / legacy_scan_time:,.0f} 条/秒")
+    print(f"  匹配器 (含命中位置): {scan_time:.3f}s  {count / scan_time:,.0f} 条/秒")
+    print(f"  结果不同的描述: {changed:,} ({changed / count:.1%}, 多类型描述按得分重新判定)")
+
+
+# 模拟企业名称的词汇
+NAME_WORDS = [
+    'SMITH', 'JOHNSON', 'WILLIAMS', 'BROWN', 'JONES', 'GARCIA', 'MILLER', 'DAVIS',
+    'RODRIGUEZ', 'MARTINEZ', 'HERNANDEZ', 'LOPEZ', 'WILSON', 'ANDERSON', 'THOMAS',
+    'TAYLOR', 'MOORE', 'JACKSON', 'MARTIN', 'LEE', 'PEREZ', 'THOMPSON', 'WHITE',
+    'HARRIS', 'CLARK', 'LEWIS', 'ROBINSON', 'WALKER', 'YOUNG', 'ALLEN', 'KING',
+    'AMERICAN', 'PREMIER', 'ELITE', 'QUALITY', 'RELIABLE', 'PRO', 'ALL STAR',
+    'SUMMIT', 'EAGLE', 'PIONEER', 'NORTHSTAR', 'BLUE SKY', 'GOLDEN', 'TRI COUNTY',
+]
+TRADE_WORDS = [
+    'ROOFING', 'PLUMBING', 'HVAC', 'ELECTRIC', 'CONSTRUCTION', 'BUILDERS',
+    'HOME SERVICES', 'CONTRACTORS', 'HEATING & AIR', 'REMODELING', 'EXTERIORS',
+]
+NAME_SUFFIXES = ['', ' INC', ' LLC', ' CO', ' CORP', ' CO INC', ' LTD']
+
+
+def make_company_names(count: int, seed: int = 7) -> List[str]:
+    """生成随机企业名称 (带编号保证大多唯一)"""
+    rng = random.Random(seed)
+    return [
+        f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {rng.randint(1, 99999)} "
+        f"{rng.choice(TRADE_WORDS)}{rng.choice(NAME_SUFFIXES)}"
+        for _ in range(count)
+    ]
+
+
+def make_typo(name: str, rng: random.Random) -> str:
+    """随机删掉一个字符, 模拟许可证上的拼写差异"""
+    position = rng.randrange(len(name))
+    return name[:position] + name[position + 1:]
+
+
+def bench_index(count: int = 1_000_000, queries: int = 2_000):
+    """承包商匹配: 逐个比较 vs 分块索引"""
+    names = make_company_names(count)
+    companies = [{'id': str(i), 'name': name} for i, name in enumerate(names)]
+
+    start = time.perf_counter()
+    index = ContractorMatcher.build_index(companies)
+    build_time = time.perf_counter() - start
+
+    rng = random.Random(11)
+    samples = rng.sample(range(count), queries)
+    exact_queries = [names[i].lower() for i in samples[:queries // 2]]
+    typo_queries = [make_typo(names[i], rng) for i in samples[queries // 2:]]
+
+    def latencies(query_names: List[str]) -> List[float]:
+        result = []
+        for name in query_names:
+            start = time.perf_counter()
+            index.search(name)
+            result.append(time.perf_counter() - start)
+        return sorted(result)
+
+    exact_latency = latencies(exact_queries)
+    typo_latency = latencies(typo_queries)
+    found = sum(
+        index.best_match(typo_queries[i]) == str(samples[queries // 2 + i])
+        for i in range(len(typo_queries))
+    )
+
+    loop_queries = exact_queries[:3]
+    start = time.perf_counter()
+    for name in loop_queries:
+        ContractorMatcher.match_contractor_to_company(name, companies)
+    loop_time = (time.perf_counter() - start) / len(loop_queries)
+
+    def pct(values: List[float], q: float) -> float:
+        return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+    print(f"承包商匹配 ({count:,} 家企业)")
+    print(f"  建索引: {build_time:.1f}s")
+    print(f"  精确名称: p50 {pct(exact_latency, 0.5):.3f}ms  p99 {pct(exact_latency, 0.99):.3f}ms")
+    print(f"  拼写差异: p50 {pct(typo_latency, 0.5):.3f}ms  p99 {pct(typo_latency, 0.99):.3f}ms"
+          f"  命中原企业 {found / len(typo_queries):.1%}")
+    print(f"  旧逐个比较: {loop_time * 1000:.0f}ms/次")
+
+
+def legacy_normalize_name(name: str) -> str:
+    """旧实现: 大写、合并空白, 逐个后缀检查 (只能去掉一个后缀)"""
+    if not name:
+        return ''
+    normalized = ' '.join(name.upper().split())
+    for suffix in [' INC', ' INC.', ' LLC', ' LLC.', ' CO', ' CO.',
+                   ' CORP', ' CORP.', ' LTD', ' LTD.', ' LP', ' LP.']:
+        if normalized.endswith(suffix):
+            normalized = normalized[:-len(suffix)]
+    return normalized.strip()
+
+
+def bench_normalize(count: int = 1_000_000, distinct: int = 50_000):
+    """企业名称标准化: 旧实现 vs 编译规则 (无缓存 / 有缓存)"""
+    rng = random.Random(3)
+    pool = make_company_names(distinct)
+    names = [rng.choice(pool) for _ in range(count)]
+    compiled = name_normalizer.canonical_company_name.__wrapped__
+
+    legacy_time = timeit(lambda: [legacy_normalize_name(n) for n in names], repeat=1)
+    compiled_time = timeit(lambda: [compiled(n) for n in names], repeat=1)
+    name_normalizer.canonical_company_name.cache_clear()
+    cached_time = timeit(lambda: [name_normalizer.canonical_company_name(n) for n in names], repeat=1)
+    info = name_normalizer.canonical_company_name.cache_info()
+
+    print(f"名称标准化 ({count:,} 次调用, {distinct:,} 个不同名称)")
+    print(f"  旧实现:         {legacy_time:.3f}s  {count / legacy_time:,.0f} 次/秒")
+    print(f"  编译规则:       {compiled_time:.3f}s  {count / compiled_time:,.0f} 次/秒")
+    print(f"  编译规则+缓存:  {cached_time:.3f}s  {count / cached_time:,.0f} 次/秒"
+          f"  命中率 {info.hits / (info.hits + info.misses):.1%}")
+
+
+BENCHMARKS: Dict[str, Callable[[], None]] = {
+    'matcher': bench_matcher,
+    'index': bench_index,
+    'normalize': bench_normalize,
+}
+
+
+def main() -> int:
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"未知基准: {name} (可选: {', '.join(BENCHMARKS)})")
+            return 1
+        BENCHMARKS[name]()
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
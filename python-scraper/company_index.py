@@ -0,0 +1,164 @@
+"""
+企业名称匹配索引
+对标准化后的企业名称建立词元和字符三元组倒排索引 (分块),
+查询时只对分块召回的少量候选打分, 不再逐个比较全部企业
+"""
+
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# 召回时最多读取的倒排表条目数: 按区分度从高到低 (倒排表从短到长) 取词元/三元组,
+# 直到用完预算, 查询耗时因此有上界
+POSTINGS_BUDGET = 20000
+# 进入精排的候选数
+MAX_CANDIDATES = 50
+# 词元召回的最佳得分低于该值时再做三元组召回
+CONFIDENT_SCORE = 0.8
+
+
+def name_trigrams(name: str) -> Set[str]:
+    """字符三元组 (首尾补空格, 短名称也能产生三元组)"""
+    padded = f" {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CompanyIndex:
+    """
+    企业名称索引
+
+    - 精确表: 标准化名称 -> 企业
+    - 词元倒排: 按共享的少见词元数召回名称相近的候选
+    - 三元组倒排: 词元召回不到足够相似的候选时 (拼写差异、空格差异) 再用
+    候选按三元组 Jaccard 相似度排序, 名称包含关系 (旧匹配规则) 额外加分
+    """
+
+    def __init__(self, normalize: Optional[Callable[[str], str]] = None, min_score: float = 0.5):
+        if normalize is None:
+            from price_analyzer import ContractorMatcher
+            normalize = ContractorMatcher.normalize_name
+        self.normalize = normalize
+        self.min_score = min_score
+
+        self.ids: List[str] = []
+        self.names: List[str] = []
+        self.deleted: Set[int] = set()
+        self.doc_for_id: Dict[str, int] = {}
+        self.exact: Dict[str, List[int]] = {}
+        self.tokens: Dict[str, array] = {}
+        self.grams: Dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_for_id)
+
+    # ---- 写入 ----
+
+    def add(self, company_id: str, name: str) -> bool:
+        """加入或更新一家企业, 名称为空时忽略"""
+        normalized = self.normalize(name or '')
+        if not normalized:
+            return False
+
+        doc = self.doc_for_id.get(company_id)
+        if doc is not None:
+            if self.names[doc] == normalized:
+                return True
+            self.deleted.add(doc)
+
+        doc = len(self.ids)
+        self.ids.append(company_id)
+        self.names.append(normalized)
+        self.doc_for_id[company_id] = doc
+
+        self.exact.setdefault(normalized, []).append(doc)
+        for token in set(normalized.split()):
+            postings = self.tokens.get(token)
+            if postings is None:
+                postings = self.tokens[token] = array('I')
+            postings.append(doc)
+        for gram in name_trigrams(normalized):
+            postings = self.grams.get(gram)
+            if postings is None:
+                postings = self.grams[gram] = array('I')
+            postings.append(doc)
+        return True
+
+    def add_companies(self, companies: Iterable[Dict]) -> int:
+        """批量加入企业字典 (需要 id 和 name)"""
+        return sum(self.add(company['id'], company.get('name', '')) for company in companies)
+
+    def remove(self, company_id: str):
+        doc = self.doc_for_id.pop(company_id, None)
+        if doc is not None:
+            self.deleted.add(doc)
+
+    # ---- 查询 ----
+
+    @staticmethod
+    def _within_budget(postings_lists: List[array]) -> List[array]:
+        """按长度从短到长取倒排表, 总长不超过预算 (至少取最短的一个, 必要时截断)"""
+        postings_lists = sorted(postings_lists, key=len)
+        selected: List[array] = []
+        used = 0
+        for postings in postings_lists:
+            if used + len(postings) > POSTINGS_BUDGET:
+                if not selected:
+                    selected.append(postings[-POSTINGS_BUDGET:])
+                break
+            selected.append(postings)
+            used += len(postings)
+        return selected
+
+    def _candidates(self, postings_index: Dict[str, array], keys: Set[str]) -> List[int]:
+        """共享 (预算内) 倒排条目最多的候选 (numpy 计数和取前几名; 同分时编号小的在前)"""
+        selected = self._within_budget([postings_index[k] for k in keys if k in postings_index])
+        if not selected:
+            return []
+        docs, counts = np.unique(
+            np.concatenate([np.frombuffer(postings, dtype=np.uint32) for postings in selected]),
+            return_counts=True
+        )
+        return docs[np.argsort(-counts, kind='stable')[:MAX_CANDIDATES]].tolist()
+
+    def _rank(self, normalized: str, grams: Set[str], docs: Iterable[int]) -> List[Tuple[int, float]]:
+        ranked = []
+        for doc in docs:
+            if doc in self.deleted:
+                continue
+            name = self.names[doc]
+            other = name_trigrams(name)
+            score = len(grams & other) / len(grams | other)
+            if normalized in name or name in normalized:
+                score = max(score, 0.5 + score / 2)
+            ranked.append((doc, score))
+        ranked.sort(key=lambda item: -item[1])
+        return ranked
+
+    def search(self, name: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """返回按相似度排序的 [(企业 id, 得分)], 得分在 0-1 之间, 只含不低于 min_score 的候选"""
+        normalized = self.normalize(name or '')
+        if not normalized:
+            return []
+
+        exact = [doc for doc in self.exact.get(normalized, ()) if doc not in self.deleted]
+        if exact:
+            return [(self.ids[doc], 1.0) for doc in exact[:limit]]
+
+        grams = name_trigrams(normalized)
+        ranked = self._rank(normalized, grams, self._candidates(self.tokens, set(normalized.split())))
+        if not ranked or ranked[0][1] < CONFIDENT_SCORE:
+            # 词元召回不理想, 补充三元组召回 (已打过分的候选不再重复打分)
+            scored = {doc for doc, _ in ranked}
+            ranked += self._rank(
+                normalized, grams,
+                [doc for doc in self._candidates(self.grams, grams) if doc not in scored]
+            )
+            ranked.sort(key=lambda item: -item[1])
+
+        return [(self.ids[doc], round(score, 4)) for doc, score in ranked[:limit] if score >= self.min_score]
+
+    def best_match(self, name: str) -> Optional[str]:
+        """最佳匹配的企业 id, 没有足够相似的企业时返回 None"""
+        matches = self.search(name, limit=1)
+        return matches[0][0] if matches else None
@@ -10,12 +10,21 @@ import json
 import os
 import re
 import hashlib
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Any, Tuple
+from dataclasses import dataclass, asdict, field
 from abc import ABC, abstractmethod
 import logging
 
+from http_cache import CachedSession, revalidating
+from http_client import close_http_client, get_http_client
+from name_normalizer import canonical_company_name, name_key
+from rate_limiter import QuotaExceededError, get_rate_limiter, save_rate_quotas
+from result_cache import ResultCache, get_result_cache
+from resilience import RETRYABLE_STATUSES, SourceUnavailableError, TransientHTTPError, get_source_guard
+from single_flight import SingleFlight
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -23,6 +32,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Seconds DataAggregator.get_full_company_data waits for the sources before
+# returning what it has (rate-limit waits and retries count against it)
+AGGREGATE_DEADLINE = 30.0
+
+# Bulk enrichment (DataAggregator.enrich_companies): companies in flight at
+# once, and concurrent search->details chains per source
+BULK_CONCURRENCY = 50
+BULK_SOURCE_CONCURRENCY = {
+    "sec_edgar": 10,
+    "google_places": 10,
+    "yelp": 5,
+    "opencorporates": 2,
+}
+DEFAULT_SOURCE_CONCURRENCY = 5
+# Log progress every N completed companies
+BULK_PROGRESS_INTERVAL = 100
+
 # ==========================================
 # DATA MODELS
 # ==========================================
@@ -209,6 +235,19 @@ class CompanyData:
         
         self.data_quality_score = round(score / max_score * 100, 1)
         return self.data_quality_score
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CompanyData':
+        """Rebuild from asdict() output (nested records included)"""
+        data = dict(data)
+        if data.get("contact"):
+            data["contact"] = ContactInfo(**data["contact"])
+        if data.get("financial"):
+            data["financial"] = FinancialInfo(**data["financial"])
+        data["executives"] = [Executive(**e) for e in data.get("executives") or []]
+        data["licenses"] = [License(**l) for l in data.get("licenses") or []]
+        data["ratings"] = [Rating(**r) for r in data.get("ratings") or []]
+        return cls(**data)
 
 
 # ==========================================
@@ -222,13 +261,22 @@ class DataSource(ABC):
         self.name = name
         self.api_key = api_key
         self.session: Optional[aiohttp.ClientSession] = None
-        self.rate_limit = 10  # requests per second
-        self.last_request = datetime.min
+        # HTTP cache source name, selects the cache TTL (see http_cache.HTTP_CACHE_TTLS)
+        self.cache_source = name.lower().replace(" ", "_")
+        # Shared per-source token bucket and quotas (see rate_limiter.RATE_LIMITS)
+        self.rate_limiter = get_rate_limiter(self.cache_source)
+        # Retry policy and circuit breaker (see resilience.RETRY_POLICIES)
+        self.guard = get_source_guard(self.cache_source)
     
     async def init_session(self):
         if not self.session:
             timeout = aiohttp.ClientTimeout(total=30)
-            self.session = aiohttp.ClientSession(timeout=timeout)
+            self.session = CachedSession(
+                get_http_client().session(timeout=timeout),
+                source=self.cache_source,
+                on_response=self.rate_limiter.observe,
+                before_request=self.rate_limit_wait
+            )
     
     async def close_session(self):
         if self.session:
@@ -236,12 +284,38 @@ class DataSource(ABC):
             self.session = None
     
     async def rate_limit_wait(self):
-        """Respect rate limits"""
-        elapsed = (datetime.now() - self.last_request).total_seconds()
-        min_interval = 1.0 / self.rate_limit
-        if elapsed < min_interval:
-            await asyncio.sleep(min_interval - elapsed)
-        self.last_request = datetime.now()
+        """
+        Respect rate limits (raises QuotaExceededError once the daily/monthly quota is used).
+        The cached session awaits this only for requests that reach the network
+        """
+        await self.rate_limiter.acquire()
+    
+    async def get_json(
+        self,
+        url: str,
+        params: Optional[Dict] = None,
+        headers: Optional[Dict] = None
+    ) -> Optional[Any]:
+        """
+        GET a JSON document, guarded by the source's retry policy and circuit
+        breaker. Cache hits are served without spending rate limit tokens. Returns None when the source has no such
+        record (404 and other non-retryable statuses). Timeouts, connection
+        errors and 429/5xx responses are retried and re-raised when they
+        persist; SourceUnavailableError is raised while the breaker is open.
+        """
+        await self.init_session()
+        
+        async def attempt():
+            async with self.session.get(url, params=params, headers=headers) as response:
+                if response.status == 200:
+                    return await response.json()
+                if response.status in RETRYABLE_STATUSES:
+                    raise TransientHTTPError(self.cache_source, response.status)
+                if response.status != 404:
+                    logger.warning(f"{self.name}: HTTP {response.status} for {url}")
+                return None
+        
+        return await self.guard.call(attempt)
     
     @abstractmethod
     async def search_company(self, name: str, state: Optional[str] = None) -> List[Dict]:
@@ -262,70 +336,34 @@ class SECEdgarSource(DataSource):
     """SEC EDGAR for public company data"""
     
     BASE_URL = "https://data.sec.gov"
+    HEADERS = {"User-Agent": "BizCompare research@bizcompare.com"}
     
     def __init__(self):
         super().__init__("SEC EDGAR")
-        self.rate_limit = 10
     
     async def search_company(self, name: str, state: Optional[str] = None) -> List[Dict]:
-        await self.init_session()
-        await self.rate_limit_wait()
-        
         # Search SEC company tickers
         url = f"{self.BASE_URL}/submissions/CIK{name.zfill(10)}.json"
-        
-        try:
-            headers = {"User-Agent": "BizCompare research@bizcompare.com"}
-            async with self.session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return [data]
-        except Exception as e:
-            logger.error(f"SEC search error: {e}")
-        
-        return []
+        data = await self.get_json(url, headers=self.HEADERS)
+        return [data] if data else []
     
     async def search_by_name(self, name: str) -> List[Dict]:
         """Search SEC by company name"""
-        await self.init_session()
-        await self.rate_limit_wait()
-        
-        try:
-            # Use SEC full-text search
-            url = "https://efts.sec.gov/LATEST/search-index"
-            params = {
-                "q": name,
-                "dateRange": "custom",
-                "forms": "10-K,10-Q,8-K"
-            }
-            headers = {"User-Agent": "BizCompare research@bizcompare.com"}
-            
-            async with self.session.get(url, headers=headers, params=params) as response:
-                if response.status == 200:
-                    return await response.json()
-        except Exception as e:
-            logger.error(f"SEC name search error: {e}")
-        
-        return []
+        # Use SEC full-text search
+        url = "https://efts.sec.gov/LATEST/search-index"
+        params = {
+            "q": name,
+            "dateRange": "custom",
+            "forms": "10-K,10-Q,8-K"
+        }
+        return await self.get_json(url, params=params, headers=self.HEADERS) or []
     
     async def get_company_details(self, cik: str) -> Optional[CompanyData]:
         """Get company details from SEC"""
-        await self.init_session()
-        await self.rate_limit_wait()
-        
-        try:
-            cik_padded = cik.zfill(10)
-            url = f"{self.BASE_URL}/submissions/CIK{cik_padded}.json"
-            headers = {"User-Agent": "BizCompare research@bizcompare.com"}
-            
-            async with self.session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return self._parse_sec_data(data)
-        except Exception as e:
-            logger.error(f"SEC details error: {e}")
-        
-        return None
+        cik_padded = cik.zfill(10)
+        url = f"{self.BASE_URL}/submissions/CIK{cik_padded}.json"
+        data = await self.get_json(url, headers=self.HEADERS)
+        return self._parse_sec_data(data) if data else None
     
     def _parse_sec_data(self, data: Dict) -> CompanyData:
         """Parse SEC data into CompanyData"""
@@ -376,51 +414,28 @@ class GooglePlacesSource(DataSource):
     
     def __init__(self, api_key: str):
         super().__init__("Google Places", api_key)
-        self.rate_limit = 50
     
     async def search_company(self, name: str, state: Optional[str] = None) -> List[Dict]:
-        await self.init_session()
-        await self.rate_limit_wait()
-        
-        try:
-            query = f"{name} {state}" if state else name
-            url = f"{self.BASE_URL}/textsearch/json"
-            params = {
-                "query": query,
-                "type": "establishment",
-                "key": self.api_key
-            }
-            
-            async with self.session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data.get("results", [])
-        except Exception as e:
-            logger.error(f"Google Places search error: {e}")
-        
-        return []
+        query = f"{name} {state}" if state else name
+        url = f"{self.BASE_URL}/textsearch/json"
+        params = {
+            "query": query,
+            "type": "establishment",
+            "key": self.api_key
+        }
+        data = await self.get_json(url, params=params)
+        return data.get("results", []) if data else []
     
     async def get_company_details(self, place_id: str) -> Optional[Dict]:
         """Get detailed business info from Google Places"""
-        await self.init_session()
-        await self.rate_limit_wait()
-        
-        try:
-            url = f"{self.BASE_URL}/details/json"
-            params = {
-                "place_id": place_id,
-                "fields": "name,formatted_address,formatted_phone_number,website,rating,user_ratings_total,reviews,opening_hours,business_status,types",
-                "key": self.api_key
-            }
-            
-            async with self.session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data.get("result", {})
-        except Exception as e:
-            logger.error(f"Google Places details error: {e}")
-        
-        return None
+        url = f"{self.BASE_URL}/details/json"
+        params = {
+            "place_id": place_id,
+            "fields": "name,formatted_address,formatted_phone_number,website,rating,user_ratings_total,reviews,opening_hours,business_status,types",
+            "key": self.api_key
+        }
+        data = await self.get_json(url, params=params)
+        return data.get("result", {}) if data else None
     
     def parse_to_company_data(self, place_data: Dict) -> Optional[CompanyData]:
         """Convert Google Places data to CompanyData"""
@@ -477,46 +492,23 @@ class YelpSource(DataSource):
     
     def __init__(self, api_key: str):
         super().__init__("Yelp", api_key)
-        self.rate_limit = 5
     
     async def search_company(self, name: str, state: Optional[str] = None) -> List[Dict]:
-        await self.init_session()
-        await self.rate_limit_wait()
-        
-        try:
-            url = f"{self.BASE_URL}/businesses/search"
-            headers = {"Authorization": f"Bearer {self.api_key}"}
-            params = {
-                "term": name,
-                "location": state if state else "United States",
-                "limit": 10
-            }
-            
-            async with self.session.get(url, headers=headers, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data.get("businesses", [])
-        except Exception as e:
-            logger.error(f"Yelp search error: {e}")
-        
-        return []
+        url = f"{self.BASE_URL}/businesses/search"
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        params = {
+            "term": name,
+            "location": state if state else "United States",
+            "limit": 10
+        }
+        data = await self.get_json(url, params=params, headers=headers)
+        return data.get("businesses", []) if data else []
     
     async def get_company_details(self, business_id: str) -> Optional[Dict]:
         """Get business details from Yelp"""
-        await self.init_session()
-        await self.rate_limit_wait()
-        
-        try:
-            url = f"{self.BASE_URL}/businesses/{business_id}"
-            headers = {"Authorization": f"Bearer {self.api_key}"}
-            
-            async with self.session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    return await response.json()
-        except Exception as e:
-            logger.error(f"Yelp details error: {e}")
-        
-        return None
+        url = f"{self.BASE_URL}/businesses/{business_id}"
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        return await self.get_json(url, headers=headers)
 
 
 # ==========================================
@@ -530,51 +522,32 @@ class OpenCorporatesSource(DataSource):
     
     def __init__(self, api_key: Optional[str] = None):
         super().__init__("OpenCorporates", api_key)
-        self.rate_limit = 1  # Free tier is very limited
     
     async def search_company(self, name: str, state: Optional[str] = None) -> List[Dict]:
-        await self.init_session()
-        await self.rate_limit_wait()
+        url = f"{self.BASE_URL}/companies/search"
+        params = {
+            "q": name,
+            "jurisdiction_code": f"us_{state.lower()}" if state else "us",
+            "per_page": 10
+        }
+        if self.api_key:
+            params["api_token"] = self.api_key
         
-        try:
-            url = f"{self.BASE_URL}/companies/search"
-            params = {
-                "q": name,
-                "jurisdiction_code": f"us_{state.lower()}" if state else "us",
-                "per_page": 10
-            }
-            if self.api_key:
-                params["api_token"] = self.api_key
-            
-            async with self.session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    companies = data.get("results", {}).get("companies", [])
-                    return [c.get("company", {}) for c in companies]
-        except Exception as e:
-            logger.error(f"OpenCorporates search error: {e}")
-        
-        return []
+        data = await self.get_json(url, params=params)
+        if not data:
+            return []
+        companies = data.get("results", {}).get("companies", [])
+        return [c.get("company", {}) for c in companies]
     
     async def get_company_details(self, jurisdiction: str, company_number: str) -> Optional[CompanyData]:
         """Get company details from OpenCorporates"""
-        await self.init_session()
-        await self.rate_limit_wait()
-        
-        try:
-            url = f"{self.BASE_URL}/companies/{jurisdiction}/{company_number}"
-            params = {}
-            if self.api_key:
-                params["api_token"] = self.api_key
-            
-            async with self.session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return self._parse_opencorp_data(data.get("results", {}).get("company", {}))
-        except Exception as e:
-            logger.error(f"OpenCorporates details error: {e}")
+        url = f"{self.BASE_URL}/companies/{jurisdiction}/{company_number}"
+        params = {}
+        if self.api_key:
+            params["api_token"] = self.api_key
         
-        return None
+        data = await self.get_json(url, params=params)
+        return self._parse_opencorp_data(data.get("results", {}).get("company", {})) if data else None
     
     def _parse_opencorp_data(self, data: Dict) -> CompanyData:
         """Parse OpenCorporates data"""
@@ -622,11 +595,66 @@ class OpenCorporatesSource(DataSource):
 # DATA AGGREGATOR
 # ==========================================
 
+@dataclass
+class BulkProgress:
+    """Progress of a DataAggregator.enrich_companies run"""
+    submitted: int = 0                  # companies taken from the input so far
+    completed: int = 0                  # companies all sources are done with
+    found: int = 0                      # completed companies with data
+    started: float = field(default_factory=time.monotonic)
+    # Per source (by name): queued, done, errors, skipped (circuit open / quota), timeouts
+    sources: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    
+    @property
+    def rate(self) -> float:
+        """Completed companies per second"""
+        elapsed = time.monotonic() - self.started
+        return self.completed / elapsed if elapsed > 0 else 0.0
+    
+    def to_dict(self) -> Dict:
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "found": self.found,
+            "in_flight": self.submitted - self.completed,
+            "per_second": round(self.rate, 2),
+            "sources": self.sources,
+        }
+
+
+@dataclass
+class _BulkJob:
+    name: str
+    state: Optional[str]
+    query: Tuple
+    pending: int
+    master: Optional[CompanyData] = None
+
+
+def _encode_result(value: Any) -> Any:
+    """Source result -> JSON-serializable form for the result cache"""
+    if isinstance(value, CompanyData):
+        return {"company_data": asdict(value)}
+    return value
+
+
+def _decode_result(value: Any) -> Any:
+    if isinstance(value, dict) and set(value) == {"company_data"}:
+        return CompanyData.from_dict(value["company_data"])
+    return value
+
+
 class DataAggregator:
     """Aggregates data from multiple sources"""
     
-    def __init__(self):
+    def __init__(self, results: Optional[ResultCache] = None, deadline: Optional[float] = None):
         self.sources: List[DataSource] = []
+        # Seconds get_full_company_data waits for the sources before returning partial data
+        self.deadline = AGGREGATE_DEADLINE if deadline is None else deadline
+        # Concurrent identical lookups (same company, CIK, place_id, ...) share one upstream call
+        self.flight = SingleFlight()
+        # Parsed per-source results persisted across runs (see result_cache.RESULT_CACHE_TTLS)
+        self.results = results or get_result_cache()
         self._init_sources()
     
     def _init_sources(self):
@@ -666,39 +694,129 @@ class DataAggregator:
         
         return all_results
     
-    async def get_full_company_data(self, name: str, state: Optional[str] = None) -> Optional[CompanyData]:
-        """Get comprehensive company data by aggregating all sources"""
+    async def _lookup(
+        self,
+        source: DataSource,
+        operation: str,
+        query: Tuple,
+        call: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        One source lookup, coalesced on (source, operation, normalized query)
+        and served from the result cache while the cached result is fresh.
+        An expired result is re-fetched past the HTTP cache, whose TTLs are
+        longer than NEGATIVE_TTL and would otherwise replay the stale body
+        """
+        async def cached_call():
+            found, value = await asyncio.to_thread(self.results.get, source.cache_source, operation, query)
+            if found:
+                return _decode_result(value)
+            if await asyncio.to_thread(self.results.is_expired, source.cache_source, operation, query):
+                with revalidating():
+                    value = await call()
+            else:
+                value = await call()
+            await asyncio.to_thread(self.results.put, source.cache_source, operation, query, _encode_result(value))
+            return value
+        
+        return await self.flight.do((source.cache_source, operation) + query, cached_call)
+    
+    def invalidate(self, source: Optional[str] = None):
+        """Drop cached results (all sources, or one source by its cache name, e.g. "yelp")"""
+        self.results.invalidate(source)
+        self.flight.forget()
+    
+    async def get_full_company_data(
+        self, name: str, state: Optional[str] = None, deadline: Optional[float] = None
+    ) -> Optional[CompanyData]:
+        """
+        Get comprehensive company data by aggregating all sources. Returns
+        whatever the sources produced within deadline seconds (default
+        AGGREGATE_DEADLINE).
+        """
+        return await self.flight.do(
+            ("aggregate", name_key(name), (state or "").upper()),
+            lambda: self._aggregate_company_data(name, state, deadline)
+        )
+    
+    async def _source_company_data(
+        self, source: DataSource, name: str, state: Optional[str], query: Tuple
+    ) -> Optional[CompanyData]:
+        """Search one source and fetch details for its first match"""
+        results = await self._lookup(
+            source, "search", query, lambda: source.search_company(name, state)
+        )
+        if not results:
+            return None
+        
+        if isinstance(source, GooglePlacesSource):
+            place_id = results[0].get("place_id")
+            if place_id:
+                details = await self._lookup(
+                    source, "details", (place_id,), lambda: source.get_company_details(place_id)
+                )
+                if details:
+                    return source.parse_to_company_data(details)
+        
+        elif isinstance(source, OpenCorporatesSource):
+            jurisdiction = results[0].get("jurisdiction_code", "")
+            company_number = results[0].get("company_number", "")
+            if jurisdiction and company_number:
+                return await self._lookup(
+                    source, "details", (jurisdiction, company_number),
+                    lambda: source.get_company_details(jurisdiction, company_number)
+                )
+        
+        elif isinstance(source, SECEdgarSource):
+            cik = results[0].get("cik", "")
+            if cik:
+                return await self._lookup(
+                    source, "details", (str(cik).zfill(10),), lambda: source.get_company_details(cik)
+                )
+        
+        return None
+    
+    async def _aggregate_company_data(
+        self, name: str, state: Optional[str] = None, deadline: Optional[float] = None
+    ) -> Optional[CompanyData]:
+        """
+        Query all sources concurrently and merge their results as they land.
+        Sources still running when the deadline passes are left out of the
+        result; their shared lookups keep running and land in the result
+        cache for the next request.
+        """
         master_data = None
+        query = (name_key(name), (state or "").upper())
+        deadline = self.deadline if deadline is None else deadline
         
-        for source in self.sources:
-            try:
-                results = await source.search_company(name, state)
-                if results:
-                    # Get details from first match
-                    if hasattr(source, 'get_company_details'):
-                        if isinstance(source, GooglePlacesSource) and results:
-                            place_id = results[0].get("place_id")
-                            if place_id:
-                                details = await source.get_company_details(place_id)
-                                if details:
-                                    company = source.parse_to_company_data(details)
-                                    master_data = self._merge_data(master_data, company)
-                        
-                        elif isinstance(source, OpenCorporatesSource) and results:
-                            jurisdiction = results[0].get("jurisdiction_code", "")
-                            company_number = results[0].get("company_number", "")
-                            if jurisdiction and company_number:
-                                company = await source.get_company_details(jurisdiction, company_number)
-                                master_data = self._merge_data(master_data, company)
-                        
-                        elif isinstance(source, SECEdgarSource) and results:
-                            cik = results[0].get("cik", "")
-                            if cik:
-                                company = await source.get_company_details(cik)
-                                master_data = self._merge_data(master_data, company)
-            
-            except Exception as e:
-                logger.error(f"Error getting data from {source.name}: {e}")
+        tasks = {
+            asyncio.ensure_future(self._source_company_data(source, name, state, query)): source
+            for source in self.sources
+        }
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + deadline
+        pending = set(tasks)
+        try:
+            while pending:
+                remaining = deadline_at - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    source = tasks[task]
+                    try:
+                        master_data = self._merge_data(master_data, task.result())
+                    except SourceUnavailableError as e:
+                        logger.warning(f"Skipping {source.name}: {e}")
+                    except Exception as e:
+                        logger.error(f"Error getting data from {source.name}: {e!r}")
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        if pending:
+            late = ", ".join(tasks[task].name for task in pending)
+            logger.warning(f"Deadline of {deadline:g}s passed for {name}; returning without {late}")
         
         if master_data:
             master_data.calculate_quality_score()
@@ -724,6 +842,14 @@ class DataAggregator:
         if not master.ein and new.ein:
             master.ein = new.ein
         
+        # Names that differ from the master name (after canonicalization) are kept as DBAs
+        known_names = {canonical_company_name(n) for n in [master.name, *master.dba_names]}
+        for name in [new.name, *new.dba_names]:
+            canonical = canonical_company_name(name)
+            if canonical and canonical not in known_names:
+                master.dba_names.append(name)
+                known_names.add(canonical)
+        
         # Merge contact
         if new.contact:
             if not master.contact:
@@ -738,10 +864,11 @@ class DataAggregator:
         
         # Merge executives
         if new.executives:
-            existing_names = {e.name.lower() for e in master.executives}
+            existing_names = {name_key(e.name) for e in master.executives}
             for exec in new.executives:
-                if exec.name.lower() not in existing_names:
+                if name_key(exec.name) not in existing_names:
                     master.executives.append(exec)
+                    existing_names.add(name_key(exec.name))
         
         if not master.ceo and new.ceo:
             master.ceo = new.ceo
@@ -771,10 +898,135 @@ class DataAggregator:
         master.last_updated = datetime.now().isoformat()
         return master
     
+    async def enrich_companies(
+        self,
+        companies: Iterable[Tuple[str, Optional[str]]],
+        concurrency: int = BULK_CONCURRENCY,
+        source_concurrency: Optional[Dict[str, int]] = None,
+        deadline: Optional[float] = None,
+        on_progress: Optional[Callable[[BulkProgress], None]] = None,
+    ) -> AsyncIterator[CompanyData]:
+        """
+        Enrich many (name, state) pairs, yielding merged CompanyData as each
+        company completes (companies no source knows are not yielded).
+        
+        Every source has its own work queue served by source_concurrency
+        workers (default BULK_SOURCE_CONCURRENCY), so fast sources run ahead
+        of slow ones; at most `concurrency` companies are in flight, which
+        bounds memory and how far ahead they get. A company completes without a
+        source whose search->details chain takes longer than deadline seconds;
+        that lookup still holds its worker until it ends. on_progress is called
+        after every completed company.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        limits = {**BULK_SOURCE_CONCURRENCY, **(source_concurrency or {})}
+        progress = BulkProgress(sources={
+            source.name: {"queued": 0, "done": 0, "errors": 0, "skipped": 0, "timeouts": 0}
+            for source in self.sources
+        })
+        queues: Dict[str, asyncio.Queue] = {source.name: asyncio.Queue() for source in self.sources}
+        finished: asyncio.Queue = asyncio.Queue()
+        slots = asyncio.Semaphore(concurrency)
+        
+        def source_done(job: _BulkJob):
+            job.pending -= 1
+            if not job.pending:
+                finished.put_nowait(job)
+        
+        async def worker(source: DataSource):
+            queue = queues[source.name]
+            stats = progress.sources[source.name]
+            while True:
+                job = await queue.get()
+                stats["queued"] -= 1
+                lookup = asyncio.ensure_future(
+                    self._source_company_data(source, job.name, job.state, job.query)
+                )
+                try:
+                    done, _ = await asyncio.wait({lookup}, timeout=deadline)
+                    if not done:
+                        # The company goes on without this source; the worker
+                        # stays busy until the call ends so the cap holds
+                        stats["timeouts"] += 1
+                        source_done(job)
+                        await asyncio.wait({lookup})
+                        if not lookup.cancelled():
+                            lookup.exception()
+                        continue
+                except asyncio.CancelledError:
+                    lookup.cancel()
+                    raise
+                try:
+                    job.master = self._merge_data(job.master, lookup.result())
+                    stats["done"] += 1
+                except (SourceUnavailableError, QuotaExceededError) as e:
+                    stats["skipped"] += 1
+                    logger.debug(f"Skipping {source.name} for {job.name}: {e}")
+                except Exception as e:
+                    stats["errors"] += 1
+                    logger.error(f"Error getting data from {source.name} for {job.name}: {e!r}")
+                source_done(job)
+        
+        async def feed():
+            try:
+                for name, state in companies:
+                    if not name:
+                        continue
+                    await slots.acquire()
+                    job = _BulkJob(name, state, (name_key(name), (state or "").upper()), len(self.sources))
+                    progress.submitted += 1
+                    for source in self.sources:
+                        progress.sources[source.name]["queued"] += 1
+                        queues[source.name].put_nowait(job)
+                    if not self.sources:
+                        finished.put_nowait(job)
+            finally:
+                finished.put_nowait(None)
+        
+        workers = [
+            asyncio.ensure_future(worker(source))
+            for source in self.sources
+            for _ in range(limits.get(source.cache_source, DEFAULT_SOURCE_CONCURRENCY))
+        ]
+        feeder = asyncio.ensure_future(feed())
+        try:
+            fed = False
+            while not fed or progress.completed < progress.submitted:
+                job = await finished.get()
+                if job is None:
+                    fed = True
+                    continue
+                slots.release()
+                progress.completed += 1
+                if job.master:
+                    job.master.calculate_quality_score()
+                    progress.found += 1
+                if on_progress:
+                    on_progress(progress)
+                if progress.completed % BULK_PROGRESS_INTERVAL == 0:
+                    logger.info(
+                        f"Enriched {progress.completed}/{progress.submitted} companies "
+                        f"({progress.found} found, {progress.rate:.1f}/s)"
+                    )
+                if job.master:
+                    yield job.master
+            # Surface errors from iterating the input
+            await feeder
+        finally:
+            feeder.cancel()
+            for task in workers:
+                task.cancel()
+        
+        logger.info(
+            f"Bulk enrichment done: {progress.completed} companies, {progress.found} found "
+            f"in {time.monotonic() - progress.started:.1f}s"
+        )
+    
     async def close(self):
         """Close all data source sessions"""
         for source in self.sources:
             await source.close_session()
+        save_rate_quotas()
 
 
 # ==========================================
@@ -801,6 +1053,7 @@ async def main():
     
     finally:
         await aggregator.close()
+        await close_http_client()
 
 
 if __name__ == "__main__":
@@ -14,7 +14,11 @@ from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
 from supabase import create_client, Client
 
-from comprehensive_scraper import DataAggregator, CompanyData
+from comprehensive_scraper import BulkProgress, DataAggregator, CompanyData
+from http_cache import get_http_cache
+from http_client import close_http_client, get_http_client
+from rate_limiter import get_rate_limit_stats, rate_limit_job
+from resilience import get_resilience_stats
 from state_registry_scraper import StateRegistryScraper, BBBScraper
 
 # Configure logging
@@ -62,6 +66,15 @@ class DataSyncManager:
             "errors": 0,
             "total_runs": 0
         }
+        # Progress of the latest bulk enrichment run
+        self.enrichment: Optional[BulkProgress] = None
+    
+    def enrich_companies(self, pairs: list):
+        """Stream fresh data for (name, state) pairs, tracking progress for the status"""
+        return self.aggregator.enrich_companies(pairs, on_progress=self._track_enrichment)
+    
+    def _track_enrichment(self, progress: BulkProgress):
+        self.enrichment = progress
     
     async def sync_company(self, company: CompanyData):
         """Sync single company to database"""
@@ -249,21 +262,10 @@ class DataSyncManager:
             companies = await self.get_companies_to_update(100)
             logger.info(f"Found {len(companies)} companies to update")
             
-            for company_data in companies:
-                name = company_data.get("name", "")
-                state = company_data.get("state", "")
-                
-                if name:
-                    # Fetch fresh data
-                    fresh_data = await self.aggregator.get_full_company_data(name, state)
-                    
-                    if fresh_data:
-                        success = await self.sync_company(fresh_data)
-                        if success:
-                            updated += 1
-                    
-                    # Rate limit
-                    await asyncio.sleep(0.5)
+            pairs = [(c.get("name", ""), c.get("state", "")) for c in companies]
+            async for fresh_data in self.enrich_companies(pairs):
+                if await self.sync_company(fresh_data):
+                    updated += 1
             
             self.stats["companies_updated"] = updated
             logger.info(f"Update cycle complete. Updated {updated} companies.")
@@ -281,15 +283,15 @@ class DataSyncManager:
         
         # Search state registries
         if state:
-            results = await self.state_scraper.search_state_registry(industry, state)
-            for result in results[:50]:
-                name = result.get("name", "")
-                if name:
-                    company = await self.aggregator.get_full_company_data(name, state)
-                    if company:
-                        await self.sync_company(company)
-                        discovered += 1
-                    await asyncio.sleep(0.5)
+            try:
+                results = await self.state_scraper.search_state_registry(industry, state)
+            except Exception as e:
+                logger.error(f"State registry search failed for {state}: {e!r}")
+                results = []
+            pairs = [(result.get("name", ""), state) for result in results[:50]]
+            async for company in self.enrich_companies(pairs):
+                await self.sync_company(company)
+                discovered += 1
         
         logger.info(f"Discovered {discovered} new companies")
         return discovered
@@ -348,7 +350,8 @@ class DataScheduler:
     async def _run_update_job(self):
         """Run the main update job"""
         logger.info("Running scheduled update job...")
-        await self.sync_manager.run_update_cycle()
+        with rate_limit_job("main_update"):
+            await self.sync_manager.run_update_cycle()
     
     async def _run_discovery_job(self):
         """Run company discovery job"""
@@ -358,10 +361,11 @@ class DataScheduler:
         states = ["CA", "TX", "NY", "FL", "IL", "PA", "OH", "GA", "NC", "MI"]
         industries = ["construction", "roofing", "plumbing", "electrical", "hvac"]
         
-        for state in states:
-            for industry in industries:
-                await self.sync_manager.discover_new_companies(industry, state)
-                await asyncio.sleep(60)  # Wait between searches
+        with rate_limit_job("daily_discovery"):
+            for state in states:
+                for industry in industries:
+                    await self.sync_manager.discover_new_companies(industry, state)
+                    await asyncio.sleep(60)  # Wait between searches
     
     async def _run_deep_refresh(self):
         """Run deep refresh of all data"""
@@ -373,15 +377,11 @@ class DataScheduler:
         try:
             result = self.sync_manager.supabase.table("companies").select("name,state").execute()
             
-            for company in result.data:
-                name = company.get("name", "")
-                state = company.get("state", "")
-                
-                if name:
-                    fresh_data = await self.sync_manager.aggregator.get_full_company_data(name, state)
-                    if fresh_data:
-                        await self.sync_manager.sync_company(fresh_data)
-                    await asyncio.sleep(1)
+            # Pacing comes from the per-source rate limiters
+            with rate_limit_job("weekly_refresh"):
+                pairs = [(c.get("name", ""), c.get("state", "")) for c in result.data]
+                async for fresh_data in self.sync_manager.enrich_companies(pairs):
+                    await self.sync_manager.sync_company(fresh_data)
         
         except Exception as e:
             logger.error(f"Error in deep refresh: {e}")
@@ -414,7 +414,14 @@ class DataScheduler:
         return {
             "running": self.is_running,
             "jobs": jobs,
-            "stats": self.sync_manager.stats
+            "stats": self.sync_manager.stats,
+            "http_cache": get_http_cache().get_stats(),
+            "http_pool": get_http_client().get_stats(),
+            "rate_limits": get_rate_limit_stats(),
+            "resilience": get_resilience_stats(),
+            "single_flight": self.sync_manager.aggregator.flight.get_stats(),
+            "result_cache": self.sync_manager.aggregator.results.get_stats(),
+            "enrichment": self.sync_manager.enrichment.to_dict() if self.sync_manager.enrichment else None
         }
 
 
@@ -444,6 +451,7 @@ async def main():
     finally:
         scheduler.stop()
         await scheduler.sync_manager.close()
+        await close_http_client()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,264 @@
+"""
+企业实体消解
+MinHash/LSH 对标准化名称分块, 电话和执照号精确分块, 候选对按名称、电话、地址、
+执照号综合打分 (可多进程并行), 匹配对用并查集合并, 输出每条记录的簇 id
+"""
+
+import os
+import re
+import zlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from company_index import name_trigrams
+from name_normalizer import canonical_company_name, name_key
+
+# MinHash 使用的梅森素数 (2^31 - 1), 保证 a * x + b 不超出 uint64
+_PRIME = np.uint64((1 << 31) - 1)
+_NON_DIGITS = re.compile(r'\D')
+_NON_ALNUM = re.compile(r'[^0-9A-Z]')
+
+
+@dataclass
+class EntityRecord:
+    """参与消解的字段 (已标准化)"""
+    name: str
+    phone: str
+    address: str
+    license: str
+    state: str
+    city: str
+    grams: FrozenSet[str] = frozenset()
+
+
+@dataclass
+class ResolutionResult:
+    """消解结果: cluster_ids[i] 为第 i 条记录所在簇 (簇内最小的记录序号)"""
+    cluster_ids: List[int]
+    candidate_pairs: int
+    matched_pairs: int
+
+    def clusters(self) -> Dict[int, List[int]]:
+        """簇 id -> 记录序号列表 (只含多于一条记录的簇)"""
+        groups: Dict[int, List[int]] = {}
+        for index, cluster_id in enumerate(self.cluster_ids):
+            groups.setdefault(cluster_id, []).append(index)
+        return {cid: members for cid, members in groups.items() if len(members) > 1}
+
+
+def entity_record(item: Any) -> EntityRecord:
+    """从企业对象 (scraper.Company 等) 或字典提取并标准化字段"""
+    if isinstance(item, dict):
+        field = item.get
+    else:
+        field = lambda name: getattr(item, name, None)
+    phone = _NON_DIGITS.sub('', field('phone') or '')[-10:]
+    name = canonical_company_name(field('name') or '')
+    return EntityRecord(
+        name=name,
+        phone=phone if len(phone) == 10 else '',
+        address=name_key(field('address') or ''),
+        license=_NON_ALNUM.sub('', (field('license_number') or '').upper()),
+        state=(field('state_code') or field('state') or '').upper(),
+        city=name_key(field('city') or ''),
+        grams=frozenset(name_trigrams(name)) if name else frozenset(),
+    )
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+def score_pair(a: EntityRecord, b: EntityRecord) -> float:
+    """
+    两条记录是同一实体的得分 (0-1)
+
+    名称相似度为主, 同城、电话相同加分, 同一州的执照号相同 (基本可确定是同一持照人) 大幅加分, 州不同或电话冲突减分
+    """
+    similarity = _jaccard(a.grams, b.grams)
+    if similarity == 1.0 and a.name != b.name:
+        # 三元组集合相同但名称不同 (如 '111' 与 '1111')
+        similarity = 0.95
+    score = 0.6 * similarity
+    if a.address and b.address:
+        score += 0.2 * _jaccard(set(a.address.split()), set(b.address.split()))
+    if a.city and a.city == b.city and a.state == b.state:
+        score += 0.15
+    if a.phone and b.phone:
+        score += 0.25 if a.phone == b.phone else -0.1
+    if a.license and a.license == b.license:
+        score += 0.5
+    if a.state and b.state and a.state != b.state:
+        score -= 0.3
+    return max(0.0, min(1.0, score))
+
+
+# 工作进程中的记录 (fork 时直接继承, 不必逐对序列化)
+_WORKER_RECORDS: List[EntityRecord] = []
+
+
+def _init_worker(records: List[EntityRecord]):
+    global _WORKER_RECORDS
+    _WORKER_RECORDS = records
+
+
+def _score_chunk(args: Tuple[List[Tuple[int, int]], float]) -> List[Tuple[int, int]]:
+    pairs, threshold = args
+    records = _WORKER_RECORDS
+    return [(i, j) for i, j in pairs if score_pair(records[i], records[j]) >= threshold]
+
+
+class EntityResolver:
+    """
+    企业实体消解
+
+    num_perm 个 MinHash 分成 bands 段, 任一段完全相同的记录成为候选对
+    (名称三元组 Jaccard 约 0.8 以上时大概率被召回); 名称差异较大的重复记录靠电话、
+    州+执照号精确分块召回。
+    超过 max_bucket 条记录的桶 (如极常见的名称) 不展开, 避免候选对爆炸
+    """
+
+    def __init__(
+        self,
+        num_perm: int = 64,
+        bands: int = 8,
+        threshold: float = 0.75,
+        max_bucket: int = 200,
+        workers: Optional[int] = None,
+        chunk_size: int = 50000,
+        seed: int = 1
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm 必须是 bands 的整数倍")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.threshold = threshold
+        self.max_bucket = max_bucket
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.chunk_size = chunk_size
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+
+    # ---- MinHash ----
+
+    def signatures(self, shingles: List[FrozenSet[str]]) -> np.ndarray:
+        """每条记录名称三元组的 MinHash 签名 (n x num_perm); 空名称的签名全为最大值, 不参与分块"""
+        signatures = np.full((len(shingles), self.num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+        for start in range(0, len(shingles), self.chunk_size):
+            chunk = shingles[start:start + self.chunk_size]
+            hashes: List[int] = []
+            owners: List[int] = []
+            for offset, grams in enumerate(chunk):
+                for gram in grams:
+                    hashes.append(zlib.crc32(gram.encode()))
+                    owners.append(offset)
+            if not hashes:
+                continue
+
+            values = np.asarray(hashes, dtype=np.uint64)
+            owners_array = np.asarray(owners)
+            starts = np.flatnonzero(np.r_[True, owners_array[1:] != owners_array[:-1]])
+            rows = start + owners_array[starts]
+            for p in range(self.num_perm):
+                permuted = (self._a[p] * values + self._b[p]) % _PRIME
+                signatures[rows, p] = np.minimum.reduceat(permuted, starts)
+        return signatures
+
+    # ---- 分块 ----
+
+    def _bucket_pairs(self, keys: np.ndarray, valid: np.ndarray, pairs: Set[Tuple[int, int]]):
+        """键相同的记录两两成对 (跳过过大的桶)"""
+        indices = np.flatnonzero(valid)
+        if not len(indices):
+            return
+        order = indices[np.argsort(keys[indices], kind='stable')]
+        sorted_keys = keys[order]
+        boundaries = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1], True])
+        for left, right in zip(boundaries[:-1], boundaries[1:]):
+            size = right - left
+            if size < 2 or size > self.max_bucket:
+                continue
+            members = order[left:right].tolist()
+            for x in range(size):
+                for y in range(x + 1, size):
+                    i, j = members[x], members[y]
+                    pairs.add((i, j) if i < j else (j, i))
+
+    def candidate_pairs(self, records: List[EntityRecord]) -> Set[Tuple[int, int]]:
+        pairs: Set[Tuple[int, int]] = set()
+
+        signatures = self.signatures([r.grams for r in records])
+        has_name = np.array([bool(r.name) for r in records])
+        rows = self.num_perm // self.bands
+        multipliers = np.array([0x9E3779B97F4A7C15 >> (7 * k) | 1 for k in range(rows)], dtype=np.uint64)
+        for band in range(self.bands):
+            block = signatures[:, band * rows:(band + 1) * rows]
+            with np.errstate(over='ignore'):
+                keys = (block * multipliers).sum(axis=1, dtype=np.uint64)
+            self._bucket_pairs(keys, has_name, pairs)
+
+        for field in ('phone', 'license'):
+            values = [
+                f"{r.state}:{r.license}" if field == 'license' else r.phone
+                for r in records
+            ]
+            _, keys = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+            self._bucket_pairs(keys, np.array([bool(getattr(r, field)) for r in records]), pairs)
+        return pairs
+
+    # ---- 打分与聚类 ----
+
+    def _score_pairs(self, records: List[EntityRecord], pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        chunk = 20000
+        if self.workers <= 1 or len(pairs) <= chunk:
+            _init_worker(records)
+            return _score_chunk((pairs, self.threshold))
+
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        tasks = [(pairs[i:i + chunk], self.threshold) for i in range(0, len(pairs), chunk)]
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(records,)
+        ) as executor:
+            matched: List[Tuple[int, int]] = []
+            for result in executor.map(_score_chunk, tasks):
+                matched.extend(result)
+        return matched
+
+    def resolve(self, items: Iterable[Any]) -> ResolutionResult:
+        """对企业对象/字典做消解, 返回与输入顺序一致的簇 id"""
+        records = [item if isinstance(item, EntityRecord) else entity_record(item) for item in items]
+        pairs = sorted(self.candidate_pairs(records))
+        matched = self._score_pairs(records, pairs)
+
+        parent = list(range(len(records)))
+
+        def find(x: int) -> int:
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for i, j in matched:
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                # 以较小的序号为根, 簇 id 因此是簇内最小的记录序号
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+        return ResolutionResult(
+            cluster_ids=[find(i) for i in range(len(records))],
+            candidate_pairs=len(pairs),
+            matched_pairs=len(matched)
+        )
@@ -0,0 +1,360 @@
+"""
+On-disk HTTP cache for scraper sessions
+Stores response bodies with their ETag / Last-Modified validators and
+revalidates stale entries with conditional requests
+"""
+
+import os
+import json
+import asyncio
+import contextvars
+import time
+import sqlite3
+import threading
+import hashlib
+import logging
+from contextlib import contextmanager
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Dict, Iterable, Mapping, Optional, Tuple, Union
+from urllib.parse import urlencode
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from sync_state import STATE_DIR
+
+logger = logging.getLogger(__name__)
+
+HTTP_CACHE_PATH = os.path.join(STATE_DIR, 'http_cache.sqlite3')
+
+# Freshness per source in seconds. Within the TTL a cached body is served
+# without touching the network; after it the entry is revalidated with a
+# conditional request. TTL 0 means "always revalidate".
+HTTP_CACHE_TTLS = {
+    "sec_edgar": 24 * 3600,
+    "opencorporates": 7 * 24 * 3600,
+    "state_registry": 24 * 3600,
+    "bbb": 24 * 3600,
+    "osha": 7 * 24 * 3600,
+    "google_places": 30 * 60,
+    "yelp": 30 * 60,
+    "open_data": 0,
+}
+DEFAULT_TTL = 3600
+
+# Response headers as stored: a mapping, or (name, value) pairs so repeated headers survive
+Headers = Union[Mapping[str, str], Iterable[Tuple[str, str]]]
+
+# Size bounds
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+MAX_ENTRY_BYTES = 8 * 1024 * 1024
+
+# Set while the current task must not be served fresh cached bodies
+force_revalidate: contextvars.ContextVar[bool] = contextvars.ContextVar('http_cache_revalidate', default=False)
+
+
+@contextmanager
+def revalidating():
+    """
+    GETs made inside the block (and tasks spawned from it) skip fresh cache
+    hits and go to the network, sending the stored validators if any
+    """
+    token = force_revalidate.set(True)
+    try:
+        yield
+    finally:
+        force_revalidate.reset(token)
+
+
+class CachedResponse:
+    """Response replayed from the cache (mirrors the aiohttp response API we use)"""
+
+    def __init__(self, url: str, status: int, headers: Headers, body: bytes, from_cache: bool):
+        self.url = url
+        self.status = status
+        self.headers = CIMultiDict(headers)
+        self.body = body
+        self.from_cache = from_cache
+
+    async def read(self) -> bytes:
+        return self.body
+
+    async def text(self, encoding: Optional[str] = None, **kwargs) -> str:
+        return self.body.decode(encoding or 'utf-8', errors='replace')
+
+    async def json(self, loads=json.loads, **kwargs) -> Any:
+        return loads(self.body.decode('utf-8'))
+
+    @property
+    def reason(self) -> str:
+        try:
+            return HTTPStatus(self.status).phrase
+        except ValueError:
+            return ""
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            url = URL(self.url)
+            raise aiohttp.ClientResponseError(
+                request_info=aiohttp.RequestInfo(
+                    url=url, method='GET', headers=CIMultiDictProxy(CIMultiDict()), real_url=url
+                ),
+                history=(),
+                status=self.status,
+                message=self.reason,
+            )
+
+    def release(self):
+        pass
+
+
+class HTTPCache:
+    """
+    SQLite-backed response store with LRU eviction and hit/miss counters.
+    Methods are blocking and thread-safe; CachedSession runs them in worker
+    threads so disk I/O stays off the event loop
+    """
+
+    def __init__(
+        self,
+        path: str = HTTP_CACHE_PATH,
+        ttls: Optional[Dict[str, int]] = None,
+        max_bytes: int = MAX_CACHE_BYTES,
+        max_entry_bytes: int = MAX_ENTRY_BYTES,
+    ):
+        self.path = path
+        self.ttls = dict(HTTP_CACHE_TTLS if ttls is None else ttls)
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self.lock = threading.RLock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self.db.commit()
+        # Running total of stored body sizes, kept up to date by store/evict/invalidate
+        self.total_bytes = self._sum_sizes()
+
+    def _sum_sizes(self) -> int:
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(method: str, url: str, params: Optional[Dict] = None) -> str:
+        query = urlencode(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+        return hashlib.sha256(f"{method.upper()} {url}?{query}".encode()).hexdigest()
+
+    def ttl_for(self, source: str) -> int:
+        return self.ttls.get(source, DEFAULT_TTL)
+
+    def _count(self, source: str, counter: str, amount: int = 1):
+        with self.lock:
+            source_stats = self.stats.setdefault(source, {
+                "hits": 0, "revalidated": 0, "misses": 0,
+                "stores": 0, "evictions": 0, "bytes_saved": 0,
+            })
+            source_stats[counter] += amount
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT status, headers, body, etag, last_modified, stored_at FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+        if not row:
+            return None
+        status, headers, body, etag, last_modified, stored_at = row
+        return {
+            "status": status,
+            "headers": json.loads(headers),
+            "body": body,
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": stored_at,
+        }
+
+    def touch(self, key: str, refreshed: bool = False):
+        now = time.time()
+        with self.lock:
+            if refreshed:
+                self.db.execute("UPDATE responses SET accessed_at = ?, stored_at = ? WHERE key = ?", (now, now, key))
+            else:
+                self.db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.db.commit()
+
+    def store(self, key: str, source: str, url: str, status: int, headers: Headers, body: bytes) -> bool:
+        """
+        Store a response; returns False when it is not worth keeping: too large,
+        or from a TTL-0 source without validators (never served fresh and
+        never revalidated, so it could not be reused)
+        """
+        if len(body) > self.max_entry_bytes:
+            return False
+        validators = CIMultiDict(headers)
+        etag, last_modified = validators.get('ETag'), validators.get('Last-Modified')
+        if self.ttl_for(source) <= 0 and not (etag or last_modified):
+            return False
+        now = time.time()
+        with self.lock:
+            previous = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, source, url, status, json.dumps(list(validators.items())), body,
+                 etag, last_modified, now, now, len(body))
+            )
+            self.db.commit()
+            self.total_bytes += len(body) - (previous[0] if previous else 0)
+            self._count(source, "stores")
+            self.evict()
+        return True
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        with self.lock:
+            if self.total_bytes <= self.max_bytes:
+                return
+            evicted = []
+            for key, source, size in self.db.execute(
+                "SELECT key, source, size FROM responses ORDER BY accessed_at"
+            ):
+                if self.total_bytes <= self.max_bytes:
+                    break
+                evicted.append((key,))
+                self._count(source, "evictions")
+                self.total_bytes -= size
+            self.db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+            self.db.commit()
+
+    def invalidate(self, source: Optional[str] = None):
+        """Remove all entries, or only the entries of one source"""
+        with self.lock:
+            if source is None:
+                self.db.execute("DELETE FROM responses")
+            else:
+                self.db.execute("DELETE FROM responses WHERE source = ?", (source,))
+            self.db.commit()
+            self.total_bytes = self._sum_sizes()
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-source hit/miss counters plus overall totals"""
+        totals: Dict[str, int] = {}
+        for source_stats in self.stats.values():
+            for counter, value in source_stats.items():
+                totals[counter] = totals.get(counter, 0) + value
+        return {**self.stats, "total": totals}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class _CachedGet:
+    """Async context manager returned by CachedSession.get"""
+
+    def __init__(self, session: 'CachedSession', url: str, params: Optional[Dict], kwargs: Dict):
+        self.session = session
+        self.url = url
+        self.params = params
+        self.kwargs = kwargs
+
+    async def __aenter__(self) -> CachedResponse:
+        cache = self.session.cache
+        source = self.session.source
+        key = cache.make_key('GET', self.url, self.params)
+        entry = await asyncio.to_thread(cache.lookup, key)
+
+        if entry and not force_revalidate.get() and time.time() - entry["stored_at"] < cache.ttl_for(source):
+            await asyncio.to_thread(cache.touch, key)
+            cache._count(source, "hits")
+            cache._count(source, "bytes_saved", len(entry["body"]))
+            return CachedResponse(self.url, entry["status"], entry["headers"], entry["body"], True)
+
+        headers = dict(self.kwargs.pop('headers', None) or {})
+        if entry:
+            if entry["etag"]:
+                headers['If-None-Match'] = entry["etag"]
+            if entry["last_modified"]:
+                headers['If-Modified-Since'] = entry["last_modified"]
+
+        if self.session.before_request:
+            await self.session.before_request()
+        async with self.session.raw.get(self.url, params=self.params, headers=headers, **self.kwargs) as response:
+            if self.session.on_response:
+                self.session.on_response(response.status, response.headers)
+            if response.status == 304 and entry:
+                await asyncio.to_thread(cache.touch, key, True)
+                cache._count(source, "revalidated")
+                cache._count(source, "bytes_saved", len(entry["body"]))
+                return CachedResponse(self.url, entry["status"], entry["headers"], entry["body"], True)
+
+            body = await response.read()
+            response_headers = CIMultiDict(response.headers)
+
+        cache._count(source, "misses")
+        if response.status == 200:
+            await asyncio.to_thread(cache.store, key, source, self.url, response.status, response_headers, body)
+        return CachedResponse(self.url, response.status, response_headers, body, False)
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+class CachedSession:
+    """
+    Wraps an aiohttp.ClientSession so GET requests go through the HTTP cache.
+    Other methods (post, ...) and attributes are passed through unchanged;
+    use .raw for requests that must stream the body. before_request, if given,
+    is awaited just before a GET goes to the network (cache hits skip it), and
+    on_response is called with (status, headers) for every GET that reached
+    the network.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        source: str,
+        cache: Optional[HTTPCache] = None,
+        on_response: Optional[Callable[[int, Mapping[str, str]], None]] = None,
+        before_request: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        self.raw = session
+        self.source = source
+        self.cache = cache or get_http_cache()
+        self.on_response = on_response
+        self.before_request = before_request
+
+    def get(self, url: str, params: Optional[Dict] = None, **kwargs) -> _CachedGet:
+        return _CachedGet(self, url, params, kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self.raw, name)
+
+    async def close(self):
+        await self.raw.close()
+
+
+_http_cache: Optional[HTTPCache] = None
+
+
+def get_http_cache() -> HTTPCache:
+    """Process-wide cache shared by all scrapers"""
+    global _http_cache
+    if _http_cache is None:
+        _http_cache = HTTPCache()
+    return _http_cache
@@ -0,0 +1,220 @@
+"""
+Process-wide pooled HTTP client
+All scrapers and data sources borrow sessions bound to one shared
+TCPConnector, so connection pools, DNS lookups and TLS sessions to the same
+host are reused across them. Per-host pool utilization is tracked through
+aiohttp request tracing.
+"""
+
+import time
+import asyncio
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+# Connector sizing
+MAX_CONNECTIONS = 100
+MAX_CONNECTIONS_PER_HOST = 10
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 30
+
+
+class HostPoolStats:
+    """Connection pool counters for one host"""
+
+    def __init__(self):
+        self.active = 0         # requests holding a pooled connection (through the body)
+        self.peak_active = 0
+        self.waiting = 0        # requests queued for a free connection
+        self.peak_waiting = 0
+        self.requests = 0
+        self.errors = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.queued = 0
+        self.queue_wait = 0.0
+
+    def as_dict(self, limit: int) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "peak_active": self.peak_active,
+            "waiting": self.waiting,
+            "peak_waiting": self.peak_waiting,
+            "limit": limit,
+            "utilization": round(self.active / limit, 3) if limit else 0.0,
+            "peak_utilization": round(self.peak_active / limit, 3) if limit else 0.0,
+            "requests": self.requests,
+            "errors": self.errors,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "queued": self.queued,
+            "avg_queue_wait_ms": round(1000 * self.queue_wait / self.queued, 1) if self.queued else 0.0,
+        }
+
+
+class HTTPClient:
+    """
+    Shared connection pool with a single lifecycle.
+
+    session() returns a lightweight aiohttp.ClientSession that borrows the
+    shared connector (connector_owner=False): closing it leaves the pool
+    open. close() shuts the pool down. The connector is bound to the event
+    loop it was created on and is recreated when used from a new loop.
+    """
+
+    def __init__(
+        self,
+        limit: int = MAX_CONNECTIONS,
+        limit_per_host: int = MAX_CONNECTIONS_PER_HOST,
+        dns_cache_ttl: int = DNS_CACHE_TTL,
+        keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.stats: Dict[str, HostPoolStats] = {}
+
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._trace = self._build_trace_config()
+
+    # ---- tracing ----
+
+    def _host_stats(self, url) -> HostPoolStats:
+        host = url.host or ""
+        if host not in self.stats:
+            self.stats[host] = HostPoolStats()
+        return self.stats[host]
+
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        def acquired(ctx):
+            # Redirects acquire a connection per hop but finish once; the
+            # request counts as one active connection for its whole lifetime
+            if getattr(ctx, 'holds_connection', False):
+                return
+            stats = ctx.host_stats
+            ctx.holds_connection = True
+            stats.active += 1
+            stats.peak_active = max(stats.peak_active, stats.active)
+
+        def finished(ctx):
+            if getattr(ctx, 'holds_connection', False):
+                ctx.host_stats.active -= 1
+                ctx.holds_connection = False
+
+        async def on_request_start(session, ctx, params):
+            ctx.host_stats = self._host_stats(params.url)
+            ctx.host_stats.requests += 1
+
+        async def on_request_end(session, ctx, params):
+            # Headers are in, but the connection stays checked out until the
+            # body is read or the response is released/closed
+            connection = params.response.connection
+            if connection is None:
+                finished(ctx)
+            else:
+                connection.add_callback(lambda: finished(ctx))
+
+        async def on_request_exception(session, ctx, params):
+            finished(ctx)
+            ctx.host_stats.errors += 1
+
+        async def on_queued_start(session, ctx, params):
+            ctx.queued_at = time.monotonic()
+            stats = ctx.host_stats
+            stats.waiting += 1
+            stats.peak_waiting = max(stats.peak_waiting, stats.waiting)
+
+        async def on_queued_end(session, ctx, params):
+            stats = ctx.host_stats
+            stats.waiting -= 1
+            stats.queued += 1
+            stats.queue_wait += time.monotonic() - ctx.queued_at
+
+        async def on_connection_create_end(session, ctx, params):
+            ctx.host_stats.connections_created += 1
+            acquired(ctx)
+
+        async def on_connection_reuseconn(session, ctx, params):
+            ctx.host_stats.connections_reused += 1
+            acquired(ctx)
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        trace.on_request_exception.append(on_request_exception)
+        trace.on_connection_queued_start.append(on_queued_start)
+        trace.on_connection_queued_end.append(on_queued_end)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace
+
+    # ---- lifecycle ----
+
+    @property
+    def connector(self) -> aiohttp.TCPConnector:
+        loop = asyncio.get_running_loop()
+        if self._connector is None or self._connector.closed or self._loop is not loop:
+            self._connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._loop = loop
+        return self._connector
+
+    def session(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+    ) -> aiohttp.ClientSession:
+        """A session borrowing the shared pool (must be called inside the event loop)"""
+        kwargs: Dict[str, Any] = {}
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        return aiohttp.ClientSession(
+            connector=self.connector,
+            connector_owner=False,
+            headers=headers,
+            trace_configs=[self._trace],
+            **kwargs
+        )
+
+    async def close(self):
+        if self._connector is not None and not self._connector.closed:
+            await self._connector.close()
+        self._connector = None
+        self._loop = None
+
+    # ---- metrics ----
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-host pool utilization: requests holding a connection (until the
+        response body is read or the response is released, so streamed
+        downloads count for their whole duration) against the per-host limit, plus queueing
+        for a free connection. Sustained peak_utilization of 1.0 with a
+        growing avg_queue_wait_ms means the host limit is the bottleneck.
+        """
+        return {host: stats.as_dict(self.limit_per_host) for host, stats in self.stats.items()}
+
+
+_http_client: Optional[HTTPClient] = None
+
+
+def get_http_client() -> HTTPClient:
+    """Process-wide client shared by all scrapers"""
+    global _http_client
+    if _http_client is None:
+        _http_client = HTTPClient()
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared connection pool (call once when the process is done scraping)"""
+    if _http_client is not None:
+        await _http_client.close()
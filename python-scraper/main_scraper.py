@@ -5,20 +5,33 @@ PriceCompare Pro - 主数据挖掘脚本
 
 import os
 import sys
+import csv
+import codecs
 import asyncio
 import json
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any
-from dataclasses import dataclass, asdict
+from typing import List, Dict, Optional, Any, Tuple, AsyncIterator
+from dataclasses import dataclass, asdict, field, fields
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
 import aiohttp
 import pandas as pd
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
 from tenacity import retry, stop_after_attempt, wait_exponential
 from rich.console import Console
 from rich.progress import Progress, TaskID
 
+from data_sources import STATE_PERMIT_APIS
+from http_cache import CachedSession
+from http_client import close_http_client, get_http_client
+from sync_state import WatermarkStore
+from permit_lake import PermitLake, dataclass_schema
+from price_sketch import PriceSketchStore
+from price_analyzer import ContractorMatcher, PriceCalculator
+from permit_linker import PermitLinker
+
 # 加载环境变量
 load_dotenv()
 
@@ -81,11 +94,67 @@ class Permit:
     reported_cost: Optional[float]
     source: str
     source_url: Optional[str]
+    contractor_name: Optional[str] = None  # 用于关联 company_id
+
+
+# 数据湖各表的固定结构
+LAKE_SCHEMAS = {
+    'permits': dataclass_schema(Permit),
+    'price_records': dataclass_schema(PriceRecord),
+}
+
+
+@dataclass
+class BatchWriteResult:
+    """批量写入结果"""
+    written: List[Dict] = field(default_factory=list)  # 实际写入的行 (数据库返回)
+    skipped: int = 0  # 因冲突而跳过 (或内容未变) 的行
+    updated: List[Dict] = field(default_factory=list)  # 覆盖写入的已有行中价格相关字段有变化的行
+    errors: List[Tuple[Dict, str]] = field(default_factory=list)  # (行数据, 错误信息)
+
+
+class _StreamRowParser:
+    """把逐行到达的 CSV / NDJSON 文本解析为字典"""
+    
+    def __init__(self, fmt: str):
+        if fmt not in ('csv', 'ndjson'):
+            raise ValueError(f"不支持的流式格式: {fmt}")
+        self.fmt = fmt
+        self.header: Optional[List[str]] = None
+        self.record: List[str] = []
+        self.quotes = 0
+    
+    def feed(self, line: str) -> Optional[Dict]:
+        """输入一行, 记录完整时返回该行数据"""
+        line = line.rstrip('\r')
+        if self.fmt == 'ndjson':
+            return json.loads(line) if line.strip() else None
+        
+        if not self.record and not line:
+            return None
+        
+        # 字段内可以包含换行, 引号未闭合时继续等待后续行
+        self.record.append(line)
+        self.quotes += line.count('"')
+        if self.quotes % 2:
+            return None
+        
+        fields = next(csv.reader(['\n'.join(self.record)]))
+        self.record = []
+        self.quotes = 0
+        
+        if self.header is None:
+            self.header = fields
+            return None
+        return dict(zip(self.header, fields))
 
 
 class DataScraper:
     """数据爬虫基类"""
     
+    # HTTP 缓存中的来源名, 决定缓存有效期 (见 http_cache.HTTP_CACHE_TTLS)
+    CACHE_SOURCE = 'open_data'
+    
     def __init__(self):
         self.session: Optional[aiohttp.ClientSession] = None
         self.headers = {
@@ -94,7 +163,10 @@ class DataScraper:
         }
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession(headers=self.headers)
+        self.session = CachedSession(
+            get_http_client().session(headers=self.headers),
+            source=self.CACHE_SOURCE
+        )
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -108,6 +180,38 @@ class DataScraper:
             response.raise_for_status()
             return await response.json()
     
+    async def stream_rows(
+        self,
+        url: str,
+        params: Optional[Dict] = None,
+        fmt: str = 'csv',
+        chunk_size: int = 64 * 1024
+    ) -> AsyncIterator[Dict]:
+        """
+        流式获取 CSV (首行为表头) 或 NDJSON 数据
+        边接收边解析, 逐行产出字典, 内存占用与数据总量无关
+        """
+        parser = _StreamRowParser(fmt)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        buffer = ''
+        
+        # 流式读取绕过 HTTP 缓存
+        async with self.session.raw.get(url, params=params) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(chunk_size):
+                buffer += decoder.decode(chunk)
+                *lines, buffer = buffer.split('\n')
+                for line in lines:
+                    row = parser.feed(line)
+                    if row is not None:
+                        yield row
+            
+            buffer += decoder.decode(b'', final=True)
+            if buffer:
+                row = parser.feed(buffer)
+                if row is not None:
+                    yield row
+    
     async def fetch_text(self, url: str) -> str:
         """获取文本数据"""
         async with self.session.get(url) as response:
@@ -115,40 +219,232 @@ class DataScraper:
             return await response.text()
 
 
-class ChicagoPermitScraper(DataScraper):
+class SocrataPermitScraper(DataScraper):
     """
-    芝加哥市建筑许可证数据爬虫
-    数据源: Chicago Data Portal - Building Permits
+    Socrata 开放数据平台许可证爬虫基类
+    子类提供 BASE_URL、排序键字段和 parse_permit
     """
     
-    BASE_URL = "https://data.cityofchicago.org/resource/ydr8-5enu.json"
+    BASE_URL = ''
+    
+    # 键集分页使用的排序键: (ORDER_FIELD, ID_FIELD) 在数据集中唯一且稳定
+    ORDER_FIELD = 'issue_date'
+    ID_FIELD = 'id'
+    # Socrata 系统字段, 记录最后修改时间, 用于增量同步
+    UPDATED_FIELD = ':updated_at'
+    
+    def __init__(self, request_slots: Optional[asyncio.Semaphore] = None):
+        super().__init__()
+        # 同一主机的所有爬虫共享的并发请求槽位
+        self.request_slots = request_slots
+    
+    def keyset_order(self, order_field: Optional[str] = None) -> str:
+        return f"{order_field or self.ORDER_FIELD} ASC, {self.ID_FIELD} ASC"
     
     async def fetch_permits(
         self, 
         limit: int = 1000, 
         offset: int = 0,
         work_type: Optional[str] = None,
-        start_date: Optional[str] = None
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        after: Optional[Tuple[str, str]] = None,
+        order: Optional[str] = None,
+        order_field: Optional[str] = None
     ) -> List[Dict]:
-        """获取建筑许可证数据"""
+        """
+        获取建筑许可证数据
+        
+        start_date/end_date/after 作用于 order_field (默认 ORDER_FIELD)。
+        传入 after=(字段值, id) 时按键集分页, 只返回排在该键之后的记录,
+        此时应配合 order=keyset_order(order_field) 使用, offset 被忽略
+        """
+        order_field = order_field or self.ORDER_FIELD
         params = {
+            '$select': ':*, *',  # 附带系统字段 (:id, :updated_at)
             '$limit': limit,
-            '$offset': offset,
-            '$order': 'issue_date DESC',
+            '$order': order or f"{order_field} DESC",
         }
+        if after is None:
+            params['$offset'] = offset
         
+        where = self._where_clause(work_type, start_date, end_date, after, order_field)
+        if where:
+            params['$where'] = where
+        
+        if self.request_slots is None:
+            return await self.fetch_json(self.BASE_URL, params)
+        async with self.request_slots:
+            return await self.fetch_json(self.BASE_URL, params)
+    
+    def _where_clause(
+        self,
+        work_type: Optional[str],
+        start_date: Optional[str],
+        end_date: Optional[str],
+        after: Optional[Tuple[str, str]],
+        order_field: str
+    ) -> str:
+        """构造 SoQL $where 条件"""
         where_clauses = []
         
         if work_type:
             where_clauses.append(f"work_type='{work_type}'")
         
         if start_date:
-            where_clauses.append(f"issue_date >= '{start_date}'")
+            where_clauses.append(f"{order_field} >= '{start_date}'")
         
-        if where_clauses:
-            params['$where'] = ' AND '.join(where_clauses)
+        if end_date:
+            where_clauses.append(f"{order_field} < '{end_date}'")
         
-        return await self.fetch_json(self.BASE_URL, params)
+        if after is not None:
+            last_value, last_id = after
+            where_clauses.append(
+                f"({order_field} > '{last_value}' OR "
+                f"({order_field} = '{last_value}' AND {self.ID_FIELD} > '{last_id}'))"
+            )
+        
+        return ' AND '.join(where_clauses)
+    
+    async def stream_permits(
+        self,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        work_type: Optional[str] = None,
+        order_field: Optional[str] = None,
+        fmt: str = 'csv',
+        url: Optional[str] = None,
+        limit: int = 1_000_000_000
+    ) -> AsyncIterator[Permit]:
+        """
+        流式导出许可证, 适用于多年回填
+        
+        整个结果集只发一个请求, 默认使用数据集的 SODA CSV 端点,
+        边下载边用 parse_permit 解析, 逐条产出 Permit。
+        url 可指向其他 CSV / NDJSON 导出地址 (需与 fmt 对应)
+        """
+        order_field = order_field or self.ORDER_FIELD
+        if url is None:
+            url = self.BASE_URL.rsplit('.', 1)[0] + '.csv'
+            fmt = 'csv'
+        
+        params = {
+            '$select': ':*, *',
+            '$limit': limit,
+        }
+        where = self._where_clause(work_type, start_date, end_date, None, order_field)
+        if where:
+            params['$where'] = where
+        
+        async for data in self.stream_rows(url, params, fmt=fmt):
+            permit = self.parse_permit(data)
+            if permit:
+                yield permit
+    
+    async def iter_permit_pages(
+        self,
+        start_date: str,
+        end_date: Optional[str] = None,
+        concurrency: int = 4,
+        limit: int = 1000,
+        window_days: int = 1,
+        work_type: Optional[str] = None,
+        order_field: Optional[str] = None,
+        after: Optional[Tuple[str, str]] = None
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        并发键集分页获取许可证数据
+        
+        把 [start_date, end_date) 按 window_days 切分成时间窗口, 最多 concurrency 个
+        窗口同时在途, 每个窗口内部按 (order_field, ID_FIELD) 键集翻页。每页的查询代价
+        与所处深度无关, 吞吐量随 concurrency 线性增长。页面按完成顺序产出。
+        after 给出时只返回排在该键之后的记录 (用于从水位线继续同步)。
+        """
+        order_field = order_field or self.ORDER_FIELD
+        if end_date is None:
+            end_date = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+        
+        windows: asyncio.Queue = asyncio.Queue()
+        for window in self._date_windows(start_date, end_date, window_days):
+            windows.put_nowait(window)
+        
+        worker_count = max(1, min(concurrency, windows.qsize()))
+        pages: asyncio.Queue = asyncio.Queue(maxsize=worker_count * 2)
+        errors: List[BaseException] = []
+        
+        async def walk_windows():
+            try:
+                while not windows.empty():
+                    window_start, window_end = windows.get_nowait()
+                    cursor = after
+                    while True:
+                        page = await self.fetch_permits(
+                            limit=limit,
+                            work_type=work_type,
+                            start_date=window_start,
+                            end_date=window_end,
+                            after=cursor,
+                            order=self.keyset_order(order_field),
+                            order_field=order_field
+                        )
+                        if page:
+                            await pages.put(page)
+                        if len(page) < limit:
+                            break
+                        last = page[-1]
+                        cursor = (last.get(order_field, ''), last.get(self.ID_FIELD, ''))
+            except Exception as e:
+                errors.append(e)
+            await pages.put(None)
+        
+        workers = [asyncio.create_task(walk_windows()) for _ in range(worker_count)]
+        finished = 0
+        try:
+            while finished < worker_count:
+                page = await pages.get()
+                if page is None:
+                    finished += 1
+                    continue
+                yield page
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        
+        if errors:
+            raise errors[0]
+    
+    @staticmethod
+    def _date_windows(start_date: str, end_date: str, window_days: int) -> List[Tuple[str, str]]:
+        """把日期区间切分为 [start, end) 时间窗口"""
+        start = datetime.strptime(start_date[:10], '%Y-%m-%d')
+        end = datetime.strptime(end_date[:10], '%Y-%m-%d')
+        step = timedelta(days=max(1, window_days))
+        
+        windows = []
+        while start < end:
+            window_end = min(start + step, end)
+            windows.append((start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d')))
+            start = window_end
+        return windows
+    
+    def parse_permit(self, data: Dict) -> Optional[Permit]:
+        """解析许可证数据"""
+        raise NotImplementedError
+    
+    def contractor_name(self, data: Dict) -> Optional[str]:
+        """许可证上的承包商名称"""
+        contractor = ContractorMatcher.extract_contractor_from_permit(data)
+        return contractor['name'] if contractor else None
+
+
+class ChicagoPermitScraper(SocrataPermitScraper):
+    """
+    芝加哥市建筑许可证数据爬虫
+    数据源: Chicago Data Portal - Building Permits
+    """
+    
+    BASE_URL = "https://data.cityofchicago.org/resource/ydr8-5enu.json"
     
     def parse_permit(self, data: Dict) -> Optional[Permit]:
         """解析许可证数据"""
@@ -162,13 +458,68 @@ class ChicagoPermitScraper(DataScraper):
                 project_description=data.get('work_description', ''),
                 reported_cost=float(data.get('reported_cost', 0)) if data.get('reported_cost') else None,
                 source='chicago_data_portal',
-                source_url=f"https://data.cityofchicago.org/resource/ydr8-5enu.json?permit_={data.get('permit_', '')}"
+                source_url=f"https://data.cityofchicago.org/resource/ydr8-5enu.json?permit_={data.get('permit_', '')}",
+                contractor_name=self.contractor_name(data)
             )
         except Exception as e:
             console.print(f"[yellow]解析许可证数据失败: {e}[/yellow]")
             return None
 
 
+class ConfiguredPermitScraper(SocrataPermitScraper):
+    """
+    通用许可证爬虫
+    由 data_sources.STATE_PERMIT_APIS 中的端点和字段映射驱动
+    """
+    
+    # 不是所有数据集都有 id 列, 使用 Socrata 系统行号作为键集分页的次排序键
+    ID_FIELD = ':id'
+    
+    def __init__(
+        self,
+        state_code: str,
+        city: str,
+        config: Dict,
+        request_slots: Optional[asyncio.Semaphore] = None
+    ):
+        super().__init__(request_slots)
+        self.state_code = state_code
+        self.city = city
+        self.fields: Dict[str, str] = config['fields']
+        self.BASE_URL = config['url']
+        self.ORDER_FIELD = self.fields['issue_date']
+    
+    def parse_permit(self, data: Dict) -> Optional[Permit]:
+        """按字段映射解析许可证数据"""
+        fields = self.fields
+        try:
+            permit_number = str(data.get(fields['permit_number']) or '')
+            issue_date = data.get(fields['issue_date'])
+            cost = data.get(fields.get('cost', ''))
+            return Permit(
+                company_id='',  # 需要后续匹配
+                permit_number=permit_number,
+                permit_type=data.get(fields.get('permit_type', 'permit_type'), ''),
+                issue_date=issue_date[:10] if issue_date else '',
+                project_address=str(data.get(fields.get('address', '')) or '').strip(),
+                project_description=data.get(fields.get('description', ''), ''),
+                reported_cost=float(cost) if cost else None,
+                source=f"{self.city}_open_data",
+                source_url=f"{self.BASE_URL}?{fields['permit_number']}={permit_number}",
+                contractor_name=self.contractor_name(data)
+            )
+        except Exception as e:
+            console.print(f"[yellow]解析 {self.city} 许可证数据失败: {e}[/yellow]")
+            return None
+    
+    def contractor_name(self, data: Dict) -> Optional[str]:
+        """字段映射里配置了 contractor 时优先使用该列"""
+        mapped = self.fields.get('contractor')
+        if mapped and data.get(mapped):
+            return data[mapped]
+        return super().contractor_name(data)
+
+
 class NYCPermitScraper(DataScraper):
     """
     纽约市建筑许可证数据爬虫
@@ -226,6 +577,7 @@ class OpenCorporatesScraper(DataScraper):
     """
     
     BASE_URL = "https://api.opencorporates.com/v0.4"
+    CACHE_SOURCE = 'opencorporates'
     
     async def search_companies(
         self,
@@ -303,6 +655,19 @@ class USASpendingScraper(DataScraper):
 class DataProcessor:
     """数据处理器 - 清洗和存储数据"""
     
+    # 单次批量请求的最大行数
+    BATCH_SIZE = 500
+    
+    # 只涉及个别行的数据库错误 (SQLSTATE 类别 22 数据异常, 23 违反约束);
+    # 其余错误 (缺少 on_conflict 唯一约束、未知列、鉴权失败、网络中断) 对整批都一样
+    ROW_ERROR_SQLSTATE_CLASSES = ('22', '23')
+    
+    # 决定价格记录的许可证字段; 已有许可证这些字段变化时重新生成价格记录
+    PRICE_FIELDS = ('reported_cost', 'project_description', 'issue_date')
+    
+    # 关联字段: 由 PermitLinker 写入, 为空时不写库 (空串不是合法 UUID, 覆盖写入时也不能清掉已有关联)
+    LINK_FIELDS = ('company_id',)
+    
     def __init__(self):
         self.supabase = supabase
     
@@ -366,37 +731,532 @@ class DataProcessor:
             console.print(f"[red]保存许可证数据失败: {e}[/red]")
             return False
     
+    def _write_rows(
+        self,
+        table: str,
+        rows: List[Dict],
+        on_conflict: Optional[str] = None,
+        update: bool = False
+    ) -> Tuple[List[Dict], List[Tuple[Dict, str]]]:
+        """
+        多行写入; 因行级数据错误整批失败时二分拆分重试, 只有真正出错的行被报告,
+        其余行照常写入。其他错误直接抛出, 不再拆分。
+        on_conflict 指定时按该列忽略已存在的行, update=True 时改为覆盖已存在的行
+        """
+        if not rows:
+            return [], []
+        
+        try:
+            query = self.supabase.table(table)
+            if on_conflict:
+                query = query.upsert(rows, on_conflict=on_conflict, ignore_duplicates=not update)
+            else:
+                query = query.insert(rows)
+            return query.execute().data or [], []
+        except APIError as e:
+            if str(e.code or '')[:2] not in self.ROW_ERROR_SQLSTATE_CLASSES:
+                raise
+            if len(rows) == 1:
+                return [], [(rows[0], str(e))]
+            mid = len(rows) // 2
+            left_written, left_errors = self._write_rows(table, rows[:mid], on_conflict, update)
+            right_written, right_errors = self._write_rows(table, rows[mid:], on_conflict, update)
+            return left_written + right_written, left_errors + right_errors
+    
+    def _write_batched(
+        self,
+        table: str,
+        rows: List[Dict],
+        on_conflict: Optional[str] = None,
+        update: bool = False
+    ) -> BatchWriteResult:
+        """
+        按 BATCH_SIZE 分批写入。批量请求按所有行的列并集写入, 缺少的列会被写成空值,
+        所以列不同的行 (如省略了空关联字段的行) 分开写
+        """
+        result = BatchWriteResult()
+        groups: Dict[Tuple[str, ...], List[Dict]] = {}
+        for row in rows:
+            groups.setdefault(tuple(row), []).append(row)
+        for group in groups.values():
+            for i in range(0, len(group), self.BATCH_SIZE):
+                written, errors = self._write_rows(table, group[i:i + self.BATCH_SIZE], on_conflict, update)
+                result.written.extend(written)
+                result.errors.extend(errors)
+        result.skipped = len(rows) - len(result.written) - len(result.errors)
+        return result
+    
+    async def upsert_permits(self, permits: List[Permit], update_existing: bool = False) -> BatchWriteResult:
+        """
+        批量写入许可证记录; permit_number 已存在的记录默认跳过,
+        update_existing=True 时用新内容覆盖 (保留原 created_at 和已有的企业关联)。
+        覆盖模式下数据库返回的已有行也在 written 中, 由 store_permits 区分新增与变更
+        """
+        now = datetime.utcnow().isoformat()
+        rows: Dict[str, Dict] = {}
+        for permit in permits:
+            permit_data = self._without_empty_links(asdict(permit))
+            if not update_existing:
+                permit_data['created_at'] = now
+            rows.setdefault(permit.permit_number, permit_data)
+        
+        result = self._write_batched(
+            'permits', list(rows.values()), on_conflict='permit_number', update=update_existing
+        )
+        for row, error in result.errors:
+            console.print(f"[red]保存许可证数据失败 ({row.get('permit_number')}): {error}[/red]")
+        return result
+    
+    async def insert_price_records(self, prices: List[PriceRecord]) -> BatchWriteResult:
+        """批量插入价格记录"""
+        now = datetime.utcnow().isoformat()
+        rows = []
+        for price in prices:
+            price_data = self._without_empty_links(asdict(price))
+            price_data['created_at'] = now
+            rows.append(price_data)
+        
+        result = self._write_batched('price_records', rows)
+        for row, error in result.errors:
+            console.print(f"[red]保存价格记录失败 ({row.get('source_url')}): {error}[/red]")
+        return result
+    
+    @classmethod
+    def _without_empty_links(cls, row: Dict) -> Dict:
+        """去掉为空的关联字段"""
+        for link_field in cls.LINK_FIELDS:
+            if not row.get(link_field):
+                row.pop(link_field, None)
+        return row
+    
+    @classmethod
+    def _price_key(cls, row: Dict) -> Tuple:
+        """价格相关字段的可比较形式 (数据库返回的数值和日期格式可能与解析结果不同)"""
+        cost = row.get('reported_cost')
+        return (
+            float(cost) if cost not in (None, '') else None,
+            row.get('project_description') or None,
+            str(row.get('issue_date') or '')[:10],
+        )
+    
+    def fetch_existing_permits(self, permit_numbers: List[str]) -> Dict[str, Dict]:
+        """按 permit_number 批量查询已有许可证的价格相关字段"""
+        existing: Dict[str, Dict] = {}
+        columns = ','.join(('permit_number',) + self.PRICE_FIELDS)
+        for i in range(0, len(permit_numbers), self.BATCH_SIZE):
+            result = self.supabase.table('permits').select(columns).in_(
+                'permit_number', permit_numbers[i:i + self.BATCH_SIZE]
+            ).execute()
+            for row in result.data or []:
+                existing[row['permit_number']] = row
+        return existing
+    
+    def delete_price_records(self, source_urls: List[str]):
+        """删除指定许可证 (按 source_url) 的价格记录"""
+        for i in range(0, len(source_urls), self.BATCH_SIZE):
+            self.supabase.table('price_records').delete().in_(
+                'source_url', source_urls[i:i + self.BATCH_SIZE]
+            ).execute()
+    
+    async def store_permits(
+        self,
+        permits: List[Permit],
+        update_existing: bool = False
+    ) -> Tuple[BatchWriteResult, BatchWriteResult]:
+        """
+        批量保存许可证, 并为本次新写入的许可证保存价格记录
+        
+        update_existing=True 时 (增量同步拉到的变更记录) 已有许可证被覆盖写入,
+        价格相关字段有变化的许可证移到 updated, 其旧价格记录删除后重新生成;
+        内容未变的计入 skipped。
+        返回 (许可证写入结果, 价格记录写入结果)
+        """
+        existing: Dict[str, Dict] = {}
+        if update_existing:
+            existing = self.fetch_existing_permits(list({p.permit_number for p in permits}))
+        permit_result = await self.upsert_permits(permits, update_existing)
+        
+        # 同一页内重复的 permit_number 只写入了第一条, 价格记录也只取第一条
+        stored = {row.get('permit_number') for row in permit_result.written}
+        written_permits: Dict[str, Permit] = {}
+        for permit in permits:
+            if permit.permit_number in stored:
+                written_permits.setdefault(permit.permit_number, permit)
+        
+        if existing:
+            changed = {
+                number for number, permit in written_permits.items()
+                if number in existing and self._price_key(asdict(permit)) != self._price_key(existing[number])
+            }
+            rows = permit_result.written
+            permit_result.written = [r for r in rows if r.get('permit_number') not in existing]
+            permit_result.updated = [r for r in rows if r.get('permit_number') in changed]
+            permit_result.skipped += len(rows) - len(permit_result.written) - len(permit_result.updated)
+            written_permits = {
+                number: permit for number, permit in written_permits.items()
+                if number not in existing or number in changed
+            }
+            self.delete_price_records([
+                written_permits[number].source_url for number in changed if written_permits[number].source_url
+            ])
+        
+        prices = self.extract_prices_from_permits(list(written_permits.values()))
+        price_result = await self.insert_price_records(prices)
+        return permit_result, price_result
+    
+    def publish_price_report(self, report: pd.DataFrame) -> BatchWriteResult:
+        """把价格报表覆盖写入 price_reports 表 (每个 地区 × 服务类型 一行), 看板直接读取"""
+        rows = json.loads(report.to_json(orient='records', date_format='iso'))
+        result = self._write_batched('price_reports', rows, on_conflict='region,service_type', update=True)
+        for row, error in result.errors:
+            console.print(f"[red]保存价格报表失败 ({row.get('region')}/{row.get('service_type')}): {error}[/red]")
+        return result
+    
     def extract_price_from_permit(self, permit: Permit) -> Optional[PriceRecord]:
         """从许可证数据中提取价格信息"""
         if not permit.reported_cost or permit.reported_cost <= 0:
             return None
         
         # 根据项目描述判断服务类型
-        description = (permit.project_description or '').lower()
-        
-        service_type = 'general'
-        if 'roof' in description:
-            service_type = 'roofing'
-        elif 'hvac' in description or 'heating' in description or 'cooling' in description:
-            service_type = 'hvac'
-        elif 'plumb' in description:
-            service_type = 'plumbing'
-        elif 'electric' in description:
-            service_type = 'electrical'
+        service_type = PriceCalculator.detect_service_type(permit.project_description or '')
         
         return PriceRecord(
             company_id=permit.company_id,
             service_type=service_type,
-            price_low=permit.reported_cost * 0.8,  # 估计范围
-            price_high=permit.reported_cost * 1.2,
+            price_low=permit.reported_cost * PriceCalculator.PRICE_BAND_LOW,  # 估计范围
+            price_high=permit.reported_cost * PriceCalculator.PRICE_BAND_HIGH,
             price_unit='project',
             source=permit.source,
             source_url=permit.source_url,
             recorded_at=permit.issue_date
         )
+    
+    def extract_prices_from_permits(self, permits: List[Permit]) -> List[PriceRecord]:
+        """批量从许可证中提取价格信息 (一次向量化分类整页描述)"""
+        if not permits:
+            return []
+        
+        classified = PriceCalculator.classify_batch(
+            (permit.project_description for permit in permits),
+            (permit.reported_cost for permit in permits)
+        )
+        
+        prices = []
+        for permit, service_type, price_low, price_high in zip(
+            permits,
+            classified['service_type'],
+            classified['price_low'],
+            classified['price_high']
+        ):
+            if not price_low > 0:
+                continue
+            prices.append(PriceRecord(
+                company_id=permit.company_id,
+                service_type=service_type,
+                price_low=float(price_low),
+                price_high=float(price_high),
+                price_unit='project',
+                source=permit.source,
+                source_url=permit.source_url,
+                recorded_at=permit.issue_date
+            ))
+        return prices
+
+
+def write_to_lake(
+    lake: PermitLake,
+    permits: List[Permit],
+    permit_result: BatchWriteResult,
+    price_result: BatchWriteResult,
+    city: str
+):
+    """
+    把本批实际写入数据库的许可证及其价格记录追加到本地数据湖
+    (因重复而跳过的行不写, 数据湖与数据库保持一致)
+    """
+    written = {row.get('permit_number') for row in permit_result.written + permit_result.updated}
+    stored: Dict[str, Permit] = {}
+    for permit in permits:
+        if permit.permit_number in written:
+            stored.setdefault(permit.permit_number, permit)
+    lake.write_permits(list(stored.values()), city)
+    price_fields = [f.name for f in fields(PriceRecord)]
+    lake.write_price_records(
+        [{name: row.get(name) for name in price_fields} for row in price_result.written],
+        city
+    )
+
+
+def price_table_from_lake(lake: PermitLake, start_month: Optional[str] = None) -> pd.DataFrame:
+    """
+    从数据湖读取价格记录, 整理成 (region, service_type, price, date) 表
+    价格取报价区间中点, 地区为城市分区; 同一许可证的价格记录只计最新的一条
+    """
+    records = lake.read_price_records(
+        columns=['service_type', 'price_low', 'price_high', 'recorded_at'],
+        start_month=start_month,
+        latest_only=True
+    )
+    return pd.DataFrame({
+        'region': records['city'],
+        'service_type': records['service_type'],
+        'price': (records['price_low'] + records['price_high']) / 2,
+        'date': records['recorded_at'],
+    })
+
+
+def refresh_price_report(
+    lake: PermitLake,
+    start_month: Optional[str] = None,
+    processor: Optional[DataProcessor] = None
+) -> pd.DataFrame:
+    """
+    重新计算所有 地区 × 服务类型 的价格统计和价格趋势, 写入数据湖汇总表
+    price_report (带 price_trend 列) 和 price_trends (回归斜率与置信度)。
+    数据湖是爬虫本地的文件, 给定 processor 时报表同时发布到数据库 price_reports 表供看板读取
+    """
+    table = price_table_from_lake(lake, start_month)
+    updated_at = datetime.now().isoformat()
+    
+    trends = PriceCalculator.price_group_trends(table)
+    trends['updated_at'] = updated_at
+    lake.write_snapshot('price_trends', trends)
+    
+    report = PriceCalculator.price_group_stats(table).merge(
+        trends[['region', 'service_type', 'trend']].rename(columns={'trend': 'price_trend'}),
+        on=['region', 'service_type'],
+        how='left'
+    )
+    report['updated_at'] = updated_at
+    lake.write_snapshot('price_report', report)
+    if processor is not None:
+        processor.publish_price_report(report)
+    return report
+
+
+async def store_permit_page(
+    scraper: SocrataPermitScraper,
+    processor: DataProcessor,
+    permits_data: List[Dict],
+    lake: Optional[PermitLake] = None,
+    city: Optional[str] = None,
+    sketches: Optional[PriceSketchStore] = None,
+    linker: Optional[PermitLinker] = None,
+    update_existing: bool = False
+) -> int:
+    """
+    解析并批量保存一页许可证数据及其价格信息, 返回新写入的许可证条数
+    提供 lake 时同时写入数据湖的 city 分区, 提供 sketches 时新价格计入价格草图,
+    提供 linker 时写库前先把承包商关联到企业。
+    update_existing=True 时覆盖已有许可证 (见 DataProcessor.store_permits);
+    改价许可证的新价格同样计入草图, 草图无法删除值, 旧价格仍留在草图中
+    """
+    permits = [p for p in (scraper.parse_permit(data) for data in permits_data) if p]
+    if linker is not None:
+        linker.link(permits)
+    permit_result, price_result = await processor.store_permits(permits, update_existing)
+    if lake is not None:
+        write_to_lake(lake, permits, permit_result, price_result, city)
+    if sketches is not None:
+        sketches.add_records(city, price_result.written)
+    return len(permit_result.written)
+
+
+async def store_permit_stream(
+    processor: DataProcessor,
+    permits: AsyncIterator[Permit],
+    batch_size: int = DataProcessor.BATCH_SIZE,
+    lake: Optional[PermitLake] = None,
+    city: Optional[str] = None,
+    sketches: Optional[PriceSketchStore] = None,
+    linker: Optional[PermitLinker] = None
+) -> int:
+    """按批保存流式产出的许可证, 返回新写入的许可证条数"""
+    stored = 0
+    batch: List[Permit] = []
+    
+    async def flush():
+        nonlocal stored
+        if linker is not None:
+            linker.link(batch)
+        permit_result, price_result = await processor.store_permits(batch)
+        stored += len(permit_result.written)
+        if lake is not None:
+            write_to_lake(lake, batch, permit_result, price_result, city)
+        if sketches is not None:
+            sketches.add_records(city, price_result.written)
+    
+    async for permit in permits:
+        batch.append(permit)
+        if len(batch) >= batch_size:
+            await flush()
+            batch = []
+    if batch:
+        await flush()
+    return stored
+
+
+# 需要专用解析逻辑的城市, 其余城市使用 ConfiguredPermitScraper
+CUSTOM_PERMIT_SCRAPERS = {
+    'chicago': ChicagoPermitScraper,
+}
+
+
+def ingestible_permit_datasets(apis: Dict = STATE_PERMIT_APIS) -> List[Tuple[str, str, Dict]]:
+    """
+    列出可以直接接入的许可证数据集
+    
+    只有提供了字段映射的 Socrata SODA 端点 (/resource/*.json) 才能通用解析
+    """
+    datasets = []
+    for state_code, cities in apis.items():
+        for city, config in cities.items():
+            if '/resource/' not in config.get('url', ''):
+                continue
+            if city not in CUSTOM_PERMIT_SCRAPERS and not config.get('fields'):
+                continue
+            datasets.append((state_code, city, config))
+    return datasets
+
+
+class PermitIngestionEngine:
+    """
+    多城市许可证数据接入引擎
+    
+    所有城市同时运行, 同一主机上的请求共享一个并发上限 (per_host_limit),
+    每个数据集内部按时间窗口键集翻页 (concurrency_per_dataset)。
+    
+    提供 watermarks 时按数据集增量同步: 已有水位线的数据集只拉取
+    :updated_at 在水位线之后的记录; full_resync=True 忽略水位线重新全量同步。
+    水位线只在数据集完整同步成功后推进。
+    
+    提供 lake 时新写入数据库的许可证和价格记录同时写入本地数据湖。
+    提供 sketches 时新写入的价格计入按 城市/服务类型/月份 保存的价格草图,
+    草图快照在推进水位线时和运行结束后保存。
+    提供 linker 时每页许可证写库前按承包商名称关联 company_id。
+    """
+    
+    def __init__(
+        self,
+        processor: DataProcessor,
+        apis: Dict = STATE_PERMIT_APIS,
+        per_host_limit: int = 4,
+        concurrency_per_dataset: int = 4,
+        watermarks: Optional[WatermarkStore] = None,
+        full_resync: bool = False,
+        lake: Optional[PermitLake] = None,
+        sketches: Optional[PriceSketchStore] = None,
+        linker: Optional[PermitLinker] = None
+    ):
+        self.processor = processor
+        self.apis = apis
+        self.per_host_limit = per_host_limit
+        self.concurrency_per_dataset = concurrency_per_dataset
+        self.watermarks = watermarks
+        self.full_resync = full_resync
+        self.lake = lake
+        self.sketches = sketches
+        self.linker = linker
+        self.host_slots: Dict[str, asyncio.Semaphore] = {}
+    
+    def _slots_for(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self.host_slots:
+            self.host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        return self.host_slots[host]
+    
+    def build_scraper(self, state_code: str, city: str, config: Dict) -> SocrataPermitScraper:
+        """为数据集创建爬虫"""
+        slots = self._slots_for(config['url'])
+        if city in CUSTOM_PERMIT_SCRAPERS:
+            return CUSTOM_PERMIT_SCRAPERS[city](request_slots=slots)
+        return ConfiguredPermitScraper(state_code, city, config, request_slots=slots)
+    
+    async def ingest_dataset(
+        self,
+        state_code: str,
+        city: str,
+        config: Dict,
+        start_date: str,
+        progress: Optional[Progress] = None
+    ) -> int:
+        """接入单个数据集, 返回处理的记录数"""
+        task = progress.add_task(f"[cyan]{city}", total=None) if progress else None
+        total = 0
+        dataset = f"{state_code}/{city}"
+        
+        async with self.build_scraper(state_code, city, config) as scraper:
+            fetch_options = {'start_date': start_date}
+            watermark = None
+            if self.watermarks is not None and not self.full_resync:
+                watermark = self.watermarks.get(dataset)
+            if watermark and watermark.field == scraper.UPDATED_FIELD:
+                # 增量: 从水位线之后继续
+                fetch_options = {
+                    'start_date': watermark.last_value[:10],
+                    'order_field': scraper.UPDATED_FIELD,
+                    'after': watermark.key,
+                }
+            
+            # 增量同步拉到的是新增或变更的记录, 全量重同步会重新拉到已有记录:
+            # 这两种情况都覆盖已有许可证, 让变更的价格生效
+            update_existing = 'order_field' in fetch_options or self.full_resync
+            high_water = watermark.key if watermark else None
+            async for permits_data in scraper.iter_permit_pages(
+                concurrency=self.concurrency_per_dataset,
+                **fetch_options
+            ):
+                await store_permit_page(
+                    scraper, self.processor, permits_data, self.lake, city, self.sketches, self.linker,
+                    update_existing
+                )
+                total += len(permits_data)
+                
+                for data in permits_data:
+                    key = (data.get(scraper.UPDATED_FIELD, ''), data.get(scraper.ID_FIELD, ''))
+                    if key[0] and (high_water is None or key > high_water):
+                        high_water = key
+                
+                if progress:
+                    progress.update(task, advance=len(permits_data), description=f"[cyan]{city}: {total}")
+            
+            if self.watermarks is not None and high_water:
+                # 草图快照与水位线一起保存; 两次保存之间的价格在草图日志里
+                if self.sketches is not None:
+                    self.sketches.save()
+                self.watermarks.advance(dataset, scraper.UPDATED_FIELD, high_water)
+        
+        return total
+    
+    async def run(self, start_date: str, cities: Optional[List[str]] = None) -> Dict[str, int]:
+        """并发接入所有城市, 返回每个城市的处理条数 (失败为 -1)"""
+        datasets = [
+            d for d in ingestible_permit_datasets(self.apis)
+            if cities is None or d[1] in cities
+        ]
+        if self.linker is not None and not self.linker.loaded:
+            await self.linker.load_companies()
+        
+        with Progress() as progress:
+            results = await asyncio.gather(
+                *(self.ingest_dataset(state_code, city, config, start_date, progress)
+                  for state_code, city, config in datasets),
+                return_exceptions=True
+            )
+        if self.sketches is not None:
+            self.sketches.save()
+        
+        summary = {}
+        for (state_code, city, _), result in zip(datasets, results):
+            if isinstance(result, Exception):
+                console.print(f"[red]{city} ({state_code}) 许可证数据接入失败: {result}[/red]")
+                summary[city] = -1
+            else:
+                summary[city] = result
+        return summary
 
 
-async def run_chicago_scraper():
+async def run_chicago_scraper(concurrency: int = 4):
     """运行芝加哥数据爬虫"""
     console.print("\n[bold blue]开始爬取芝加哥建筑许可证数据...[/bold blue]")
     
@@ -407,55 +1267,120 @@ async def run_chicago_scraper():
         start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
         
         total_permits = 0
-        offset = 0
-        limit = 1000
         
         with Progress() as progress:
             task = progress.add_task("[cyan]爬取中...", total=None)
             
-            while True:
-                permits_data = await scraper.fetch_permits(
-                    limit=limit,
-                    offset=offset,
-                    start_date=start_date
-                )
-                
-                if not permits_data:
-                    break
-                
-                for data in permits_data:
-                    permit = scraper.parse_permit(data)
-                    if permit:
-                        await processor.insert_permit(permit)
-                        
-                        # 提取价格信息
-                        price = processor.extract_price_from_permit(permit)
-                        if price:
-                            await processor.insert_price_record(price)
-                
+            async for permits_data in scraper.iter_permit_pages(
+                start_date=start_date,
+                concurrency=concurrency
+            ):
+                await store_permit_page(scraper, processor, permits_data)
                 total_permits += len(permits_data)
                 progress.update(task, advance=len(permits_data), description=f"[cyan]已处理 {total_permits} 条记录")
-                
-                if len(permits_data) < limit:
-                    break
-                
-                offset += limit
-                await asyncio.sleep(0.5)  # 限流
         
         console.print(f"[green]✓ 芝加哥数据爬取完成，共处理 {total_permits} 条许可证记录[/green]")
 
 
-async def run_all_scrapers():
+async def run_permit_ingestion(
+    days: int = 30,
+    cities: Optional[List[str]] = None,
+    per_host_limit: int = 4,
+    full_resync: bool = False,
+    lake: Optional[PermitLake] = None
+):
+    """
+    运行多城市许可证数据接入
+    
+    已同步过的数据集只拉取上次成功运行后新增或变更的记录,
+    没有水位线或 full_resync=True 时拉取最近 days 天的数据。
+    提供 lake 时同时写入本地数据湖
+    """
+    console.print("\n[bold blue]开始接入各城市建筑许可证数据...[/bold blue]")
+    
+    start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+    processor = DataProcessor()
+    engine = PermitIngestionEngine(
+        processor,
+        per_host_limit=per_host_limit,
+        watermarks=WatermarkStore(),
+        full_resync=full_resync,
+        lake=lake,
+        sketches=PriceSketchStore(),
+        linker=PermitLinker(processor.supabase)
+    )
+    summary = await engine.run(start_date, cities)
+    
+    for city, count in summary.items():
+        if count >= 0:
+            console.print(f"[green]✓ {city}: 共处理 {count} 条许可证记录[/green]")
+
+
+async def run_permit_backfill(
+    start_date: str,
+    end_date: Optional[str] = None,
+    cities: Optional[List[str]] = None,
+    lake: Optional[PermitLake] = None
+):
+    """通过流式 CSV 导出回填许可证历史数据 (适合跨年的大范围回填)"""
+    console.print(f"\n[bold blue]开始流式回填许可证数据 {start_date} ~ {end_date or '至今'}...[/bold blue]")
+    
+    processor = DataProcessor()
+    engine = PermitIngestionEngine(processor)
+    sketches = PriceSketchStore()
+    linker = PermitLinker(processor.supabase)
+    await linker.load_companies()
+    
+    async def backfill(state_code: str, city: str, config: Dict) -> int:
+        async with engine.build_scraper(state_code, city, config) as scraper:
+            return await store_permit_stream(
+                processor,
+                scraper.stream_permits(start_date=start_date, end_date=end_date),
+                lake=lake,
+                city=city,
+                sketches=sketches,
+                linker=linker
+            )
+    
+    datasets = [
+        d for d in ingestible_permit_datasets()
+        if cities is None or d[1] in cities
+    ]
+    results = await asyncio.gather(
+        *(backfill(*d) for d in datasets),
+        return_exceptions=True
+    )
+    sketches.save()
+    
+    for (state_code, city, _), result in zip(datasets, results):
+        if isinstance(result, Exception):
+            console.print(f"[red]{city} ({state_code}) 回填失败: {result}[/red]")
+        else:
+            console.print(f"[green]✓ {city}: 新写入 {result} 条许可证记录[/green]")
+
+
+async def run_permit_linking_backfill():
+    """把历史许可证 (及其价格记录) 关联到企业"""
+    console.print("\n[bold blue]开始关联历史许可证与企业...[/bold blue]")
+    
+    linker = PermitLinker(DataProcessor().supabase)
+    companies = await linker.load_companies()
+    scanned, linked = await linker.backfill()
+    console.print(f"[green]✓ 索引 {companies} 家企业, 扫描 {scanned} 条未关联许可证, 关联 {linked} 条[/green]")
+
+
+async def run_all_scrapers(full_resync: bool = False, lake: Optional[PermitLake] = None):
     """运行所有爬虫"""
     console.print("[bold]PriceCompare Pro 数据爬虫[/bold]")
     console.print(f"开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
     
     try:
-        # 运行各个爬虫
-        await run_chicago_scraper()
-        # 可以添加更多爬虫
-        # await run_nyc_scraper()
-        # await run_la_scraper()
+        # 运行各个爬虫 (所有已配置城市并发接入)
+        await run_permit_ingestion(full_resync=full_resync, lake=lake)
+        
+        if lake is not None:
+            report = refresh_price_report(lake, processor=DataProcessor())
+            console.print(f"[green]✓ 价格报表已更新: {len(report)} 个 地区 × 服务类型 分组[/green]")
         
         console.print("\n[bold green]所有数据爬取任务完成！[/bold green]")
         
@@ -465,4 +1390,19 @@ async def run_all_scrapers():
 
 
 if __name__ == '__main__':
-    asyncio.run(run_all_scrapers())
+    # --link-backfill: 只运行历史许可证与企业的关联回填
+    # --full-resync: 忽略增量水位线, 重新全量同步
+    # --lake: 同时写入本地 Parquet 数据湖 (PERMIT_LAKE_DIR), 并把价格报表发布到 price_reports 表
+    async def main():
+        try:
+            if '--link-backfill' in sys.argv:
+                await run_permit_linking_backfill()
+            else:
+                await run_all_scrapers(
+                    full_resync='--full-resync' in sys.argv,
+                    lake=PermitLake(schemas=LAKE_SCHEMAS) if '--lake' in sys.argv else None
+                )
+        finally:
+            await close_http_client()
+    
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+企业名称标准化
+匹配、去重和多源合并共用同一套规则: 两个预编译的字符类正则去掉标点,
+再在词元上查表统一常见缩写、去掉结尾的一串法律后缀 (如 'CO INC'),
+结果由有界 LRU 缓存记住, 同一名称重复出现时不再计算
+"""
+
+import re
+from functools import lru_cache
+
+# 缓存的名称数上限
+NAME_CACHE_SIZE = 262144
+
+# 句点和撇号直接删除 (L.L.C. -> LLC, O'BRIEN -> OBRIEN), 其余标点换成空格 (& 保留)
+_DROPPED = re.compile(r"[.'`]")
+_SEPARATORS = re.compile(r"[^\w\s&]|_")
+
+
+def _strip_punctuation(text: str) -> str:
+    return _SEPARATORS.sub(' ', _DROPPED.sub('', text))
+
+# 常见缩写 -> 统一写法
+ABBREVIATIONS = {
+    'AND': '&',
+    'BROS': 'BROTHERS',
+    'CONST': 'CONSTRUCTION', 'CONSTR': 'CONSTRUCTION', 'CONSTRUCT': 'CONSTRUCTION',
+    'ELEC': 'ELECTRIC', 'ELECT': 'ELECTRIC', 'ELECTRICAL': 'ELECTRIC',
+    'MECH': 'MECHANICAL',
+    'PLBG': 'PLUMBING', 'PLUMB': 'PLUMBING',
+    'HTG': 'HEATING',
+    'SVC': 'SERVICES', 'SVCS': 'SERVICES', 'SERVICE': 'SERVICES', 'SERV': 'SERVICES',
+    'CONTR': 'CONTRACTORS', 'CONTRACTOR': 'CONTRACTORS', 'CONTRACTING': 'CONTRACTORS',
+    'ROOFERS': 'ROOFING',
+    'INTL': 'INTERNATIONAL',
+    'MGMT': 'MANAGEMENT',
+    'DEV': 'DEVELOPMENT',
+    'ENTERPRISE': 'ENTERPRISES', 'ENT': 'ENTERPRISES',
+    'ASSOC': 'ASSOCIATES', 'ASSOCS': 'ASSOCIATES',
+    'INCORPORATED': 'INC',
+    'CORPORATION': 'CORP',
+    'COMPANY': 'CO',
+    'LIMITED': 'LTD',
+}
+
+# 结尾的法律后缀, 可以连续出现多个 ('CO INC', 'CORP LTD')
+LEGAL_SUFFIXES = frozenset(['INC', 'LLC', 'LLP', 'PLLC', 'CO', 'CORP', 'LTD', 'LP', 'PC', 'PLC'])
+
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def canonical_company_name(name: str) -> str:
+    """
+    企业名称的标准形式: 大写、去标点、统一缩写、去掉开头的 THE 和结尾的法律后缀,
+    只剩后缀的名称 (如 'CO INC') 保留原词
+    """
+    if not name:
+        return ''
+    tokens = [ABBREVIATIONS.get(t, t) for t in _strip_punctuation(name.upper()).split()]
+    end = len(tokens)
+    while end > 1 and tokens[end - 1] in LEGAL_SUFFIXES:
+        end -= 1
+    start = 1 if end > 1 and tokens[0] == 'THE' else 0
+    return ' '.join(tokens[start:end])
+
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def name_key(name: str) -> str:
+    """人名、城市名等的比较键: 只做大小写、标点和空白的统一"""
+    if not name:
+        return ''
+    return ' '.join(_strip_punctuation(name.upper()).split())
+
+
+def cache_info() -> dict:
+    """两个缓存的命中统计"""
+    return {
+        'canonical_company_name': canonical_company_name.cache_info()._asdict(),
+        'name_key': name_key.cache_info()._asdict(),
+    }
@@ -0,0 +1,267 @@
+"""
+许可证数据湖
+把解析后的许可证和价格记录按 城市/月份 分区写成本地 Parquet 文件,
+分析任务直接按列读取并裁剪分区, 不必再通过 PostgREST 分页拉取
+"""
+
+import os
+import time
+import uuid
+import typing
+from dataclasses import asdict, fields
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 数据湖根目录, 可通过环境变量覆盖
+LAKE_DIR = os.getenv(
+    'PERMIT_LAKE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'lake')
+)
+
+# 表名 -> 用于划分月份分区的日期字段
+LAKE_TABLES = {
+    'permits': 'issue_date',
+    'price_records': 'recorded_at',
+}
+
+# 表名 -> 同一条记录的键 (后写入的版本覆盖先写入的); 价格记录的 source_url 指向所属许可证
+LAKE_KEYS = {
+    'permits': 'permit_number',
+    'price_records': 'source_url',
+}
+
+# 分区内文件数超过该值时合并成一个文件
+MAX_PARTITION_FILES = 16
+
+# 每行的写入时间 (纳秒), 去重时按它判断先后, 与行所在的月份分区无关
+WRITTEN_AT = '_written_at'
+
+# 分区列 (目录名中的值), 读取时附加
+PARTITION_FIELDS = [pa.field('city', pa.string()), pa.field('month', pa.string())]
+
+_ARROW_TYPES = {str: pa.string(), float: pa.float64(), int: pa.int64(), bool: pa.bool_()}
+
+
+def dataclass_schema(cls) -> pa.Schema:
+    """
+    由数据类字段生成固定的 Arrow 表结构 (Optional[X] 按 X 处理)。
+    每批文件都按同一结构写入, 整列为空的批次也不会被推断成 null 类型
+    """
+    hints = typing.get_type_hints(cls)
+    schema = []
+    for f in fields(cls):
+        hint = hints[f.name]
+        args = [arg for arg in typing.get_args(hint) if arg is not type(None)]
+        if typing.get_origin(hint) is typing.Union and len(args) == 1:
+            hint = args[0]
+        schema.append(pa.field(f.name, _ARROW_TYPES.get(hint, pa.string())))
+    return pa.schema(schema + [pa.field(WRITTEN_AT, pa.int64())])
+
+
+def _latest(df: pd.DataFrame, key: str) -> pd.DataFrame:
+    """
+    同一 (城市, 键) 只保留写入时间最晚的一行 (记录的日期改到别的月份时, 新分区中的版本胜出);
+    键为空的行全部保留
+    """
+    has_key = df[key].notna()
+    subset = ['city', key] if 'city' in df.columns else [key]
+    keyed = df[has_key]
+    if WRITTEN_AT in keyed.columns:
+        # 没有写入时间的旧文件视为最早写入
+        keyed = keyed.sort_values(WRITTEN_AT, kind='mergesort', na_position='first')
+    latest = keyed.drop_duplicates(subset=subset, keep='last')
+    return pd.concat([latest, df[~has_key]]).sort_index()
+
+
+class PermitLake:
+    """
+    按 city=<城市>/month=<YYYY-MM> 分区的列式存储
+
+    schemas 为 表名 -> 表结构 (见 dataclass_schema), 写入和读取都按它进行;
+    没有给出结构的表按每批数据推断列类型
+    """
+
+    def __init__(self, root: str = LAKE_DIR, schemas: Optional[Dict[str, pa.Schema]] = None):
+        self.root = root
+        self.schemas = dict(schemas or {})
+
+    def table_path(self, table: str) -> str:
+        if table not in LAKE_TABLES:
+            raise ValueError(f"未知的数据湖表: {table}")
+        return os.path.join(self.root, table)
+
+    def _write(self, table: str, records: Iterable[Any], city: str) -> int:
+        """追加写入一批记录, 每个 (城市, 月份) 分区写一个新文件"""
+        rows = [asdict(r) if not isinstance(r, dict) else r for r in records]
+        if not rows:
+            return 0
+
+        df = pd.DataFrame(rows)
+        date_field = LAKE_TABLES[table]
+        month = df[date_field].fillna('').astype(str).str[:7]
+        df['_month'] = month.where(month.str.len() == 7, 'unknown')
+
+        for month_key, part in df.groupby('_month'):
+            partition = os.path.join(self.table_path(table), f"city={city}", f"month={month_key}")
+            os.makedirs(partition, exist_ok=True)
+            written_at = time.time_ns()
+            part = part.drop(columns='_month').assign(**{WRITTEN_AT: written_at})
+            self._write_file(
+                table, part,
+                # 文件名以写入时间开头, 分区内按文件名排序即为写入顺序
+                os.path.join(partition, f"part-{written_at:020d}-{uuid.uuid4().hex[:8]}.parquet")
+            )
+            if len(self._part_files(partition)) > MAX_PARTITION_FILES:
+                self._compact_partition(table, partition)
+        return len(df)
+
+    def _write_file(self, table: str, df: pd.DataFrame, path: str):
+        """按表结构写入一个 Parquet 文件 (缺少的列写为空值, 结构外的列丢弃)"""
+        schema = self.schemas.get(table)
+        if schema is None:
+            df.to_parquet(path, index=False)
+            return
+        df = df.reindex(columns=schema.names)
+        pq.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False), path)
+
+    def _read_schema(self, table: str) -> Optional[pa.Schema]:
+        """读取用的表结构 (表结构加分区列)"""
+        schema = self.schemas.get(table)
+        return None if schema is None else pa.schema(list(schema) + PARTITION_FIELDS)
+
+    @staticmethod
+    def _part_files(partition: str) -> List[str]:
+        return sorted(f for f in os.listdir(partition) if f.startswith('part-') and f.endswith('.parquet'))
+
+    def _compact_partition(self, table: str, partition: str):
+        """
+        把分区内的文件合并成一个, 同一键只保留最后写入的版本。
+        新文件沿用最后一个旧文件的时间戳, 之后写入的文件仍排在它后面;
+        先写新文件再删旧文件, 中途中断只会留下读取时会被去重的重复行
+        """
+        files = self._part_files(partition)
+        if len(files) < 2:
+            return
+        schema = self.schemas.get(table)
+        df = pd.concat(
+            [pd.read_parquet(os.path.join(partition, f), engine='pyarrow', schema=schema) for f in files],
+            ignore_index=True
+        )
+        df = _latest(df, LAKE_KEYS[table])
+        timestamp = files[-1].split('-')[1]
+        tmp_path = os.path.join(partition, f".compact-{uuid.uuid4().hex[:8]}.tmp")
+        self._write_file(table, df, tmp_path)
+        os.replace(tmp_path, os.path.join(partition, f"part-{timestamp}-compact.parquet"))
+        for f in files:
+            if f != f"part-{timestamp}-compact.parquet":
+                os.remove(os.path.join(partition, f))
+
+    def compact(self, table: str):
+        """合并表的全部分区 (写入时会自动合并文件过多的分区)"""
+        for partition in self.partitions(table):
+            self._compact_partition(table, os.path.join(
+                self.table_path(table), f"city={partition['city']}", f"month={partition['month']}"
+            ))
+
+    def write_permits(self, permits: Iterable[Any], city: str) -> int:
+        """写入许可证 (Permit 或字典)"""
+        return self._write('permits', permits, city)
+
+    def write_price_records(self, prices: Iterable[Any], city: str) -> int:
+        """写入价格记录 (PriceRecord 或字典)"""
+        return self._write('price_records', prices, city)
+
+    def read(
+        self,
+        table: str,
+        columns: Optional[List[str]] = None,
+        cities: Optional[List[str]] = None,
+        start_month: Optional[str] = None,
+        end_month: Optional[str] = None,
+        latest_only: bool = False
+    ) -> pd.DataFrame:
+        """
+        读取数据湖表
+
+        columns 做列裁剪, cities/start_month/end_month (含, YYYY-MM) 做分区裁剪,
+        只有命中的分区文件会被打开。结果带 city 和 month 两个分区列。
+        latest_only=True 时同一条记录 (许可证按 permit_number, 价格记录按 source_url)
+        只保留最后写入的版本。结果不含内部的写入时间列
+        """
+        path = self.table_path(table)
+        if not os.path.isdir(path):
+            return pd.DataFrame(columns=(columns or []) + ['city', 'month'])
+
+        filters: List[tuple] = []
+        if cities:
+            filters.append(('city', 'in', list(cities)))
+        if start_month:
+            filters.append(('month', '>=', start_month))
+        if end_month:
+            filters.append(('month', '<=', end_month))
+
+        key = LAKE_KEYS[table]
+        read_columns = None
+        if columns is not None:
+            read_columns = list(dict.fromkeys(columns + ['city', 'month']))
+            if latest_only:
+                read_columns += [c for c in (key, WRITTEN_AT) if c not in read_columns]
+
+        df = pd.read_parquet(
+            path,
+            engine='pyarrow',
+            columns=read_columns,
+            filters=filters or None,
+            partitioning='hive',
+            schema=self._read_schema(table)
+        )
+        for partition_column in ('city', 'month'):
+            if partition_column in df.columns:
+                df[partition_column] = df[partition_column].astype(str)
+
+        if latest_only and not df.empty:
+            df = _latest(df, key)
+            if columns is not None and key not in columns:
+                df = df.drop(columns=key)
+        return df.drop(columns=WRITTEN_AT, errors='ignore').reset_index(drop=True)
+
+    def read_permits(self, **kwargs) -> pd.DataFrame:
+        return self.read('permits', **kwargs)
+
+    def read_price_records(self, **kwargs) -> pd.DataFrame:
+        return self.read('price_records', **kwargs)
+
+    def snapshot_path(self, name: str) -> str:
+        return os.path.join(self.root, 'snapshots', f"{name}.parquet")
+
+    def write_snapshot(self, name: str, df: pd.DataFrame):
+        """整体替换一个非分区的汇总表 (如价格报表), 读方总能读到完整的一版"""
+        path = self.snapshot_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def read_snapshot(self, name: str, columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """读取汇总表, 尚未生成时返回 None"""
+        path = self.snapshot_path(name)
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path, engine='pyarrow', columns=columns)
+
+    def partitions(self, table: str) -> List[Dict[str, str]]:
+        """列出表的全部分区"""
+        path = self.table_path(table)
+        if not os.path.isdir(path):
+            return []
+        result = []
+        for city_dir in sorted(os.listdir(path)):
+            if not city_dir.startswith('city='):
+                continue
+            for month_dir in sorted(os.listdir(os.path.join(path, city_dir))):
+                if month_dir.startswith('month='):
+                    result.append({'city': city_dir[5:], 'month': month_dir[6:]})
+        return result
@@ -0,0 +1,126 @@
+"""
+许可证 -> 企业关联
+用企业名称索引把许可证上的承包商名称解析为 company_id,
+既可以在接入时逐页内联关联, 也可以对历史许可证表做回填
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from rich.console import Console
+from supabase import Client
+
+from company_index import CompanyIndex
+from price_analyzer import ContractorMatcher
+
+console = Console()
+
+
+class PermitLinker:
+    """批量关联许可证与企业"""
+
+    PAGE_SIZE = 1000
+    BATCH_SIZE = 500
+
+    def __init__(self, supabase: Client, index: Optional[CompanyIndex] = None):
+        self.supabase = supabase
+        self.index = index or ContractorMatcher.build_index()
+        self.loaded = index is not None
+
+    async def load_companies(self) -> int:
+        """分页读取 companies 表建立索引"""
+        loaded = 0
+        start = 0
+        while True:
+            result = self.supabase.table('companies').select('id, name').order('id').range(
+                start, start + self.PAGE_SIZE - 1
+            ).execute()
+            rows = result.data or []
+            loaded += self.index.add_companies(rows)
+            if len(rows) < self.PAGE_SIZE:
+                break
+            start += self.PAGE_SIZE
+        self.loaded = True
+        return loaded
+
+    def add_company(self, company_id: str, name: str):
+        """新同步的企业直接加入索引"""
+        self.index.add(company_id, name)
+
+    def resolve(self, names: Iterable[Optional[str]]) -> Dict[str, Optional[str]]:
+        """批量解析承包商名称 -> company_id (同一页内重复的名称只查一次)"""
+        return {name: self.index.best_match(name) for name in set(names) if name}
+
+    def link(self, permits: List) -> int:
+        """
+        内联关联: 为还没有 company_id 的许可证填入匹配到的企业, 返回关联条数
+        (在写库之前调用, 价格记录随之带上 company_id)
+        """
+        pending = [p for p in permits if not p.company_id and p.contractor_name]
+        resolved = self.resolve(p.contractor_name for p in pending)
+        linked = 0
+        for permit in pending:
+            company_id = resolved.get(permit.contractor_name)
+            if company_id:
+                permit.company_id = company_id
+                linked += 1
+        return linked
+
+    def _update_in(self, table: str, column: str, values: List[str], company_id: str):
+        for i in range(0, len(values), self.BATCH_SIZE):
+            self.supabase.table(table).update({'company_id': company_id}).in_(
+                column, values[i:i + self.BATCH_SIZE]
+            ).execute()
+
+    def write_links(self, links: List[Tuple[str, Optional[str], str]]):
+        """
+        把 (permit_number, source_url, company_id) 写回数据库:
+        同一企业的许可证合并成一次更新, 对应的价格记录按 source_url 一并归属
+        """
+        by_company: Dict[str, Tuple[List[str], List[str]]] = {}
+        for permit_number, source_url, company_id in links:
+            numbers, urls = by_company.setdefault(company_id, ([], []))
+            numbers.append(permit_number)
+            if source_url:
+                urls.append(source_url)
+
+        for company_id, (numbers, urls) in by_company.items():
+            try:
+                self._update_in('permits', 'permit_number', numbers, company_id)
+                self._update_in('price_records', 'source_url', urls, company_id)
+            except Exception as e:
+                console.print(f"[red]写入许可证关联失败 ({company_id}): {e}[/red]")
+
+    async def backfill(self) -> Tuple[int, int]:
+        """
+        回填历史许可证: 按 permit_number 键集分页扫描未关联的许可证,
+        批量解析并写回。返回 (扫描条数, 关联条数)
+        """
+        if not self.loaded:
+            await self.load_companies()
+
+        scanned = linked = 0
+        last_number = ''
+        while True:
+            query = self.supabase.table('permits').select(
+                'permit_number, source_url, contractor_name'
+            ).is_('company_id', 'null').not_.is_('contractor_name', 'null')
+            if last_number:
+                query = query.gt('permit_number', last_number)
+            rows = query.order('permit_number').limit(self.PAGE_SIZE).execute().data or []
+            if not rows:
+                break
+
+            resolved = self.resolve(row['contractor_name'] for row in rows)
+            links = [
+                (row['permit_number'], row.get('source_url'), resolved[row['contractor_name']])
+                for row in rows
+                if resolved.get(row['contractor_name'])
+            ]
+            self.write_links(links)
+
+            scanned += len(rows)
+            linked += len(links)
+            last_number = rows[-1]['permit_number']
+            if len(rows) < self.PAGE_SIZE:
+                break
+        return scanned, linked
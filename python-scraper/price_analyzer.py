@@ -3,12 +3,21 @@
 从许可证数据中提取和计算价格信息
 """
 
+import math
 import re
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 import statistics
 
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from name_normalizer import canonical_company_name
+from price_sketch import QuantileSketch
+
 
 @dataclass
 class PriceAnalysis:
@@ -23,6 +32,127 @@ class PriceAnalysis:
     price_trend: Optional[str] = None  # 'up', 'down', 'stable'
 
 
+@dataclass
+class ServiceMatch:
+    """描述中命中的一个服务关键词"""
+    service_type: str
+    keyword: str
+    start: int   # 在小写化描述中的位置
+    end: int
+
+
+def _trie_pattern(node: Dict[str, dict]) -> str:
+    """把关键词字典树转成正则, 同一位置优先匹配更长的关键词"""
+    branches = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items()) if ch]
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        body = '(?:' + body + ')?'
+    return body
+
+
+class ServiceTypeMatcher:
+    """
+    服务类型多关键词匹配器
+    
+    所有关键词编译成一个字典树结构的正则, 每条描述只扫描一遍。
+    每个类型的得分为其命中关键词的长度之和 (越具体的短语权重越高, 重复出现累加),
+    得分最高的类型胜出, 同分时取最先出现的类型; 结果不依赖 SERVICE_KEYWORDS 的顺序
+    """
+    
+    def __init__(self, service_keywords: Dict[str, List[str]]):
+        self.keyword_types: Dict[str, str] = {}
+        for service_type, keywords in service_keywords.items():
+            for keyword in keywords:
+                self.keyword_types.setdefault(keyword.lower(), service_type)
+        
+        trie: Dict[str, dict] = {}
+        for keyword in self.keyword_types:
+            node = trie
+            for ch in keyword:
+                node = node.setdefault(ch, {})
+            node[''] = {}
+        self.pattern = re.compile(_trie_pattern(trie)) if trie else None
+    
+    def scan(self, description: str) -> List[ServiceMatch]:
+        """返回全部命中 (不重叠, 同一位置取最长关键词)"""
+        if not description or self.pattern is None:
+            return []
+        return [
+            ServiceMatch(self.keyword_types[m.group()], m.group(), m.start(), m.end())
+            for m in self.pattern.finditer(description.lower())
+        ]
+    
+    def scores(self, description: str) -> Dict[str, int]:
+        """各服务类型的得分 (按首次出现的顺序)"""
+        result: Dict[str, int] = {}
+        if not description or self.pattern is None:
+            return result
+        keyword_types = self.keyword_types
+        for keyword in self.pattern.findall(description.lower()):
+            service_type = keyword_types[keyword]
+            result[service_type] = result.get(service_type, 0) + len(keyword)
+        return result
+    
+    def best(self, description: str) -> str:
+        """得分最高的服务类型, 没有命中时返回 'general'"""
+        scores = self.scores(description)
+        if not scores:
+            return 'general'
+        # max 在同分时保留第一个, 即最先出现的类型
+        return max(scores, key=scores.__getitem__)
+    
+    def best_batch(self, lowered: pa.Array) -> np.ndarray:
+        """
+        向量化的 best: lowered 为已小写化的 Arrow 字符串数组, 返回服务类型 (object 数组)
+        
+        用同一个正则 (RE2, 同一位置取最长关键词, 不重叠) 给每个命中包上分隔符后按分隔符拆分,
+        命中落在每行的奇数位置且保持出现顺序; 按关键词长度加权累加成各类型得分,
+        同分时取最先出现的类型, 与 best() 完全一致
+        """
+        result = np.full(len(lowered), 'general', dtype=object)
+        if self.pattern is None or not len(lowered):
+            return result
+        
+        marked = pc.replace_substring_regex(lowered, self.pattern.pattern, '\x00\\0\x00')
+        pieces = pc.split_pattern(marked, '\x00')
+        offsets = pieces.offsets.to_numpy(zero_copy_only=False)
+        rows = pc.list_parent_indices(pieces).to_numpy(zero_copy_only=False)
+        is_hit = (np.arange(len(rows)) - offsets[rows]) % 2 == 1
+        hit_rows = rows[is_hit]
+        if not len(hit_rows):
+            return result
+        
+        keywords = list(self.keyword_types)
+        types = list(dict.fromkeys(self.keyword_types.values()))
+        keyword_type = np.array([types.index(self.keyword_types[k]) for k in keywords])
+        keyword_weight = np.array([len(k) for k in keywords])
+        found = pc.index_in(pc.list_flatten(pieces).filter(pa.array(is_hit)), value_set=pa.array(keywords))
+        found = found.to_numpy(zero_copy_only=False).astype(np.int64)
+        hit_types = keyword_type[found]
+        
+        scores = np.bincount(
+            hit_types * len(lowered) + hit_rows,
+            weights=keyword_weight[found],
+            minlength=len(types) * len(lowered)
+        ).reshape(len(types), len(lowered))
+        
+        # 每个类型在每行首次出现的位置 (命中按行、按出现顺序排列)
+        first_seen = np.full(scores.shape, len(hit_rows))
+        for type_index in range(len(types)):
+            positions = np.flatnonzero(hit_types == type_index)
+            type_rows = hit_rows[positions]
+            starts = np.flatnonzero(np.diff(type_rows, prepend=-1))
+            first_seen[type_index, type_rows[starts]] = positions[starts]
+        
+        top = scores.max(axis=0)
+        winners = np.where(scores == top, first_seen, len(hit_rows)).argmin(axis=0)
+        hit = top > 0
+        result[hit] = np.array(types, dtype=object)[winners[hit]]
+        return result
+
+
 class PriceCalculator:
     """价格计算器"""
     
@@ -82,20 +212,38 @@ class PriceCalculator:
         ]
     }
     
+    @classmethod
+    def service_matcher(cls) -> ServiceTypeMatcher:
+        """由 SERVICE_KEYWORDS 编译的匹配器 (每个类只编译一次)"""
+        matcher = cls.__dict__.get('_service_matcher')
+        if matcher is None:
+            matcher = ServiceTypeMatcher(cls.SERVICE_KEYWORDS)
+            cls._service_matcher = matcher
+        return matcher
+    
     @classmethod
     def detect_service_type(cls, description: str) -> str:
-        """从描述中检测服务类型"""
+        """从描述中检测服务类型 (按关键词得分, 见 ServiceTypeMatcher)"""
         if not description:
             return 'general'
-        
-        description_lower = description.lower()
-        
-        for service_type, keywords in cls.SERVICE_KEYWORDS.items():
-            for keyword in keywords:
-                if keyword in description_lower:
-                    return service_type
-        
-        return 'general'
+        return cls.service_matcher().best(description)
+    
+    # 常见面积表示模式
+    SQFT_PATTERNS = [
+        r'(\d+(?:,\d{3})*(?:\.\d+)?)\s*(?:sq\.?\s*ft\.?|square\s*feet?|sf)',
+        r'(\d+(?:,\d{3})*(?:\.\d+)?)\s*sqft',
+    ]
+    
+    # 按项目总价估算项目规模的分档 (上限, 规模)
+    COST_SIZE_BANDS = [
+        (5000, 'small'),
+        (15000, 'medium'),
+        (50000, 'large'),
+    ]
+    
+    # 从单个项目报价推算价格区间的系数
+    PRICE_BAND_LOW = 0.8
+    PRICE_BAND_HIGH = 1.2
     
     @classmethod
     def extract_square_footage(cls, text: str) -> Optional[float]:
@@ -103,13 +251,7 @@ class PriceCalculator:
         if not text:
             return None
         
-        # 常见面积表示模式
-        patterns = [
-            r'(\d+(?:,\d{3})*(?:\.\d+)?)\s*(?:sq\.?\s*ft\.?|square\s*feet?|sf)',
-            r'(\d+(?:,\d{3})*(?:\.\d+)?)\s*sqft',
-        ]
-        
-        for pattern in patterns:
+        for pattern in cls.SQFT_PATTERNS:
             match = re.search(pattern, text.lower())
             if match:
                 value = match.group(1).replace(',', '')
@@ -136,26 +278,86 @@ class PriceCalculator:
             # 根据成本估算项目规模
             estimates = cls.PROJECT_SIZE_ESTIMATES[service_type]
             
-            if total_cost < 5000:
-                estimated_sqft = estimates['small']
-            elif total_cost < 15000:
-                estimated_sqft = estimates['medium']
-            elif total_cost < 50000:
-                estimated_sqft = estimates['large']
-            else:
-                estimated_sqft = estimates['commercial']
+            size = 'commercial'
+            for upper, band in cls.COST_SIZE_BANDS:
+                if total_cost < upper:
+                    size = band
+                    break
             
-            return round(total_cost / estimated_sqft, 2)
+            return round(total_cost / estimates[size], 2)
         
         return None
     
+    @classmethod
+    def classify_batch(
+        cls,
+        descriptions: Iterable[Optional[str]],
+        costs: Optional[Iterable[Optional[float]]] = None
+    ) -> pd.DataFrame:
+        """
+        批量分类服务类型并提取面积和价格区间
+        
+        对整页 (或整列) 描述做一次向量化处理 (Arrow 计算内核), 结果与逐条调用
+        detect_service_type / extract_square_footage / estimate_price_per_sqft 一致
+        (每平方英尺价格按 numpy 舍入, 恰好落在半分上时可能差 0.01)。
+        返回 DataFrame, 列为 service_type, sqft, price_low, price_high, price_per_sqft
+        (没有有效报价的行价格列为 NaN)
+        """
+        lowered = pc.utf8_lower(pa.array(list(descriptions), type=pa.string()))
+        
+        # 服务类型: 许可证描述重复度很高, 只对去重后的描述打分再按索引展开
+        encoded = pc.dictionary_encode(lowered)
+        winners = np.append(cls.service_matcher().best_batch(encoded.dictionary), 'general')
+        service_types = winners[
+            pc.fill_null(encoded.indices, len(encoded.dictionary)).to_numpy(zero_copy_only=False)
+        ]
+        
+        # 面积: 依次尝试各模式
+        sqft = np.full(len(lowered), np.nan)
+        for pattern in cls.SQFT_PATTERNS:
+            found = pc.struct_field(pc.extract_regex(lowered, pattern.replace('(', '(?P<sqft>', 1)), [0])
+            values = pc.cast(pc.replace_substring(found, ',', ''), pa.float64()).to_numpy(zero_copy_only=False)
+            sqft = np.where(np.isnan(sqft), values, sqft)
+        
+        result = pd.DataFrame({
+            'service_type': service_types,
+            'sqft': sqft,
+        })
+        
+        if costs is None:
+            cost = np.full(len(result), np.nan)
+        else:
+            cost = pd.to_numeric(pd.Series(list(costs)), errors='coerce').to_numpy(float)
+        valid_cost = cost > 0
+        
+        result['price_low'] = np.where(valid_cost, cost * cls.PRICE_BAND_LOW, np.nan)
+        result['price_high'] = np.where(valid_cost, cost * cls.PRICE_BAND_HIGH, np.nan)
+        
+        # 每平方英尺价格: 有面积用实际面积, 否则按服务类型和报价分档估算
+        sizes = np.select(
+            [cost < upper for upper, _ in cls.COST_SIZE_BANDS],
+            [band for _, band in cls.COST_SIZE_BANDS],
+            default='commercial'
+        )
+        service_type_values = result['service_type'].to_numpy()
+        estimated_sqft = np.full(len(result), np.nan)
+        for service_type, estimates in cls.PROJECT_SIZE_ESTIMATES.items():
+            for size, area in estimates.items():
+                estimated_sqft[(service_type_values == service_type) & (sizes == size)] = area
+        has_sqft = result['sqft'].to_numpy() > 0
+        area = np.where(has_sqft, result['sqft'].to_numpy(), estimated_sqft)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result['price_per_sqft'] = np.where(valid_cost, np.round(cost / area, 2), np.nan)
+        
+        return result
+    
     @classmethod
     def analyze_prices(
         cls, 
         prices: List[float], 
         service_type: str
     ) -> Optional[PriceAnalysis]:
-        """分析价格数据"""
+        """分析价格数据 (精确计算; 持久化的汇总草图见 analyze_sketch)"""
         if not prices or len(prices) < 3:
             return None
         
@@ -181,12 +383,219 @@ class PriceCalculator:
             sample_size=len(filtered_prices)
         )
     
+    @classmethod
+    def analyze_sketch(
+        cls,
+        sketch: QuantileSketch,
+        service_type: str
+    ) -> Optional[PriceAnalysis]:
+        """
+        从价格草图分析价格 (IQR 过滤异常值后取最小/最大/均值/中位数)
+        
+        草图可以是 PriceSketchStore.rollup 合并出的区域或时间段汇总。
+        结果是近似值: 最小/最大值是范围内真实出现过的价格, 均值、中位数和样本数
+        在质心合并后与精确算法略有出入
+        """
+        if sketch.count < 3:
+            return None
+        
+        # 过滤异常值 (使用 IQR 方法)
+        stats = sketch.summary(*sketch.iqr_bounds())
+        
+        if stats['count'] < 3:
+            stats = sketch.summary()
+        
+        return PriceAnalysis(
+            service_type=service_type,
+            min_price=stats['min'],
+            max_price=stats['max'],
+            avg_price=round(stats['mean'], 2),
+            median_price=round(stats['median'], 2),
+            sample_size=stats['count']
+        )
+    
+    @classmethod
+    def price_group_stats(
+        cls,
+        table: pd.DataFrame,
+        group_by: Tuple[str, ...] = ('region', 'service_type')
+    ) -> pd.DataFrame:
+        """
+        按分组一次性计算价格统计, 规则与逐组排序的旧算法一致:
+        q1/q3 取组内排序后第 n//4 和 3n//4 个价格, IQR 过滤后不足 3 条时保留全组,
+        少于 3 条价格的组不输出。
+        返回每组一行, 列为分组列加 min_price, max_price, avg_price, median_price, sample_size
+        """
+        keys = list(group_by)
+        df = table[keys + ['price']].copy()
+        df['price'] = pd.to_numeric(df['price'], errors='coerce')
+        df = df.dropna(subset=keys + ['price']).sort_values(keys + ['price'], kind='mergesort')
+        columns = keys + ['min_price', 'max_price', 'avg_price', 'median_price', 'sample_size']
+        if df.empty:
+            return pd.DataFrame(columns=columns)
+        
+        # 组内位置: 已按 (分组, 价格) 排序, 每组起点 = 行号 - 组内序号
+        grouped = df.groupby(keys, sort=False)
+        size = grouped['price'].transform('size').to_numpy()
+        rank = grouped.cumcount().to_numpy()
+        start = np.arange(len(df)) - rank
+        prices = df['price'].to_numpy()
+        
+        # 过滤异常值 (使用 IQR 方法)
+        q1 = prices[start + size // 4]
+        q3 = prices[start + 3 * size // 4]
+        iqr = q3 - q1
+        inside = (prices >= q1 - 1.5 * iqr) & (prices <= q3 + 1.5 * iqr)
+        inside_count = pd.Series(inside, index=df.index).groupby(
+            [df[k] for k in keys], sort=False
+        ).transform('sum').to_numpy()
+        keep = (size >= 3) & (inside | (inside_count < 3))
+        
+        stats = df[keep].groupby(keys, sort=True)['price'].agg(
+            min_price='min', max_price='max', avg_price=_exact_mean,
+            median_price='median', sample_size='size'
+        ).reset_index()
+        # 内置 round 按十进制正确舍入 (numpy 的 round 先乘 100 再取整, 偶尔差一分)
+        stats['avg_price'] = [round(v, 2) for v in stats['avg_price'].tolist()]
+        stats['median_price'] = [round(v, 2) for v in stats['median_price'].tolist()]
+        return stats[columns]
+    
+    @classmethod
+    def analyze_price_groups(
+        cls,
+        table: pd.DataFrame,
+        group_by: Tuple[str, ...] = ('region', 'service_type')
+    ) -> Dict[Tuple, PriceAnalysis]:
+        """
+        批量分析价格: table 至少包含分组列和 price 列 (如 region, service_type, price, date),
+        返回 {分组键: PriceAnalysis}, 分组键为分组列取值组成的元组;
+        有 date 列时 price_trend 取自 price_group_trends。注意其规则与 calculate_price_trend 不同:
+        只看最近 TREND_WINDOW 内的记录, 且少于 TREND_MIN_SAMPLES 条时为 stable
+        """
+        stats = cls.price_group_stats(table, group_by)
+        keys = list(group_by)
+        trends = {}
+        if 'date' in table.columns:
+            for row in cls.price_group_trends(table, group_by).itertuples(index=False):
+                record = row._asdict()
+                trends[tuple(record[k] for k in keys)] = record['trend']
+        result = {}
+        for row in stats.itertuples(index=False):
+            record = row._asdict()
+            key = tuple(record[k] for k in keys)
+            result[key] = PriceAnalysis(
+                service_type=record.get('service_type', 'general'),
+                min_price=float(record['min_price']),
+                max_price=float(record['max_price']),
+                avg_price=float(record['avg_price']),
+                median_price=float(record['median_price']),
+                sample_size=int(record['sample_size']),
+                price_trend=trends.get(key)
+            )
+        return result
+    
+    # 趋势判定: 窗口内拟合的价格变化超过该百分比且置信度足够时判为涨/跌
+    TREND_CHANGE_PCT = 5.0
+    TREND_MIN_CONFIDENCE = 0.9
+    TREND_WINDOW = '180D'
+    TREND_MIN_SAMPLES = 5
+    
+    @classmethod
+    def price_group_trends(
+        cls,
+        table: pd.DataFrame,
+        group_by: Tuple[str, ...] = ('region', 'service_type'),
+        window: str = TREND_WINDOW,
+        rolling: bool = False
+    ) -> pd.DataFrame:
+        """
+        按分组对 (date, price) 做滚动窗口最小二乘回归
+        
+        所有序列的窗口累计量 (n, Σx, Σy, Σxy, Σx², Σy²) 在一次分组滚动求和里算出,
+        再按公式得到斜率、标准误差和置信度 (正态近似的双侧置信度)。
+        pct_per_month 为每 30 天的价格变化占窗口均价的百分比, change_pct 为整个窗口的变化;
+        |change_pct| 超过 TREND_CHANGE_PCT 且置信度不低于 TREND_MIN_CONFIDENCE 时为 up/down,
+        否则为 stable (窗口内少于 TREND_MIN_SAMPLES 条记录时也为 stable)。
+        rolling=False 时每组只返回截至最后一条记录的窗口, True 时返回每条记录结束的窗口。
+        与 calculate_price_trend (全部数据的前后半均值比较) 是两套规则, 结果可能不同
+        """
+        keys = list(group_by)
+        df = table[keys + ['price', 'date']].copy()
+        df['price'] = pd.to_numeric(df['price'], errors='coerce')
+        df['date'] = pd.to_datetime(df['date'], errors='coerce', utc=True, format='mixed').dt.tz_localize(None)
+        df = df.dropna(subset=keys + ['price', 'date']).sort_values(keys + ['date'], kind='mergesort')
+        columns = keys + [
+            'window_end', 'sample_size', 'slope_per_day', 'pct_per_month',
+            'change_pct', 'confidence', 'trend'
+        ]
+        if df.empty:
+            return pd.DataFrame(columns=columns)
+        
+        # x 为距最早记录的天数, 减小平方和的数值误差
+        x = (df['date'] - df['date'].min()).dt.total_seconds().to_numpy() / 86400
+        y = df['price'].to_numpy()
+        sums = pd.DataFrame({
+            'n': 1.0, 'sx': x, 'sy': y, 'sxy': x * y, 'sxx': x * x, 'syy': y * y,
+            'date': df['date'].to_numpy(),
+        })
+        for k in keys:
+            sums[k] = df[k].to_numpy()
+        
+        rolled = sums.groupby(keys, sort=False).rolling(window, on='date')[
+            ['n', 'sx', 'sy', 'sxy', 'sxx', 'syy']
+        ].sum()
+        # df 已按 (分组, 日期) 排序, 滚动结果的行顺序与 df 一致
+        rolled = rolled.reset_index(level=keys)
+        rolled['window_end'] = df['date'].to_numpy()
+        rolled['x_end'] = x
+        # 窗口是组内连续的 n 行, 第一行的位置 = 当前位置 - n + 1
+        rolled['x_start'] = x[np.arange(len(x)) - rolled['n'].to_numpy().astype(int) + 1]
+        if not rolling:
+            rolled = rolled.groupby(keys, sort=False).tail(1)
+        
+        n = rolled['n'].to_numpy()
+        sxx = rolled['sxx'].to_numpy() - rolled['sx'].to_numpy() ** 2 / n
+        sxy = rolled['sxy'].to_numpy() - rolled['sx'].to_numpy() * rolled['sy'].to_numpy() / n
+        syy = rolled['syy'].to_numpy() - rolled['sy'].to_numpy() ** 2 / n
+        mean_y = rolled['sy'].to_numpy() / n
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = np.where(sxx > 0, sxy / sxx, 0.0)
+            residual = np.maximum(syy - slope * sxy, 0.0)
+            stderr = np.sqrt(residual / (n - 2) / sxx)
+            t_stat = np.abs(slope) / stderr
+            t_stat = np.where(residual == 0, np.where(slope != 0, np.inf, 0.0), t_stat)
+            confidence = np.where((n >= cls.TREND_MIN_SAMPLES) & (sxx > 0), _erf(t_stat / np.sqrt(2)), 0.0)
+            span = rolled['x_end'].to_numpy() - rolled['x_start'].to_numpy()
+            pct_per_month = np.where(mean_y != 0, slope * 30 / mean_y * 100, 0.0)
+            change_pct = np.where(mean_y != 0, slope * span / mean_y * 100, 0.0)
+        
+        significant = confidence >= cls.TREND_MIN_CONFIDENCE
+        trend = np.select(
+            [significant & (change_pct > cls.TREND_CHANGE_PCT),
+             significant & (change_pct < -cls.TREND_CHANGE_PCT)],
+            ['up', 'down'],
+            default='stable'
+        )
+        
+        result = rolled[keys + ['window_end']].copy()
+        result['sample_size'] = n.astype(int)
+        result['slope_per_day'] = np.round(slope, 4)
+        result['pct_per_month'] = np.round(pct_per_month, 2)
+        result['change_pct'] = np.round(change_pct, 2)
+        result['confidence'] = np.round(confidence, 4)
+        result['trend'] = trend
+        return result[columns].reset_index(drop=True)
+    
     @classmethod
     def calculate_price_trend(
         cls,
         historical_prices: List[Tuple[datetime, float]]
     ) -> str:
-        """计算价格趋势"""
+        """
+        计算价格趋势: 比较按日期排序后前半和后半的平均价格, 变化超过 5% 为 up/down。
+        使用全部数据, 2 条即可判断; 按时间窗口回归的趋势见 price_group_trends
+        """
         if len(historical_prices) < 2:
             return 'stable'
         
@@ -208,29 +617,26 @@ class PriceCalculator:
             return 'stable'
 
 
+def _exact_mean(prices: pd.Series) -> float:
+    """正确舍入的均值 (与 statistics.mean 一致, 保留两位小数时不会差一分)"""
+    return math.fsum(prices.to_numpy()) / len(prices)
+
+
+def _erf(x: np.ndarray) -> np.ndarray:
+    """误差函数的向量化近似 (Abramowitz-Stegun 7.1.26, 误差 < 1.5e-7)"""
+    x = np.asarray(x, dtype=float)
+    t = 1 / (1 + 0.3275911 * np.abs(x))
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return np.sign(x) * (1 - poly * np.exp(-x * x))
+
+
 class ContractorMatcher:
     """承包商匹配器 - 从许可证数据中识别承包商"""
     
     @staticmethod
     def normalize_name(name: str) -> str:
-        """标准化公司名称"""
-        if not name:
-            return ''
-        
-        # 转换为大写并去除多余空格
-        normalized = ' '.join(name.upper().split())
-        
-        # 移除常见后缀
-        suffixes = [
-            ' INC', ' INC.', ' LLC', ' LLC.', ' CO', ' CO.',
-            ' CORP', ' CORP.', ' LTD', ' LTD.', ' LP', ' LP.'
-        ]
-        
-        for suffix in suffixes:
-            if normalized.endswith(suffix):
-                normalized = normalized[:-len(suffix)]
-        
-        return normalized.strip()
+        """标准化公司名称 (见 name_normalizer.canonical_company_name)"""
+        return canonical_company_name(name)
     
     @staticmethod
     def extract_contractor_from_permit(permit_data: Dict) -> Optional[Dict]:
@@ -258,16 +664,33 @@ class ContractorMatcher:
             'address': permit_data.get('contractor_address', permit_data.get('business_address'))
         }
     
+    @classmethod
+    def build_index(cls, companies: Iterable[Dict] = ()) -> 'CompanyIndex':
+        """为企业列表 (需要 id 和 name) 建立匹配索引, 之后可以继续 add 新同步的企业"""
+        from company_index import CompanyIndex
+        
+        index = CompanyIndex(cls.normalize_name)
+        index.add_companies(companies)
+        return index
+    
     @classmethod
     def match_contractor_to_company(
         cls,
         contractor_name: str,
-        existing_companies: List[Dict]
+        existing_companies: Optional[List[Dict]] = None,
+        index: Optional['CompanyIndex'] = None
     ) -> Optional[str]:
-        """匹配承包商到现有企业"""
+        """
+        匹配承包商到现有企业
+        
+        提供 index (见 build_index) 时在索引中查找, 否则逐个比较 existing_companies
+        """
+        if index is not None:
+            return index.best_match(contractor_name)
+        
         normalized_name = cls.normalize_name(contractor_name)
         
-        for company in existing_companies:
+        for company in existing_companies or []:
             company_normalized = cls.normalize_name(company.get('name', ''))
             
             # 精确匹配
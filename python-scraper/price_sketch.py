@@ -0,0 +1,407 @@
+"""
+价格分位数草图
+用可合并的 t-digest 增量维护价格分布, 分位数、IQR 过滤和均值都不需要保存原始价格;
+按 城市/服务类型/月份 保存的草图可以直接合并成区域汇总, 不必重新扫描价格记录
+"""
+
+import os
+import json
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from sync_state import STATE_DIR
+
+PRICE_SKETCH_PATH = os.path.join(STATE_DIR, 'price_sketches.json')
+# scraper.py 按 region_id 归档的价格记录, 与许可证价格分开保存
+REGION_PRICE_SKETCH_PATH = os.path.join(STATE_DIR, 'region_price_sketches.json')
+
+
+class QuantileSketch:
+    """
+    合并式 t-digest (Dunning, k1 尺度函数)
+
+    新值先进入缓冲区, 缓冲区满时与已有质心一起排序并贪心合并。
+    尾部质心保持很小, 因此极值附近的分位数接近精确。
+    每个质心另外记录其成员的最小值和最大值, 裁剪后的最小/最大值总是取真实出现过的价格。
+    计数、总和、极值和方差 (Welford/Chan 合并) 是精确的, 分位数和裁剪结果是近似值,
+    只用于持久化的汇总; 内存中的价格列表请用精确算法 (PriceCalculator.analyze_prices)
+    """
+
+    def __init__(self, compression: int = 100):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.mins = np.empty(0)
+        self.maxs = np.empty(0)
+        self._buffer: List[float] = []
+        self.count = 0
+        self.total = 0.0
+        self.m2 = 0.0   # 与均值之差的平方和
+        self.min = math.inf
+        self.max = -math.inf
+
+    # ---- 写入 ----
+
+    def _merge_moments(self, count: int, mean: float, m2: float):
+        """按 Chan 公式并入另一组值的平方和 (须在更新 count/total 之前调用)"""
+        if not self.count:
+            self.m2 = m2
+            return
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.count * count / (self.count + count)
+
+    def add(self, value: float):
+        """加入一个值"""
+        value = float(value)
+        if math.isnan(value):
+            return
+        self._merge_moments(1, value, 0.0)
+        self._buffer.append(value)
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def extend(self, values: Iterable[float]):
+        """批量加入"""
+        array = np.asarray(list(values), dtype=float)
+        array = array[~np.isnan(array)]
+        if not len(array):
+            return
+        batch_mean = float(array.mean())
+        self._merge_moments(len(array), batch_mean, float(((array - batch_mean) ** 2).sum()))
+        self._buffer.extend(array.tolist())
+        self.count += len(array)
+        self.total += float(array.sum())
+        self.min = min(self.min, float(array.min()))
+        self.max = max(self.max, float(array.max()))
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """把另一个草图并入当前草图 (原地), 返回自身"""
+        other._compress()
+        if not other.count:
+            return self
+        self._compress()
+        self._compress(other.means, other.weights, other.mins, other.maxs)
+        self._merge_moments(other.count, other.mean, other.m2)
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @classmethod
+    def merged(cls, sketches: Iterable['QuantileSketch'], compression: int = 100) -> 'QuantileSketch':
+        """合并多个草图为一个新草图"""
+        result = cls(compression)
+        for sketch in sketches:
+            result.merge(sketch)
+        return result
+
+    def _k_limit(self, q: float) -> float:
+        """从累计比例 q 出发, 一个质心最多能覆盖到的累计比例"""
+        delta = self.compression
+        k = delta / (2 * math.pi) * math.asin(2 * q - 1) + 1
+        if k >= delta / 4:
+            return 1.0
+        return (math.sin(2 * math.pi * k / delta) + 1) / 2
+
+    def _compress(
+        self,
+        extra_means: Optional[np.ndarray] = None,
+        extra_weights: Optional[np.ndarray] = None,
+        extra_mins: Optional[np.ndarray] = None,
+        extra_maxs: Optional[np.ndarray] = None
+    ):
+        """把缓冲区 (和额外质心) 合并进质心列表"""
+        if not self._buffer and extra_means is None:
+            return
+        buffer = np.asarray(self._buffer, dtype=float)
+        means = [self.means, buffer]
+        weights = [self.weights, np.ones(len(buffer))]
+        mins = [self.mins, buffer]
+        maxs = [self.maxs, buffer]
+        if extra_means is not None:
+            means.append(extra_means)
+            weights.append(extra_weights)
+            mins.append(extra_mins)
+            maxs.append(extra_maxs)
+        self._buffer = []
+
+        means = np.concatenate(means)
+        weights = np.concatenate(weights)
+        mins = np.concatenate(mins)
+        maxs = np.concatenate(maxs)
+        order = np.argsort(means, kind='mergesort')
+        means, weights, mins, maxs = means[order], weights[order], mins[order], maxs[order]
+        total = weights.sum()
+
+        new_means: List[float] = []
+        new_weights: List[float] = []
+        new_mins: List[float] = []
+        new_maxs: List[float] = []
+        current_mean, current_weight = float(means[0]), float(weights[0])
+        current_min, current_max = float(mins[0]), float(maxs[0])
+        weight_so_far = 0.0
+        limit = self._k_limit(0.0)
+        for mean, weight, low, high in zip(
+            means[1:].tolist(), weights[1:].tolist(), mins[1:].tolist(), maxs[1:].tolist()
+        ):
+            if (weight_so_far + current_weight + weight) / total <= limit:
+                current_weight += weight
+                current_mean += (mean - current_mean) * weight / current_weight
+                current_min, current_max = min(current_min, low), max(current_max, high)
+            else:
+                new_means.append(current_mean)
+                new_weights.append(current_weight)
+                new_mins.append(current_min)
+                new_maxs.append(current_max)
+                weight_so_far += current_weight
+                limit = self._k_limit(weight_so_far / total)
+                current_mean, current_weight = mean, weight
+                current_min, current_max = low, high
+        new_means.append(current_mean)
+        new_weights.append(current_weight)
+        new_mins.append(current_min)
+        new_maxs.append(current_max)
+
+        self.means = np.asarray(new_means)
+        self.weights = np.asarray(new_weights)
+        self.mins = np.asarray(new_mins)
+        self.maxs = np.asarray(new_maxs)
+
+    # ---- 查询 ----
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    @property
+    def variance(self) -> float:
+        """总体方差 (与 numpy.var 默认一致)"""
+        return self.m2 / self.count if self.count else math.nan
+
+    def describe(self) -> Dict[str, float]:
+        """与 scraper.DataProcessor.calculate_price_stats 相同的字段 (中位数为估计值)"""
+        if not self.count:
+            return {}
+        return {
+            'min': self.min,
+            'max': self.max,
+            'avg': self.mean,
+            'median': self.quantile(0.5),
+            'std': math.sqrt(self.variance),
+            'count': self.count,
+        }
+
+    def quantile(self, q: float) -> float:
+        """估计分位数 (0 <= q <= 1)"""
+        self._compress()
+        if not self.count:
+            return math.nan
+        if len(self.means) == 1:
+            return float(self.means[0])
+
+        index = min(max(q, 0.0), 1.0) * self.count
+        centers = np.cumsum(self.weights) - self.weights / 2
+        if index <= centers[0]:
+            return self.min + (self.means[0] - self.min) * index / centers[0]
+        if index >= centers[-1]:
+            tail = self.count - centers[-1]
+            return self.means[-1] + (self.max - self.means[-1]) * (index - centers[-1]) / tail
+        return float(np.interp(index, centers, self.means))
+
+    def iqr_bounds(self, k: float = 1.5) -> Tuple[float, float]:
+        """IQR 异常值边界 (q1 - k*iqr, q3 + k*iqr)"""
+        q1, q3 = self.quantile(0.25), self.quantile(0.75)
+        iqr = q3 - q1
+        return q1 - k * iqr, q3 + k * iqr
+
+    def summary(self, lower: float = -math.inf, upper: float = math.inf) -> Dict[str, float]:
+        """
+        [lower, upper] 范围内的样本数、最小值、最大值、均值和中位数
+
+        以质心为单位做裁剪: 尾部质心很小, IQR 边界外的值几乎都单独成为质心。
+        最小/最大值取落在范围内的质心成员极值 (都是真实出现过的价格), 不做插值
+        """
+        self._compress()
+        inside = (self.means >= lower) & (self.means <= upper)
+        if not self.count or not inside.any():
+            return {'count': 0, 'min': math.nan, 'max': math.nan, 'mean': math.nan, 'median': math.nan}
+
+        weights = self.weights[inside]
+        means = self.means[inside]
+        count = float(weights.sum())
+        below = float(self.weights[self.means < lower].sum())
+        extremes = np.concatenate([self.mins[inside], self.maxs[inside]])
+        in_bounds = extremes[(extremes >= lower) & (extremes <= upper)]
+        # 极少数情况下唯一的质心横跨整个范围, 只能取它的成员极值
+        extremes = in_bounds if len(in_bounds) else extremes
+        return {
+            'count': int(round(count)),
+            'min': float(extremes.min()),
+            'max': float(extremes.max()),
+            'mean': float((means * weights).sum() / count),
+            'median': self.quantile((below + count / 2) / self.count),
+        }
+
+    # ---- 持久化 ----
+
+    def to_dict(self) -> Dict:
+        self._compress()
+        return {
+            'compression': self.compression,
+            'means': self.means.tolist(),
+            'weights': self.weights.tolist(),
+            'mins': self.mins.tolist(),
+            'maxs': self.maxs.tolist(),
+            'count': self.count,
+            'total': self.total,
+            'm2': self.m2,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'QuantileSketch':
+        sketch = cls(data.get('compression', 100))
+        sketch.means = np.asarray(data['means'], dtype=float)
+        sketch.weights = np.asarray(data['weights'], dtype=float)
+        # 旧格式没有成员极值, 以质心均值代替
+        sketch.mins = np.asarray(data.get('mins', data['means']), dtype=float)
+        sketch.maxs = np.asarray(data.get('maxs', data['means']), dtype=float)
+        sketch.count = data['count']
+        sketch.total = data['total']
+        if 'm2' in data:
+            sketch.m2 = data['m2']
+        elif sketch.count:
+            # 旧格式没有平方和, 用质心近似 (忽略质心内部的离散)
+            sketch.m2 = float((sketch.weights * (sketch.means - sketch.mean) ** 2).sum())
+        if sketch.count:
+            sketch.min = data['min']
+            sketch.max = data['max']
+        return sketch
+
+
+class PriceSketchStore:
+    """
+    按 (城市, 服务类型, 月份) 保存的价格草图
+
+    快照为 JSON 文件 (原子写入); 两次快照之间加入的价格逐批追加到日志文件,
+    加载时重放, 因此价格写库后即使进程中断也不会从草图中丢失。
+    快照带代号, 日志文件名含代号: 保存快照后旧日志作废, 中断在两步之间也不会重放两次
+    """
+
+    def __init__(self, path: str = PRICE_SKETCH_PATH, compression: int = 100):
+        self.path = path
+        self.compression = compression
+        self.sketches: Dict[Tuple[str, str, str], QuantileSketch] = {}
+        self.generation = 0
+        self.load()
+
+    def journal_path(self, generation: Optional[int] = None) -> str:
+        return f"{self.path}.{self.generation if generation is None else generation}.journal"
+
+    def load(self):
+        """从快照加载草图, 再重放快照之后的日志"""
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if 'sketches' not in data:
+                # 旧格式: 整个文件就是草图字典
+                data = {'generation': 0, 'sketches': data}
+            self.generation = data['generation']
+            self.sketches = {
+                tuple(key.split('|', 2)): QuantileSketch.from_dict(value)
+                for key, value in data['sketches'].items()
+            }
+
+        journal = self.journal_path()
+        if os.path.exists(journal):
+            with open(journal, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break   # 中断时写了一半的最后一行
+                    self._apply(entry['city'], entry['prices'])
+
+    def save(self):
+        """写入新一代快照 (先写临时文件再替换, 避免中断时损坏), 然后删除旧日志"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        old_journal = self.journal_path()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(
+                {
+                    'generation': self.generation + 1,
+                    'sketches': {'|'.join(key): sketch.to_dict() for key, sketch in self.sketches.items()},
+                },
+                f, ensure_ascii=False
+            )
+        os.replace(tmp_path, self.path)
+        self.generation += 1
+        if os.path.exists(old_journal):
+            os.remove(old_journal)
+
+    def sketch(self, city: str, service_type: str, month: str) -> QuantileSketch:
+        key = (city, service_type, month)
+        if key not in self.sketches:
+            self.sketches[key] = QuantileSketch(self.compression)
+        return self.sketches[key]
+
+    def add_records(self, city: str, records: Iterable[Dict]):
+        """
+        加入价格记录 (PriceRecord 字典), 取报价区间中点作为项目价格,
+        按 recorded_at 的月份归档
+        """
+        prices = []
+        for record in records:
+            low, high = record.get('price_low'), record.get('price_high')
+            if not low or not high:
+                continue
+            month = str(record.get('recorded_at') or '')[:7] or 'unknown'
+            prices.append([record.get('service_type') or 'general', month, (low + high) / 2])
+        self.add_prices(city, prices)
+
+    def add_prices(self, city: str, prices: List[List]):
+        """加入 [服务类型, 月份, 价格] 列表; 先追加到日志再计入草图"""
+        if not prices:
+            return
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.journal_path(), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'city': city, 'prices': prices}, ensure_ascii=False) + '\n')
+        self._apply(city, prices)
+
+    def _apply(self, city: str, prices: List[List]):
+        grouped: Dict[Tuple[str, str], List[float]] = {}
+        for service_type, month, price in prices:
+            grouped.setdefault((service_type, month), []).append(price)
+        for (service_type, month), values in grouped.items():
+            self.sketch(city, service_type, month).extend(values)
+
+    def rollup(
+        self,
+        service_type: Optional[str] = None,
+        cities: Optional[List[str]] = None,
+        start_month: Optional[str] = None,
+        end_month: Optional[str] = None
+    ) -> QuantileSketch:
+        """合并符合条件的草图 (月份为 YYYY-MM, 含两端)"""
+        return QuantileSketch.merged(
+            (
+                sketch for (city, stype, month), sketch in self.sketches.items()
+                if (service_type is None or stype == service_type)
+                and (cities is None or city in cities)
+                and (start_month is None or month >= start_month)
+                and (end_month is None or month <= end_month)
+            ),
+            self.compression
+        )
@@ -0,0 +1,359 @@
+"""
+Rate limiting for API data sources
+Per-source token buckets (burst + sustained rate), daily/monthly quotas
+persisted across restarts, round-robin fair queuing between jobs sharing a
+source, and AIMD rate control driven by 429/503 and Retry-After feedback.
+"""
+
+import os
+import json
+import time
+import asyncio
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, Mapping, Optional
+
+from data_sources_config import DATA_SOURCES
+from sync_state import STATE_DIR
+
+RATE_QUOTA_PATH = os.path.join(STATE_DIR, 'rate_quotas.json')
+
+# Minimum seconds between quota file writes (counts are also saved on close)
+QUOTA_SAVE_INTERVAL = 5.0
+
+# AIMD rate control: on 429/503 the rate is multiplied by AIMD_DECREASE (not
+# below AIMD_MIN_FRACTION of the configured rate); after each AIMD_INTERVAL
+# seconds without throttling it grows by AIMD_INCREASE of the configured rate
+THROTTLE_STATUSES = frozenset([429, 503])
+AIMD_DECREASE = 0.5
+AIMD_INCREASE = 0.05
+AIMD_INTERVAL = 1.0
+AIMD_MIN_FRACTION = 0.02
+# Upper bound on a single Retry-After pause
+MAX_RETRY_AFTER = 300.0
+
+
+@dataclass
+class RateLimit:
+    rate: float                    # sustained requests per second
+    burst: int = 1                 # bucket capacity
+    daily: Optional[int] = None    # requests per UTC day
+    monthly: Optional[int] = None  # requests per UTC month
+
+
+# Limits per source (keyed like http_cache.HTTP_CACHE_TTLS)
+RATE_LIMITS = {
+    "sec_edgar": RateLimit(rate=10, burst=10),
+    "google_places": RateLimit(rate=50, burst=50),
+    "yelp": RateLimit(rate=5, burst=5),
+    "opencorporates": RateLimit(
+        rate=1, burst=1,
+        daily=DATA_SOURCES["commercial"]["opencorporates"]["rate_limit"],
+    ),
+}
+DEFAULT_RATE_LIMIT = RateLimit(rate=10, burst=10)
+
+# Job the current task is working for; requests of different jobs on the
+# same source are served round-robin
+current_job: contextvars.ContextVar[str] = contextvars.ContextVar('rate_limit_job', default='default')
+
+
+@contextmanager
+def rate_limit_job(name: str):
+    """Tag requests made inside the block (and tasks spawned from it) with a job name"""
+    token = current_job.set(name)
+    try:
+        yield
+    finally:
+        current_job.reset(token)
+
+
+class QuotaExceededError(Exception):
+    """A source's daily or monthly request quota is used up"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header (delta-seconds or HTTP date) -> seconds to wait"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second up to `burst`"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def set_rate(self, rate: float, burst: int):
+        self._refill()
+        self.rate = rate
+        self.burst = burst
+        self.tokens = min(self.tokens, burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+
+class QuotaStore:
+    """Request counts per source for the current UTC day and month (JSON file, atomic writes)"""
+
+    def __init__(self, path: str = RATE_QUOTA_PATH):
+        self.path = path
+        self.counts: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+        self.saved_at = 0.0
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self.counts = json.load(f)
+
+    def save(self, force: bool = True):
+        """Write the counts; with force=False at most every QUOTA_SAVE_INTERVAL seconds"""
+        if not self.dirty:
+            return
+        if not force and time.monotonic() - self.saved_at < QUOTA_SAVE_INTERVAL:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.counts, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+        self.saved_at = time.monotonic()
+
+    def usage(self, source: str) -> Dict[str, Any]:
+        """Current period counts for a source (rolled over when the day/month changed)"""
+        now = datetime.now(timezone.utc)
+        day, month = now.strftime('%Y-%m-%d'), now.strftime('%Y-%m')
+        entry = self.counts.setdefault(source, {"day": day, "daily": 0, "month": month, "monthly": 0})
+        if entry["day"] != day:
+            entry["day"], entry["daily"] = day, 0
+        if entry["month"] != month:
+            entry["month"], entry["monthly"] = month, 0
+        return entry
+
+    def record(self, source: str):
+        entry = self.usage(source)
+        entry["daily"] += 1
+        entry["monthly"] += 1
+        self.dirty = True
+        self.save(force=False)
+
+
+class SourceRateLimiter:
+    """
+    Rate limiter for one source.
+
+    Waiting requests are queued per job and granted one at a time as tokens
+    become available, rotating between jobs so a large job cannot starve a
+    small one. A request that would exceed the daily or monthly quota fails
+    with QuotaExceededError instead of waiting.
+
+    observe() feeds response statuses back: 429/503 halve the rate and pause
+    the source for Retry-After seconds, successful responses ramp the rate
+    back up towards the configured ceiling.
+    """
+
+    def __init__(self, source: str, limit: RateLimit, quotas: QuotaStore):
+        self.source = source
+        self.limit = limit
+        self.quotas = quotas
+        self.bucket = TokenBucket(limit.rate, limit.burst)
+        self.queues: 'OrderedDict[str, Deque[asyncio.Future]]' = OrderedDict()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        self.rate = limit.rate
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.last_increase = 0.0
+
+        self.granted = 0
+        self.rejected = 0
+        self.wait_time = 0.0
+        self.responses = 0
+        self.throttled = 0
+        self.server_errors = 0
+        self.backoffs = 0
+        self.retry_after_wait = 0.0
+
+    def quota_error(self) -> Optional[str]:
+        usage = self.quotas.usage(self.source)
+        if self.limit.daily is not None and usage["daily"] >= self.limit.daily:
+            return f"{self.source}: daily quota of {self.limit.daily} requests used"
+        if self.limit.monthly is not None and usage["monthly"] >= self.limit.monthly:
+            return f"{self.source}: monthly quota of {self.limit.monthly} requests used"
+        return None
+
+    async def acquire(self):
+        """Wait for permission to send one request"""
+        error = self.quota_error()
+        if error:
+            self.rejected += 1
+            raise QuotaExceededError(error)
+
+        future = asyncio.get_running_loop().create_future()
+        job = current_job.get()
+        if job not in self.queues:
+            self.queues[job] = deque()
+        self.queues[job].append(future)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        started = time.monotonic()
+        await future
+        self.wait_time += time.monotonic() - started
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        """Oldest live request of the next job in round-robin order"""
+        while self.queues:
+            job, queue = next(iter(self.queues.items()))
+            while queue and queue[0].done():
+                queue.popleft()     # cancelled while waiting
+            if not queue:
+                del self.queues[job]
+                continue
+            future = queue.popleft()
+            if queue:
+                self.queues.move_to_end(job)
+            else:
+                del self.queues[job]
+            return future
+        return None
+
+    def _set_rate(self, rate: float):
+        self.rate = rate
+        burst = max(1, round(self.limit.burst * rate / self.limit.rate))
+        self.bucket.set_rate(rate, burst)
+
+    def observe(self, status: int, headers: Optional[Mapping[str, str]] = None):
+        """Feed back the status of a response from the source (AIMD)"""
+        now = time.monotonic()
+        self.responses += 1
+        if status in THROTTLE_STATUSES:
+            self.throttled += 1
+            retry_after = parse_retry_after((headers or {}).get('Retry-After'))
+            if retry_after:
+                retry_after = min(retry_after, MAX_RETRY_AFTER)
+                if now + retry_after > self.paused_until:
+                    self.retry_after_wait += now + retry_after - max(now, self.paused_until)
+                    self.paused_until = now + retry_after
+            # One decrease per interval: a burst of 429s for requests already
+            # in flight counts as a single congestion signal
+            if now - self.last_decrease >= AIMD_INTERVAL:
+                self.backoffs += 1
+                self.last_decrease = now
+                self._set_rate(max(self.limit.rate * AIMD_MIN_FRACTION, self.rate * AIMD_DECREASE))
+            return
+
+        if status >= 500:
+            self.server_errors += 1
+        elif (
+            status < 400 and self.rate < self.limit.rate
+            and now - max(self.last_decrease, self.last_increase) >= AIMD_INTERVAL
+        ):
+            self.last_increase = now
+            self._set_rate(min(self.limit.rate, self.rate + self.limit.rate * AIMD_INCREASE))
+
+    async def _dispatch(self):
+        while self.queues:
+            paused = self.paused_until - time.monotonic()
+            if paused > 0:
+                await asyncio.sleep(paused)
+                continue
+            delay = self.bucket.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            future = self._next_waiter()
+            if future is None:
+                break
+            error = self.quota_error()
+            if error:
+                self.rejected += 1
+                future.set_exception(QuotaExceededError(error))
+                continue
+            self.bucket.take()
+            self.quotas.record(self.source)
+            self.granted += 1
+            future.set_result(None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        usage = self.quotas.usage(self.source)
+        return {
+            "rate": round(self.rate, 3),
+            "max_rate": self.limit.rate,
+            "burst": self.bucket.burst,
+            "tokens": round(min(self.bucket.burst, self.bucket.tokens), 2),
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 1),
+            "queued": {job: len(queue) for job, queue in self.queues.items()},
+            "granted": self.granted,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(1000 * self.wait_time / self.granted, 1) if self.granted else 0.0,
+            "responses": self.responses,
+            "throttled": self.throttled,
+            "server_errors": self.server_errors,
+            "error_rate": round((self.throttled + self.server_errors) / self.responses, 3) if self.responses else 0.0,
+            "backoffs": self.backoffs,
+            "retry_after_wait_s": round(self.retry_after_wait, 1),
+            "daily_used": usage["daily"],
+            "daily_limit": self.limit.daily,
+            "monthly_used": usage["monthly"],
+            "monthly_limit": self.limit.monthly,
+        }
+
+
+_quota_store: Optional[QuotaStore] = None
+_rate_limiters: Dict[str, SourceRateLimiter] = {}
+
+
+def get_rate_limiter(source: str) -> SourceRateLimiter:
+    """Process-wide limiter for a source, shared by every client of that source"""
+    global _quota_store
+    if _quota_store is None:
+        _quota_store = QuotaStore()
+    if source not in _rate_limiters:
+        _rate_limiters[source] = SourceRateLimiter(
+            source, RATE_LIMITS.get(source, DEFAULT_RATE_LIMIT), _quota_store
+        )
+    return _rate_limiters[source]
+
+
+def save_rate_quotas():
+    """Persist quota counts (call on shutdown)"""
+    if _quota_store is not None:
+        _quota_store.save()
+
+
+def get_rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    return {source: limiter.get_stats() for source, limiter in _rate_limiters.items()}
@@ -0,0 +1,233 @@
+"""
+Per-source resilience for outbound requests
+Classifies failures as retryable (timeouts, connection errors, 408/429/5xx)
+or not, retries the retryable ones with jittered exponential backoff, and
+trips a circuit breaker after repeated failures so calls to a source that
+is down fail fast instead of each waiting out a timeout.
+"""
+
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import aiohttp
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+RETRYABLE_STATUSES = frozenset([408, 425, 429, 500, 502, 503, 504])
+
+
+class SourceUnavailableError(Exception):
+    """The source's circuit breaker is open; the call was not attempted"""
+
+
+class TransientHTTPError(Exception):
+    """Response with a status worth retrying (throttling or server error)"""
+
+    def __init__(self, source: str, status: int):
+        super().__init__(f"{source}: HTTP {status}")
+        self.status = status
+
+
+def is_retryable(error: BaseException) -> bool:
+    """True for failures that may succeed on a later attempt"""
+    if isinstance(error, (TransientHTTPError, asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)):
+        return True
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRYABLE_STATUSES
+    return False
+
+
+@dataclass
+class RetryPolicy:
+    attempts: int = 3              # total attempts per call
+    initial_wait: float = 0.5      # backoff multiplier in seconds (full jitter)
+    max_wait: float = 10.0         # upper bound on one backoff
+    failure_threshold: int = 5     # consecutive failed calls that open the breaker
+    reset_timeout: float = 60.0    # seconds before an open breaker lets a probe through
+
+
+# Policies per source (keyed like http_cache.HTTP_CACHE_TTLS)
+RETRY_POLICIES = {
+    "sec_edgar": RetryPolicy(attempts=3, initial_wait=0.5, max_wait=8),
+    "google_places": RetryPolicy(attempts=3, initial_wait=0.5, max_wait=8),
+    "yelp": RetryPolicy(attempts=3, initial_wait=1, max_wait=10),
+    # Retries spend the daily quota
+    "opencorporates": RetryPolicy(attempts=2, initial_wait=2, max_wait=10),
+    "state_registry": RetryPolicy(attempts=2, initial_wait=2, max_wait=15, reset_timeout=300),
+    "bbb": RetryPolicy(attempts=2, initial_wait=2, max_wait=15, reset_timeout=300),
+    "osha": RetryPolicy(attempts=2, initial_wait=2, max_wait=15, reset_timeout=300),
+}
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed: calls pass; failure_threshold failed calls in a row open it.
+    open: calls fail fast with SourceUnavailableError until reset_timeout
+    has passed, then one probe call is let through (half_open). The probe
+    closes the breaker on success and reopens it on failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, source: str, failure_threshold: int, reset_timeout: float):
+        self.source = source
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+        self.trips = 0
+        self.rejected = 0
+
+    def before_call(self):
+        """Raise SourceUnavailableError if the call must not be attempted"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise SourceUnavailableError(f"{self.source}: circuit open")
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self.probing:
+                self.rejected += 1
+                raise SourceUnavailableError(f"{self.source}: circuit half-open, probe in flight")
+            self.probing = True
+
+    def record_success(self):
+        self.probing = False
+        self.consecutive_failures = 0
+        if self.state != self.CLOSED:
+            logger.info(f"{self.source}: circuit closed")
+        self.state = self.CLOSED
+
+    def record_failure(self):
+        self.probing = False
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+                logger.warning(f"{self.source}: circuit opened after {self.consecutive_failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """The call ended without a verdict on the source's health (non-retryable error)"""
+        self.probing = False
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+
+    def get_stats(self) -> Dict[str, Any]:
+        retry_in = 0.0
+        if self.state == self.OPEN:
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "retry_in_s": round(retry_in, 1),
+        }
+
+
+class SourceGuard:
+    """Retry policy plus circuit breaker for one source"""
+
+    def __init__(self, source: str, policy: RetryPolicy):
+        self.source = source
+        self.policy = policy
+        self.breaker = CircuitBreaker(source, policy.failure_threshold, policy.reset_timeout)
+
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+
+    def _before_retry(self, retry_state):
+        self.retries += 1
+        logger.debug(
+            f"{self.source}: retrying after {retry_state.outcome.exception()!r} "
+            f"(attempt {retry_state.attempt_number})"
+        )
+
+    async def call(self, operation: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run operation with retries. Retryable failures that survive all
+        attempts count against the breaker and are re-raised; other
+        exceptions propagate immediately.
+        """
+        self.breaker.before_call()
+        self.calls += 1
+
+        async def attempt() -> T:
+            # Stop retrying if other calls opened the breaker meanwhile
+            if self.breaker.state == CircuitBreaker.OPEN:
+                raise SourceUnavailableError(f"{self.source}: circuit open")
+            return await operation()
+
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.policy.attempts),
+            wait=wait_random_exponential(multiplier=self.policy.initial_wait, max=self.policy.max_wait),
+            retry=retry_if_exception(is_retryable),
+            before_sleep=self._before_retry,
+            reraise=True,
+        )
+        try:
+            result = await retrying(attempt)
+        except Exception as e:
+            if is_retryable(e):
+                self.failures += 1
+                self.breaker.record_failure()
+            else:
+                self.breaker.release()
+            raise
+        except BaseException:
+            # Cancelled (or interrupted): no verdict, but a half-open probe
+            # must give up its slot or every later call is rejected
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "breaker": self.breaker.get_stats(),
+        }
+
+
+_guards: Dict[str, SourceGuard] = {}
+
+
+def get_source_guard(source: str, policy: Optional[RetryPolicy] = None) -> SourceGuard:
+    """
+    Process-wide guard for a source. Names like "state_registry:CA" use the
+    policy of their prefix but get their own breaker.
+    """
+    if source not in _guards:
+        if policy is None:
+            policy = RETRY_POLICIES.get(source, RETRY_POLICIES.get(source.split(':', 1)[0], DEFAULT_RETRY_POLICY))
+        _guards[source] = SourceGuard(source, policy)
+    return _guards[source]
+
+
+def get_resilience_stats() -> Dict[str, Dict[str, Any]]:
+    """Retry counters and breaker state per source"""
+    return {source: guard.get_stats() for source, guard in _guards.items()}
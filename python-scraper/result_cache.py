@@ -0,0 +1,219 @@
+"""
+Persistent cache of parsed data source results
+Stores per-source lookup results (search hits, company details) as JSON in
+SQLite, keyed by source, operation and normalized query, so repeated
+refreshes skip sources whose data is still fresh. Freshness is set per
+source; empty results use a shorter TTL. Each entry records its own expiry
+time when stored.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from sync_state import STATE_DIR
+
+RESULT_CACHE_PATH = os.path.join(STATE_DIR, 'result_cache.sqlite3')
+
+# Freshness per source in seconds (registry data changes rarely, reviews more often)
+RESULT_CACHE_TTLS = {
+    "sec_edgar": 24 * 3600,
+    "opencorporates": 7 * 24 * 3600,
+    "google_places": 6 * 3600,
+    "yelp": 6 * 3600,
+}
+DEFAULT_TTL = 3600
+# Freshness of empty results (no match, no details)
+NEGATIVE_TTL = 3600
+
+# Size bound
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+
+class ResultCache:
+    """
+    SQLite-backed result store with per-source TTLs, LRU eviction and hit/miss
+    counters. Methods are blocking and thread-safe; DataAggregator runs them
+    in worker threads so disk I/O stays off the event loop
+    """
+
+    def __init__(
+        self,
+        path: str = RESULT_CACHE_PATH,
+        ttls: Optional[Dict[str, int]] = None,
+        negative_ttl: int = NEGATIVE_TTL,
+        max_bytes: int = MAX_CACHE_BYTES,
+    ):
+        self.path = path
+        self.ttls = dict(RESULT_CACHE_TTLS if ttls is None else ttls)
+        self.negative_ttl = negative_ttl
+        self.max_bytes = max_bytes
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self.lock = threading.RLock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                source TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                empty INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (source, key)
+            )
+        """)
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(results)")}
+        if 'expires_at' not in columns:
+            # Entries stored before expiry times were recorded count as expired
+            self.db.execute("ALTER TABLE results ADD COLUMN expires_at REAL NOT NULL DEFAULT 0")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed_at)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_results_expires ON results (expires_at)")
+        self.db.commit()
+        # Running total of stored value sizes, kept up to date by put/evict/invalidate
+        self.total_bytes = self._sum_sizes()
+
+    def _sum_sizes(self) -> int:
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    @staticmethod
+    def make_key(operation: str, query: Tuple) -> str:
+        return json.dumps([operation, *query], ensure_ascii=False)
+
+    def ttl_for(self, source: str, empty: bool = False) -> int:
+        ttl = self.ttls.get(source, DEFAULT_TTL)
+        return min(ttl, self.negative_ttl) if empty else ttl
+
+    def _count(self, source: str, counter: str, amount: int = 1):
+        with self.lock:
+            source_stats = self.stats.setdefault(source, {
+                "hits": 0, "misses": 0, "expired": 0, "stores": 0, "evictions": 0,
+            })
+            source_stats[counter] += amount
+
+    def get(self, source: str, operation: str, query: Tuple) -> Tuple[bool, Any]:
+        """(found, value) for a fresh entry; stale entries count as misses"""
+        key = self.make_key(operation, query)
+        with self.lock:
+            row = self.db.execute(
+                "SELECT value, expires_at FROM results WHERE source = ? AND key = ?",
+                (source, key)
+            ).fetchone()
+            if not row:
+                self._count(source, "misses")
+                return False, None
+            value, expires_at = row
+            now = time.time()
+            if now >= expires_at:
+                self._count(source, "expired")
+                return False, None
+
+            self.db.execute(
+                "UPDATE results SET accessed_at = ? WHERE source = ? AND key = ?",
+                (now, source, key)
+            )
+            self.db.commit()
+            self._count(source, "hits")
+        return True, json.loads(value)
+
+    def is_expired(self, source: str, operation: str, query: Tuple) -> bool:
+        """Whether an entry exists but is past its TTL"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT expires_at FROM results WHERE source = ? AND key = ?",
+                (source, self.make_key(operation, query))
+            ).fetchone()
+        return bool(row) and time.time() >= row[0]
+
+    def put(self, source: str, operation: str, query: Tuple, value: Any):
+        """Store a JSON-serializable result"""
+        body = json.dumps(value, ensure_ascii=False)
+        key = self.make_key(operation, query)
+        empty = not value
+        now = time.time()
+        with self.lock:
+            previous = self.db.execute(
+                "SELECT size FROM results WHERE source = ? AND key = ?", (source, key)
+            ).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (source, key, body, int(empty), now, now, len(body), now + self.ttl_for(source, empty))
+            )
+            self.db.commit()
+            self.total_bytes += len(body) - (previous[0] if previous else 0)
+            self._count(source, "stores")
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until the cache fits in max_bytes"""
+        with self.lock:
+            if self.total_bytes <= self.max_bytes:
+                return
+            expired = self.db.execute(
+                "SELECT source, key, size FROM results WHERE expires_at <= ?", (time.time(),)
+            ).fetchall()
+            self.db.executemany(
+                "DELETE FROM results WHERE source = ? AND key = ?",
+                [(source, key) for source, key, _ in expired]
+            )
+            self.total_bytes -= sum(size for _, _, size in expired)
+
+            evicted = []
+            if self.total_bytes > self.max_bytes:
+                for source, key, size in self.db.execute(
+                    "SELECT source, key, size FROM results ORDER BY accessed_at"
+                ):
+                    if self.total_bytes <= self.max_bytes:
+                        break
+                    evicted.append((source, key))
+                    self._count(source, "evictions")
+                    self.total_bytes -= size
+            self.db.executemany("DELETE FROM results WHERE source = ? AND key = ?", evicted)
+            self.db.commit()
+
+    def invalidate(self, source: Optional[str] = None, operation: Optional[str] = None, query: Optional[Tuple] = None):
+        """
+        Remove entries: everything, one source's entries, or (with operation
+        and query) a single entry of that source
+        """
+        with self.lock:
+            if source is None:
+                self.db.execute("DELETE FROM results")
+            elif operation is None:
+                self.db.execute("DELETE FROM results WHERE source = ?", (source,))
+            else:
+                self.db.execute(
+                    "DELETE FROM results WHERE source = ? AND key = ?",
+                    (source, self.make_key(operation, query or ()))
+                )
+            self.db.commit()
+            self.total_bytes = self._sum_sizes()
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-source hit/miss counters plus overall totals"""
+        totals: Dict[str, int] = {}
+        for source_stats in self.stats.values():
+            for counter, value in source_stats.items():
+                totals[counter] = totals.get(counter, 0) + value
+        return {**self.stats, "total": totals}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+_result_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    """Process-wide cache shared by all aggregators"""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
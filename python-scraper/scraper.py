@@ -23,6 +23,11 @@ from fake_useragent import UserAgent
 from rich.console import Console
 from rich.progress import Progress, TaskID
 
+from entity_resolution import EntityResolver
+from http_client import close_http_client, get_http_client
+from name_normalizer import canonical_company_name, name_key
+from price_sketch import REGION_PRICE_SKETCH_PATH, PriceSketchStore
+
 load_dotenv()
 
 console = Console()
@@ -159,7 +164,8 @@ class DataScraper:
         
     async def init(self):
         """初始化连接"""
-        self.session = aiohttp.ClientSession(
+        # 共享进程级连接池
+        self.session = get_http_client().session(
             headers={"User-Agent": self.ua.random},
             timeout=aiohttp.ClientTimeout(total=30)
         )
@@ -282,25 +288,39 @@ class PermitDataScraper(DataScraper):
 class DataProcessor:
     """数据处理器"""
     
-    def __init__(self, supabase: Client):
+    def __init__(self, supabase: Client, price_sketches: Optional[PriceSketchStore] = None):
         self.supabase = supabase
+        # 按 地区/服务类型/月份 增量维护的价格草图, 每保存一条价格记录更新一次 (先写日志, 中断不丢)
+        self.price_sketches = price_sketches or PriceSketchStore(REGION_PRICE_SKETCH_PATH)
+        self.resolver = EntityResolver()
         
-    def deduplicate_companies(self, companies: List[Company]) -> List[Company]:
-        """企业去重"""
-        seen = set()
-        unique = []
-        
-        for company in companies:
+    def cluster_companies(self, companies: List[Company]) -> List[int]:
+        """
+        企业实体消解: 返回与输入对齐的簇 id (簇内第一条记录的序号)
+        名称、州和城市完全相同的记录直接归为一簇, 其余由 MinHash/LSH 分块和
+        名称、电话、地址、执照号打分判定 (如 'ABC Roofing LLC' 与 'A.B.C. Roofing')
+        """
+        first_for_key: Dict[str, int] = {}
+        exact_ids = []
+        for i, company in enumerate(companies):
             # 基于名称和地址生成唯一标识
             key = hashlib.md5(
-                f"{company.name.lower()}{company.state_code}{company.city.lower()}".encode()
+                f"{canonical_company_name(company.name)}{company.state_code}{name_key(company.city)}".encode()
             ).hexdigest()
-            
-            if key not in seen:
-                seen.add(key)
-                unique.append(company)
-                
-        return unique
+            exact_ids.append(first_for_key.setdefault(key, i))
+
+        representatives = sorted(first_for_key.values())
+        result = self.resolver.resolve(companies[i] for i in representatives)
+        cluster_for = {
+            index: representatives[cluster]
+            for index, cluster in zip(representatives, result.cluster_ids)
+        }
+        return [cluster_for[exact_id] for exact_id in exact_ids]
+
+    def deduplicate_companies(self, companies: List[Company]) -> List[Company]:
+        """企业去重: 每个实体簇保留第一条记录"""
+        cluster_ids = self.cluster_companies(companies)
+        return [company for i, company in enumerate(companies) if cluster_ids[i] == i]
     
     def validate_company(self, company: Company) -> bool:
         """验证企业数据"""
@@ -325,6 +345,11 @@ class DataProcessor:
             "std": float(np.std(prices)),
         }
     
+    def get_price_stats(self, service_type: str, region_id: Optional[str] = None) -> Dict[str, float]:
+        """读取增量维护的价格统计 (不读取历史价格); region_id 为空时汇总所有地区"""
+        cities = None if region_id is None else [region_id]
+        return self.price_sketches.rollup(service_type, cities=cities).describe()
+    
     async def save_company(self, company: Company) -> Optional[str]:
         """保存企业到数据库"""
         try:
@@ -361,6 +386,11 @@ class DataProcessor:
             data["created_at"] = datetime.utcnow().isoformat()
             
             self.supabase.table("price_records").insert(data).execute()
+            month = (price.recorded_at or '')[:7] or 'unknown'
+            self.price_sketches.add_prices(
+                price.region_id or '',
+                [[price.service_type or 'general', month, (price.price_min + price.price_max) / 2]]
+            )
             return True
         except Exception as e:
             console.print(f"[red]保存价格记录失败: {e}[/red]")
@@ -395,6 +425,9 @@ class ScraperOrchestrator:
         """关闭所有爬虫"""
         for scraper in self.scrapers.values():
             await scraper.close()
+        await close_http_client()
+        if self.processor:
+            self.processor.price_sketches.save()
             
     async def run_full_scrape(self, states: List[str] = None, industries: List[str] = None):
         """运行完整爬取任务"""
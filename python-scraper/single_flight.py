@@ -0,0 +1,94 @@
+"""
+Single-flight request coalescing
+Concurrent calls with the same key share one in-flight call and its
+result; completed results are remembered for a short time so lookups
+arriving just after it finishes are served without another round trip.
+"""
+
+import copy
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+# Seconds a completed result is served from the memo
+MEMO_TTL = 60.0
+# Results kept in the memo (least recently used are dropped first)
+MAX_MEMO_ENTRIES = 10000
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls.
+
+    Every caller gets its own deep copy of the result, so callers that
+    mutate what they receive (DataAggregator._merge_data does) cannot
+    affect each other. Exceptions are shared by the callers waiting on the
+    failed call but are not memoized. A caller that is cancelled does not
+    cancel the shared call.
+    """
+
+    def __init__(self, memo_ttl: float = MEMO_TTL, max_entries: int = MAX_MEMO_ENTRIES):
+        self.memo_ttl = memo_ttl
+        self.max_entries = max_entries
+        self.in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.memo: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+
+        self.calls = 0
+        self.coalesced = 0
+        self.memo_hits = 0
+
+    def _remember(self, key: Hashable, task: asyncio.Task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        if task.cancelled() or task.exception() is not None or self.memo_ttl <= 0:
+            return
+        self.memo[key] = (time.monotonic() + self.memo_ttl, task.result())
+        self.memo.move_to_end(key)
+        while len(self.memo) > self.max_entries:
+            self.memo.popitem(last=False)
+
+    def _memo_get(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self.memo.get(key)
+        if entry is None:
+            return False, None
+        expires, value = entry
+        if time.monotonic() >= expires:
+            del self.memo[key]
+            return False, None
+        self.memo.move_to_end(key)
+        return True, value
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of call(), shared with concurrent and recent callers using the same key"""
+        found, value = self._memo_get(key)
+        if found:
+            self.memo_hits += 1
+            return copy.deepcopy(value)
+
+        task = self.in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(call())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._remember(key, done))
+        else:
+            self.coalesced += 1
+
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def forget(self, key: Optional[Hashable] = None):
+        """Drop one memoized result, or all of them"""
+        if key is None:
+            self.memo.clear()
+        else:
+            self.memo.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "memo_hits": self.memo_hits,
+            "in_flight": len(self.in_flight),
+            "memo_entries": len(self.memo),
+        }
@@ -12,9 +12,40 @@ from datetime import datetime
 import logging
 import re
 
+from http_cache import CachedSession
+from http_client import close_http_client, get_http_client
+from resilience import RETRYABLE_STATUSES, SourceGuard, SourceUnavailableError, TransientHTTPError, get_source_guard
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+async def guarded_fetch(
+    session: CachedSession,
+    guard: SourceGuard,
+    url: str,
+    method: str = "GET",
+    as_json: bool = True,
+    **kwargs
+) -> Optional[object]:
+    """
+    Fetch a JSON or text body under the guard's retry policy and circuit
+    breaker. Returns None for non-retryable statuses (no such record);
+    transient failures that persist are raised.
+    """
+    async def attempt():
+        request = session.get if method == "GET" else session.post
+        async with request(url, **kwargs) as response:
+            if response.status == 200:
+                return await response.json() if as_json else await response.text()
+            if response.status in RETRYABLE_STATUSES:
+                raise TransientHTTPError(guard.source, response.status)
+            if response.status != 404:
+                logger.warning(f"{guard.source}: HTTP {response.status} for {url}")
+            return None
+    
+    return await guard.call(attempt)
+
+
 # State Secretary of State business search URLs
 STATE_REGISTRIES = {
     "AL": {"name": "Alabama", "url": "https://arc-sos.state.al.us/CGI/CORPNAME.MBR/INPUT"},
@@ -100,17 +131,28 @@ class StateRegistryScraper:
             headers = {
                 "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
             }
-            self.session = aiohttp.ClientSession(timeout=timeout, headers=headers)
+            self.session = CachedSession(
+                get_http_client().session(headers=headers, timeout=timeout),
+                source="state_registry"
+            )
     
     async def close_session(self):
         if self.session:
             await self.session.close()
             self.session = None
     
+    async def _fetch(self, state_code: str, url: str, method: str = "GET", as_json: bool = True, **kwargs):
+        """Request against one state's registry (each state has its own circuit breaker)"""
+        guard = get_source_guard(f"state_registry:{state_code}")
+        return await guarded_fetch(self.session, guard, url, method, as_json, **kwargs)
+    
     async def search_state_registry(self, company_name: str, state_code: str) -> List[Dict]:
         """
         Search a state's business registry
         Note: Many states require different scraping approaches
+        
+        Returns [] when nothing was found; raises when the registry could not
+        be reached (SourceUnavailableError while its circuit breaker is open)
         """
         await self.init_session()
         
@@ -138,22 +180,14 @@ class StateRegistryScraper:
     
     async def _search_california(self, company_name: str) -> List[Dict]:
         """Search California business registry"""
-        try:
-            url = "https://bizfileonline.sos.ca.gov/api/Records/businesssearch"
-            payload = {
-                "SearchValue": company_name,
-                "SearchType": "CORP",
-                "SearchCriteria": "contains"
-            }
-            
-            async with self.session.post(url, json=payload) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return self._parse_california_results(data)
-        except Exception as e:
-            logger.error(f"California search error: {e}")
-        
-        return []
+        url = "https://bizfileonline.sos.ca.gov/api/Records/businesssearch"
+        payload = {
+            "SearchValue": company_name,
+            "SearchType": "CORP",
+            "SearchCriteria": "contains"
+        }
+        data = await self._fetch("CA", url, method="POST", json=payload)
+        return self._parse_california_results(data) if data else []
     
     def _parse_california_results(self, data: Dict) -> List[Dict]:
         """Parse California search results"""
@@ -172,17 +206,9 @@ class StateRegistryScraper:
     
     async def _search_florida(self, company_name: str) -> List[Dict]:
         """Search Florida Sunbiz registry"""
-        try:
-            url = f"https://search.sunbiz.org/Inquiry/CorporationSearch/SearchResultDetail?inquiryType=EntityName&directionType=Initial&searchNameOrder={company_name.upper()}&aggregateId="
-            
-            async with self.session.get(url) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    return self._parse_florida_html(html)
-        except Exception as e:
-            logger.error(f"Florida search error: {e}")
-        
-        return []
+        url = f"https://search.sunbiz.org/Inquiry/CorporationSearch/SearchResultDetail?inquiryType=EntityName&directionType=Initial&searchNameOrder={company_name.upper()}&aggregateId="
+        html = await self._fetch("FL", url, as_json=False)
+        return self._parse_florida_html(html) if html else []
     
     def _parse_florida_html(self, html: str) -> List[Dict]:
         """Parse Florida Sunbiz HTML results"""
@@ -209,38 +235,25 @@ class StateRegistryScraper:
     
     async def _search_delaware(self, company_name: str) -> List[Dict]:
         """Search Delaware business registry"""
-        try:
-            url = "https://icis.corp.delaware.gov/Ecorp/EntitySearch/NameSearch.aspx"
-            # Note: Delaware requires form submission with viewstate
-            # This is a simplified version
-            
-            async with self.session.get(url) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    viewstate = soup.find('input', {'name': '__VIEWSTATE'})
-                    # Would need to submit form with viewstate
-                    logger.info("Delaware requires form-based search")
-        except Exception as e:
-            logger.error(f"Delaware search error: {e}")
+        url = "https://icis.corp.delaware.gov/Ecorp/EntitySearch/NameSearch.aspx"
+        # Note: Delaware requires form submission with viewstate
+        # This is a simplified version
+        html = await self._fetch("DE", url, as_json=False)
+        if html:
+            soup = BeautifulSoup(html, 'html.parser')
+            viewstate = soup.find('input', {'name': '__VIEWSTATE'})
+            # Would need to submit form with viewstate
+            logger.info("Delaware requires form-based search")
         
         return []
     
     async def _search_new_york(self, company_name: str) -> List[Dict]:
         """Search New York business registry"""
-        try:
-            # NY DOS API
-            url = f"https://apps.dos.ny.gov/publicInquiry/entitySearch"
-            params = {"name": company_name}
-            
-            async with self.session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return self._parse_ny_results(data)
-        except Exception as e:
-            logger.error(f"New York search error: {e}")
-        
-        return []
+        # NY DOS API
+        url = f"https://apps.dos.ny.gov/publicInquiry/entitySearch"
+        params = {"name": company_name}
+        data = await self._fetch("NY", url, params=params)
+        return self._parse_ny_results(data) if data else []
     
     def _parse_ny_results(self, data: Dict) -> List[Dict]:
         """Parse New York results"""
@@ -259,22 +272,14 @@ class StateRegistryScraper:
     
     async def _search_texas(self, company_name: str) -> List[Dict]:
         """Search Texas Comptroller"""
-        try:
-            url = "https://mycpa.cpa.state.tx.us/coa/coaSearchBtn"
-            data = {
-                "coaSearchName": company_name,
-                "coaSearchEntity": "",
-                "coaSearch": "Search"
-            }
-            
-            async with self.session.post(url, data=data) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    return self._parse_texas_html(html)
-        except Exception as e:
-            logger.error(f"Texas search error: {e}")
-        
-        return []
+        url = "https://mycpa.cpa.state.tx.us/coa/coaSearchBtn"
+        data = {
+            "coaSearchName": company_name,
+            "coaSearchEntity": "",
+            "coaSearch": "Search"
+        }
+        html = await self._fetch("TX", url, method="POST", as_json=False, data=data)
+        return self._parse_texas_html(html) if html else []
     
     def _parse_texas_html(self, html: str) -> List[Dict]:
         """Parse Texas HTML results"""
@@ -301,19 +306,16 @@ class StateRegistryScraper:
         """Generic search approach for states without specific implementation"""
         registry = STATE_REGISTRIES[state_code]
         
-        try:
-            async with self.session.get(registry["url"]) as response:
-                if response.status == 200:
-                    logger.info(f"Accessed {registry['name']} registry page")
-                    # Most states need form submissions or JavaScript
-                    return [{
-                        "name": company_name,
-                        "state": state_code,
-                        "source": registry["name"],
-                        "note": "Manual search required at: " + registry["url"]
-                    }]
-        except Exception as e:
-            logger.error(f"Error accessing {registry['name']}: {e}")
+        html = await self._fetch(state_code, registry["url"], as_json=False)
+        if html is not None:
+            logger.info(f"Accessed {registry['name']} registry page")
+            # Most states need form submissions or JavaScript
+            return [{
+                "name": company_name,
+                "state": state_code,
+                "source": registry["name"],
+                "note": "Manual search required at: " + registry["url"]
+            }]
         
         return []
     
@@ -327,7 +329,14 @@ class StateRegistryScraper:
         priority_states = ["DE", "CA", "NY", "TX", "FL", "NV", "WY"]
         
         for state in priority_states:
-            results = await self.search_state_registry(company_name, state)
+            try:
+                results = await self.search_state_registry(company_name, state)
+            except SourceUnavailableError as e:
+                logger.warning(f"Skipping {state}: {e}")
+                continue
+            except Exception as e:
+                logger.error(f"{state} registry search failed: {e!r}")
+                results = []
             if results:
                 all_results.extend(results)
             await asyncio.sleep(1)  # Rate limiting
@@ -346,13 +355,17 @@ class BBBScraper:
     
     def __init__(self):
         self.session: Optional[aiohttp.ClientSession] = None
+        self.guard = get_source_guard("bbb")
     
     async def init_session(self):
         if not self.session:
             headers = {
                 "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
             }
-            self.session = aiohttp.ClientSession(headers=headers)
+            self.session = CachedSession(
+                get_http_client().session(headers=headers),
+                source="bbb"
+            )
     
     async def close_session(self):
         if self.session:
@@ -360,25 +373,17 @@ class BBBScraper:
             self.session = None
     
     async def search_business(self, name: str, location: str = "") -> List[Dict]:
-        """Search BBB for business"""
+        """Search BBB for business (raises when BBB cannot be reached)"""
         await self.init_session()
         
-        try:
-            search_query = f"{name} {location}".strip()
-            url = f"{self.BASE_URL}/api/search/find"
-            params = {
-                "find": search_query,
-                "type": "business"
-            }
-            
-            async with self.session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return self._parse_bbb_results(data)
-        except Exception as e:
-            logger.error(f"BBB search error: {e}")
-        
-        return []
+        search_query = f"{name} {location}".strip()
+        url = f"{self.BASE_URL}/api/search/find"
+        params = {
+            "find": search_query,
+            "type": "business"
+        }
+        data = await guarded_fetch(self.session, self.guard, url, params=params)
+        return self._parse_bbb_results(data) if data else []
     
     def _parse_bbb_results(self, data: Dict) -> List[Dict]:
         """Parse BBB search results"""
@@ -403,18 +408,11 @@ class BBBScraper:
         return results
     
     async def get_business_profile(self, bbb_url: str) -> Optional[Dict]:
-        """Get detailed BBB business profile"""
+        """Get detailed BBB business profile (raises when BBB cannot be reached)"""
         await self.init_session()
         
-        try:
-            async with self.session.get(bbb_url) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    return self._parse_bbb_profile(html)
-        except Exception as e:
-            logger.error(f"BBB profile error: {e}")
-        
-        return None
+        html = await guarded_fetch(self.session, self.guard, bbb_url, as_json=False)
+        return self._parse_bbb_profile(html) if html else None
     
     def _parse_bbb_profile(self, html: str) -> Dict:
         """Parse BBB profile page"""
@@ -470,10 +468,11 @@ class OSHAScraper:
     
     def __init__(self):
         self.session: Optional[aiohttp.ClientSession] = None
+        self.guard = get_source_guard("osha")
     
     async def init_session(self):
         if not self.session:
-            self.session = aiohttp.ClientSession()
+            self.session = CachedSession(get_http_client().session(), source="osha")
     
     async def close_session(self):
         if self.session:
@@ -484,22 +483,14 @@ class OSHAScraper:
         """Search OSHA establishment database"""
         await self.init_session()
         
-        try:
-            url = f"{self.BASE_URL}/search"
-            params = {
-                "establishment": company_name,
-                "State": state,
-                "p_logger": "1"
-            }
-            
-            async with self.session.get(url, params=params) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    return self._parse_osha_results(html)
-        except Exception as e:
-            logger.error(f"OSHA search error: {e}")
-        
-        return []
+        url = f"{self.BASE_URL}/search"
+        params = {
+            "establishment": company_name,
+            "State": state,
+            "p_logger": "1"
+        }
+        html = await guarded_fetch(self.session, self.guard, url, as_json=False, params=params)
+        return self._parse_osha_results(html) if html else []
     
     def _parse_osha_results(self, html: str) -> List[Dict]:
         """Parse OSHA search results"""
@@ -549,6 +540,7 @@ async def main():
     finally:
         await scraper.close_session()
         await bbb.close_session()
+        await close_http_client()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+"""
+增量同步状态
+按数据集持久化同步水位线, 每次运行只拉取上次成功运行之后新增或变更的记录
+"""
+
+import os
+import json
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from dataclasses import dataclass, asdict
+
+# 本地状态目录, 可通过环境变量覆盖
+STATE_DIR = os.getenv('SCRAPER_STATE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.state'))
+WATERMARK_PATH = os.path.join(STATE_DIR, 'watermarks.json')
+
+
+@dataclass
+class SyncWatermark:
+    """数据集同步水位线"""
+    field: str        # 水位线字段, 如 ':updated_at'
+    last_value: str   # 已同步的最大字段值
+    last_id: str      # 同值记录中已同步的最大行 id
+    synced_at: str    # 最近一次成功同步的时间
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.last_value, self.last_id)
+
+
+class WatermarkStore:
+    """水位线存储 (JSON 文件, 原子写入)"""
+
+    def __init__(self, path: str = WATERMARK_PATH):
+        self.path = path
+        self.watermarks: Dict[str, SyncWatermark] = {}
+        self.load()
+
+    def load(self):
+        """从文件加载水位线"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.watermarks = {
+            dataset: SyncWatermark(**value) for dataset, value in data.items()
+        }
+
+    def save(self):
+        """写入文件 (先写临时文件再替换, 避免中断时损坏)"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(
+                {dataset: asdict(wm) for dataset, wm in self.watermarks.items()},
+                f, indent=2, ensure_ascii=False
+            )
+        os.replace(tmp_path, self.path)
+
+    def get(self, dataset: str) -> Optional[SyncWatermark]:
+        return self.watermarks.get(dataset)
+
+    def advance(self, dataset: str, field: str, key: Tuple[str, str]):
+        """在一次成功同步后推进水位线 (只会前进, 不会后退) 并保存"""
+        current = self.watermarks.get(dataset)
+        if current and current.field == field and current.key >= key:
+            key = current.key
+        self.watermarks[dataset] = SyncWatermark(
+            field=field,
+            last_value=key[0],
+            last_id=key[1],
+            synced_at=datetime.utcnow().isoformat()
+        )
+        self.save()
+
+    def reset(self, dataset: Optional[str] = None):
+        """清除水位线, 下次运行将全量同步"""
+        if dataset is None:
+            self.watermarks.clear()
+        else:
+            self.watermarks.pop(dataset, None)
+        self.save()
@@ -0,0 +1,135 @@
+"""
+许可证关联测试 (用内存中的桩客户端代替 Supabase)
+运行: python -m pytest -q test_permit_linker.py
+"""
+import asyncio
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Optional
+
+from permit_linker import PermitLinker
+from price_analyzer import ContractorMatcher
+
+
+class StubQuery:
+    """支持 PermitLinker 用到的查询链, 对内存中的行求值"""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.conditions = []
+        self.negate = False
+        self.values = None
+        self.limit_rows = None
+
+    def _where(self, condition):
+        negate, self.negate = self.negate, False
+        self.conditions.append((lambda row: not condition(row)) if negate else condition)
+        return self
+
+    @property
+    def not_(self):
+        self.negate = True
+        return self
+
+    def select(self, columns):
+        self.columns = [c.strip() for c in columns.split(',')]
+        return self
+
+    def update(self, values):
+        self.values = values
+        return self
+
+    def is_(self, column, value):
+        assert value == 'null'
+        return self._where(lambda row: row.get(column) is None)
+
+    def in_(self, column, values):
+        return self._where(lambda row: row.get(column) in values)
+
+    def gt(self, column, value):
+        return self._where(lambda row: row[column] > value)
+
+    def order(self, column):
+        self.order_by = column
+        return self
+
+    def limit(self, count):
+        self.limit_rows = count
+        return self
+
+    def execute(self):
+        self.client.queries.append((self.table, self.values))
+        rows = [row for row in self.client.tables[self.table] if all(c(row) for c in self.conditions)]
+        if self.values is not None:
+            for row in rows:
+                row.update(self.values)
+            return SimpleNamespace(data=rows)
+        rows.sort(key=lambda row: row[self.order_by])
+        rows = rows[:self.limit_rows]
+        return SimpleNamespace(data=[{c: row.get(c) for c in self.columns} for row in rows])
+
+
+class StubClient:
+    def __init__(self, **tables):
+        self.tables = tables
+        self.queries = []
+
+    def table(self, name):
+        return StubQuery(self, name)
+
+
+@dataclass
+class Permit:
+    permit_number: str
+    contractor_name: Optional[str]
+    company_id: str = ''
+
+
+COMPANIES = [
+    {'id': 'c-acme', 'name': 'Acme Roofing LLC'},
+    {'id': 'c-bolt', 'name': 'Bolt Electric Inc'},
+]
+
+
+def make_linker(client):
+    return PermitLinker(client, ContractorMatcher.build_index(COMPANIES))
+
+
+def test_link_fills_only_unlinked_permits():
+    """内联关联只填写还没有 company_id 的许可证"""
+    permits = [
+        Permit('P1', 'ACME ROOFING'),
+        Permit('P2', 'Bolt Electric, Inc.'),
+        Permit('P3', 'Acme Roofing', company_id='c-other'),
+        Permit('P4', 'Unknown Builders'),
+        Permit('P5', None),
+    ]
+    assert make_linker(StubClient()).link(permits) == 2
+    assert [p.company_id for p in permits] == ['c-acme', 'c-bolt', 'c-other', '', '']
+
+
+def test_backfill_links_null_company_ids():
+    """回填只扫描 company_id 为空的许可证, 并把价格记录一并归属"""
+    permits = [
+        {'permit_number': f'P{i:04d}', 'source_url': f'https://example.com/{i}',
+         'contractor_name': 'Acme Roofing' if i % 2 else 'Bolt Electric', 'company_id': None}
+        for i in range(5)
+    ]
+    permits.append({'permit_number': 'P9000', 'source_url': None, 'contractor_name': 'Acme Roofing',
+                    'company_id': 'c-other'})
+    permits.append({'permit_number': 'P9001', 'source_url': None, 'contractor_name': None, 'company_id': None})
+    prices = [{'source_url': 'https://example.com/1', 'company_id': None}]
+    client = StubClient(permits=permits, price_records=prices)
+
+    linker = make_linker(client)
+    linker.PAGE_SIZE = 2
+    scanned, linked = asyncio.run(linker.backfill())
+
+    assert (scanned, linked) == (5, 5)
+    by_number = {row['permit_number']: row['company_id'] for row in permits}
+    assert by_number['P0001'] == 'c-acme'
+    assert by_number['P0002'] == 'c-bolt'
+    assert by_number['P9000'] == 'c-other'
+    assert by_number['P9001'] is None
+    assert prices[0]['company_id'] == 'c-acme'
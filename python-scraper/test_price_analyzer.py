@@ -0,0 +1,138 @@
+"""
+价格分析回归测试
+运行: python -m pytest -q test_price_analyzer.py
+"""
+import random
+import statistics
+
+from price_analyzer import PriceCalculator
+from price_sketch import QuantileSketch
+
+
+def legacy_analyze_prices(prices):
+    """原始实现 (排序取 q1/q3, IQR 过滤, 不足 3 条时保留全部)"""
+    if not prices or len(prices) < 3:
+        return None
+    sorted_prices = sorted(prices)
+    q1 = sorted_prices[len(sorted_prices) // 4]
+    q3 = sorted_prices[3 * len(sorted_prices) // 4]
+    iqr = q3 - q1
+    filtered = [p for p in prices if q1 - 1.5 * iqr <= p <= q3 + 1.5 * iqr]
+    if len(filtered) < 3:
+        filtered = prices
+    return {
+        'min_price': min(filtered),
+        'max_price': max(filtered),
+        'avg_price': round(statistics.mean(filtered), 2),
+        'median_price': round(statistics.median(filtered), 2),
+        'sample_size': len(filtered),
+    }
+
+
+def price_samples():
+    rng = random.Random(42)
+    yield [100, 200, 300, 400, 100000]
+    yield [5000, 5000, 5000]
+    yield [1, 2]
+    for size in (3, 10, 31, 32, 61, 500, 5000):
+        prices = [round(rng.lognormvariate(9, 0.6), 2) for _ in range(size)]
+        prices[rng.randrange(size)] *= 50
+        yield prices
+
+
+def test_analyze_prices_matches_legacy():
+    for prices in price_samples():
+        expected = legacy_analyze_prices(prices)
+        result = PriceCalculator.analyze_prices(prices, 'roof_repair')
+        if expected is None:
+            assert result is None
+            continue
+        assert {key: getattr(result, key) for key in expected} == expected, len(prices)
+
+
+def test_sketch_extremes_are_observed_prices():
+    """草图只做近似, 但裁剪后的最小/最大值必须是范围内真实出现过的价格"""
+    for prices in price_samples():
+        if len(prices) < 3:
+            continue
+        sketch = QuantileSketch()
+        sketch.extend(prices)
+        lower, upper = sketch.iqr_bounds()
+        analysis = PriceCalculator.analyze_sketch(sketch, 'roof_repair')
+        observed = set(prices)
+        assert analysis.min_price in observed and analysis.max_price in observed
+        if analysis.sample_size >= 3 and sketch.summary(lower, upper)['count'] >= 3:
+            assert lower <= analysis.min_price <= analysis.max_price <= upper
+
+
+def test_sketch_survives_merge_and_round_trip():
+    rng = random.Random(7)
+    parts = [[rng.uniform(1000, 9000) for _ in range(400)] for _ in range(3)]
+    sketches = []
+    for part in parts:
+        sketch = QuantileSketch()
+        sketch.extend(part)
+        sketches.append(QuantileSketch.from_dict(sketch.to_dict()))
+    merged = QuantileSketch.merged(sketches)
+    stats = merged.summary()
+    everything = [p for part in parts for p in part]
+    assert stats['count'] == len(everything)
+    assert stats['min'] == min(everything) and stats['max'] == max(everything)
+
+
+def test_group_stats_match_analyze_prices():
+    """分组批量统计与逐组 analyze_prices 结果一致"""
+    import pandas as pd
+
+    rows = []
+    for index, prices in enumerate(price_samples()):
+        rows.extend({'region': f'r{index}', 'service_type': 'roofing', 'price': p} for p in prices)
+    table = pd.DataFrame(rows)
+    grouped = PriceCalculator.analyze_price_groups(table)
+    for (region, service_type), part in table.groupby(['region', 'service_type']):
+        expected = PriceCalculator.analyze_prices(part['price'].tolist(), service_type)
+        if expected is None:
+            assert (region, service_type) not in grouped
+        else:
+            assert grouped[(region, service_type)] == expected, region
+
+
+def test_classify_batch_matches_best():
+    """批量向量化打分与逐条 best() 一致 (含同分按首次出现判定)"""
+    from benchmarks import make_descriptions
+
+    descriptions = make_descriptions(2000) + [None, '', 'roof hvac', 'hvac roof', 'pipe roof roof']
+    matcher = PriceCalculator.service_matcher()
+    result = PriceCalculator.classify_batch(descriptions)
+    assert list(result['service_type']) == [matcher.best(d) if d else 'general' for d in descriptions]
+
+
+def test_calculate_price_trend_keeps_half_split_rule():
+    """单序列趋势沿用前后半均值比较: 2 条即可判断, 不限时间窗口"""
+    from datetime import datetime
+
+    assert PriceCalculator.calculate_price_trend([(datetime(2020, 1, 1), 100), (datetime(2024, 1, 1), 120)]) == 'up'
+    assert PriceCalculator.calculate_price_trend([(datetime(2024, 1, 1), 100), (datetime(2020, 1, 1), 120)]) == 'down'
+    assert PriceCalculator.calculate_price_trend([(datetime(2020, 1, 1), 100)]) == 'stable'
+
+
+def test_sketch_describe_is_exact_except_median():
+    """计数、均值、极值和标准差在增量加入、合并和序列化之后仍是精确值"""
+    import numpy as np
+
+    rng = random.Random(5)
+    parts = [[rng.lognormvariate(9, 0.6) for _ in range(size)] for size in (1, 700, 1300)]
+    sketches = []
+    for index, part in enumerate(parts):
+        sketch = QuantileSketch()
+        if index % 2:
+            sketch.extend(part)
+        else:
+            for price in part:
+                sketch.add(price)
+        sketches.append(QuantileSketch.from_dict(sketch.to_dict()))
+    stats = QuantileSketch.merged(sketches).describe()
+    everything = np.array([p for part in parts for p in part])
+    assert stats['count'] == len(everything)
+    assert stats['min'] == everything.min() and stats['max'] == everything.max()
+    assert np.isclose(stats['avg'], everything.mean()) and np.isclose(stats['std'], everything.std())
@@ -377,6 +377,22 @@ CREATE TABLE IF NOT EXISTS price_history (
   UNIQUE(company_id, service_type, month)
 );
 
+-- 4.2.1 地区价格报表 (爬虫从许可证数据湖汇总后覆盖写入, 看板直接读取)
+CREATE TABLE IF NOT EXISTS price_reports (
+  region VARCHAR(100) NOT NULL, -- 城市
+  service_type VARCHAR(100) NOT NULL,
+  
+  min_price NUMERIC(12, 2),
+  max_price NUMERIC(12, 2),
+  avg_price NUMERIC(12, 2),
+  median_price NUMERIC(12, 2),
+  sample_size INTEGER,
+  price_trend VARCHAR(10), -- up, down, stable
+  
+  updated_at TIMESTAMP DEFAULT NOW(),
+  PRIMARY KEY (region, service_type)
+);
+
 -- 4.3 许可证/项目记录表
 CREATE TABLE IF NOT EXISTS permits (
   id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -604,6 +620,7 @@ LIMIT 50;
 ALTER TABLE users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE companies ENABLE ROW LEVEL SECURITY;
 ALTER TABLE price_records ENABLE ROW LEVEL SECURITY;
+ALTER TABLE price_reports ENABLE ROW LEVEL SECURITY;
 ALTER TABLE permits ENABLE ROW LEVEL SECURITY;
 ALTER TABLE reviews ENABLE ROW LEVEL SECURITY;
 ALTER TABLE saved_companies ENABLE ROW LEVEL SECURITY;
@@ -614,6 +631,7 @@ CREATE POLICY "Public read access" ON industries FOR SELECT USING (true);
 CREATE POLICY "Public read access" ON states FOR SELECT USING (true);
 CREATE POLICY "Public read access" ON regions FOR SELECT USING (true);
 CREATE POLICY "Public read access" ON companies FOR SELECT USING (true);
+CREATE POLICY "Public read access" ON price_reports FOR SELECT USING (true);
 CREATE POLICY "Public read access" ON reviews FOR SELECT USING (status = 'published');
 CREATE POLICY "Public read access" ON subscription_plans FOR SELECT USING (is_active = true);
 
@@ -634,6 +652,7 @@ CREATE POLICY "Users read own logs" ON search_logs FOR SELECT USING (
 -- 服务端写入权限
 CREATE POLICY "Service role full access on companies" ON companies FOR ALL TO service_role USING (true);
 CREATE POLICY "Service role full access on price_records" ON price_records FOR ALL TO service_role USING (true);
+CREATE POLICY "Service role full access on price_reports" ON price_reports FOR ALL TO service_role USING (true);
 CREATE POLICY "Service role full access on permits" ON permits FOR ALL TO service_role USING (true);
 
 -- ============================================